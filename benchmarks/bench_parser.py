@@ -0,0 +1,182 @@
+"""
+Parser benchmark suite.
+
+Generates synthetic reports (data_samples/generate_dummy_pdf.py) for a set of scenarios,
+runs FinancialReportParser.process_document on each and records, per scenario:
+  - the wall time of every pipeline stage (parser stage timings, median over --repeat runs),
+  - the peak Python heap (tracemalloc, measured in a separate run) and the process max RSS,
+  - the size of the serialized result, raw and gzip-compressed, in the chosen --format.
+
+Results are written as JSON. Saved as a baseline, they let later runs flag regressions:
+
+    python benchmarks/bench_parser.py --save-baseline          # record the current tree
+    python benchmarks/bench_parser.py                          # compare against it (exit 1 on regression)
+    python benchmarks/bench_parser.py --scenario medium --engine camelot --repeat 5
+"""
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import resource
+import statistics
+import tempfile
+import tracemalloc
+from typing import Any, Dict, List, Optional, Tuple
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.join(ROOT, 'src/core'))
+sys.path.append(os.path.join(ROOT, 'data_samples'))
+
+from parser_engine import FinancialReportParser
+from generate_dummy_pdf import generate_report
+from utils.data_utils import content_to_records
+from utils.result_codec import encode_json, compress
+
+RESULTS_PATH = os.path.join(ROOT, 'benchmarks', 'results', 'latest.json')
+BASELINE_PATH = os.path.join(ROOT, 'benchmarks', 'baseline.json')
+
+# Report shapes: generate_report() arguments
+SCENARIOS = {
+    'small': dict(pages=2, tables_per_page=1, rows=4),
+    'medium': dict(pages=20, tables_per_page=2, rows=15),
+    'landscape': dict(pages=10, tables_per_page=1, rows=20, landscape_pages=10),
+    'noisy': dict(pages=10, tables_per_page=1, rows=10, noise_pages=30),
+    'large': dict(pages=60, tables_per_page=3, rows=12),
+}
+
+# Pipeline stages of process_document, in execution order (as recorded in FinancialReportParser.timings).
+# 'layout' covers orientation detection and the TABLE_RULES pre-scan (resolved per page);
+# 'extraction' is vector + Camelot extraction, without the time spent rasterizing pages for Camelot.
+STAGES = ['metadata', 'layout', 'rasterization', 'extraction', 'cleaning', 'serialization']
+
+# A stage regresses when it is slower than baseline by this fraction AND by at least MIN_DELTA seconds
+TOLERANCE = 0.25
+MIN_DELTA = 0.005
+
+
+def _parse(pdf_path: str, engine: str, result_format: str = 'records') -> Tuple[List[Dict[str, Any]], Dict[str, float]]:
+    """Parses one document and returns its tables and the stage breakdown recorded by the parser."""
+    # Serial extraction and no page cache: every stage runs in this process, on every page
+    parser = FinancialReportParser(max_workers=1, engine=engine, result_format=result_format)
+    parser.page_cache = None
+    started = time.perf_counter()
+    tables = parser.process_document(pdf_path)
+    timings = parser.timings
+    with timings.measure('serialization'):
+        encode_json(tables)
+
+    seconds = {stage: timings.seconds.get(stage, 0.0) for stage in STAGES}
+    seconds['extraction'] = timings.seconds.get('vector_extraction', 0.0) + timings.seconds.get('camelot_extraction', 0.0)
+    seconds['total'] = time.perf_counter() - started
+    return tables, seconds
+
+
+def run_scenario(name: str, spec: Dict[str, Any], engine: str = 'auto', repeat: int = 3,
+                 workdir: Optional[str] = None, result_format: str = 'records') -> Dict[str, Any]:
+    """Benchmarks one scenario and returns its stage timings (median seconds) and memory peaks."""
+    workdir = workdir or tempfile.mkdtemp(prefix='cr_bench_')
+    pdf_path = generate_report(os.path.join(workdir, f"{name}.pdf"), seed=42, **spec)
+
+    _parse(pdf_path, engine, result_format)  # warm-up: imports, caches, first-call overheads
+    runs = []
+    for _ in range(repeat):
+        tables, seconds = _parse(pdf_path, engine, result_format)
+        runs.append(seconds)
+
+    tracemalloc.start()
+    _parse(pdf_path, engine, result_format)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    stages = {stage: round(statistics.median(run[stage] for run in runs), 4) for stage in STAGES + ['total']}
+    pages = spec['pages'] + spec.get('noise_pages', 0)
+    payload = encode_json(tables)
+    return {
+        'spec': spec,
+        'engine': engine,
+        'format': result_format,
+        'pages': pages,
+        'tables': len(tables),
+        'rows': sum(len(content_to_records(t['content'])) for t in tables),
+        'payload_kb': round(len(payload) / 1024, 1),
+        'payload_gzip_kb': round(len(compress(payload, 'gzip')) / 1024, 1),
+        'seconds': stages,
+        'pages_per_second': round(pages / stages['total'], 2) if stages['total'] else None,
+        'peak_heap_mb': round(peak / 2 ** 20, 2),
+        'max_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float = TOLERANCE) -> List[str]:
+    """Returns a description of every stage (or memory peak) slower/larger than the baseline."""
+    regressions = []
+    for key, current in results['scenarios'].items():
+        previous = baseline.get('scenarios', {}).get(key)
+        if previous is None:
+            continue
+        for stage, seconds in current['seconds'].items():
+            before = previous['seconds'].get(stage)
+            if before is not None and seconds > before * (1 + tolerance) and seconds - before > MIN_DELTA:
+                regressions.append(f"{key} {stage}: {before:.4f}s -> {seconds:.4f}s (+{(seconds / before - 1) * 100:.0f}%)"
+                                   if before else f"{key} {stage}: {before:.4f}s -> {seconds:.4f}s")
+        before, peak = previous.get('peak_heap_mb'), current['peak_heap_mb']
+        if before and peak > before * (1 + tolerance):
+            regressions.append(f"{key} peak heap: {before} MB -> {peak} MB")
+    return regressions
+
+
+def _print_table(results: Dict[str, Any]):
+    print(f"{'scenario':<22}" + ''.join(f"{stage:>14}" for stage in STAGES + ['total'])
+          + f"{'pages/s':>10}{'heap MB':>10}{'JSON KB':>10}")
+    for key, result in results['scenarios'].items():
+        print(f"{key:<22}" + ''.join(f"{result['seconds'][stage]:>14.4f}" for stage in STAGES + ['total'])
+              + f"{result['pages_per_second']:>10}{result['peak_heap_mb']:>10}{result['payload_kb']:>10}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the parsing pipeline stage by stage.")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS), help="Scenario(s) to run (default: all)")
+    parser.add_argument("--engine", action="append", choices=["auto", "camelot"], help="Engine(s) to run (default: auto)")
+    parser.add_argument("--format", default="records", choices=["records", "rows", "columns"], help="Table content layout")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per scenario (median is reported)")
+    parser.add_argument("--output", default=RESULTS_PATH, help="Where to write the results JSON")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="Baseline JSON to compare against / save to")
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE, help="Allowed slowdown before flagging (0.25 = 25%%)")
+    args = parser.parse_args(argv)
+
+    results = {
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'scenarios': {},
+    }
+    with tempfile.TemporaryDirectory(prefix='cr_bench_') as workdir:
+        for engine in args.engine or ['auto']:
+            for name in args.scenario or list(SCENARIOS):
+                results['scenarios'][f"{name}/{engine}"] = run_scenario(name, SCENARIOS[name], engine, args.repeat, workdir,
+                                                                         args.format)
+
+    _print_table(results)
+    for path in [args.output] + ([args.baseline] if args.save_baseline else []):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(results, f, indent=2)
+    print(f"\nResults written to {args.output}" + (f" and saved as baseline {args.baseline}" if args.save_baseline else ""))
+
+    if args.save_baseline or not os.path.exists(args.baseline):
+        return 0
+    with open(args.baseline) as f:
+        regressions = compare(results, json.load(f), args.tolerance)
+    for line in regressions:
+        print(f"REGRESSION {line}")
+    if not regressions:
+        print(f"No regression against {args.baseline}")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,163 @@
+"""
+API startup benchmark.
+
+Imports the API module (src/api/app.py) in fresh interpreters, the way a Gunicorn worker
+boots, and records for each startup mode:
+  - import_seconds: time to import the app (what every worker pays without preload),
+  - rss_mb: resident memory right after the import,
+  - heavy_modules: which parsing libraries (camelot, cv2, pandas, fitz) the import loaded,
+  - worker_ready_seconds / worker_private_mb: for a process forked from it (a Gunicorn worker
+    under preload, or a job pool process), the time to load the parsing stack and the memory
+    it does not share with its parent.
+
+Modes: 'lazy' (default, parsing stack imported by the job workers only) and 'preload'
+(PARSER_PRELOAD=true, parsing stack imported once and shared copy-on-write).
+
+    python benchmarks/bench_startup.py --save-baseline   # record the current tree
+    python benchmarks/bench_startup.py                   # compare against it (exit 1 on regression)
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+from typing import Any, Dict, List, Optional
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+RESULTS_PATH = os.path.join(ROOT, 'benchmarks', 'results', 'startup.json')
+BASELINE_PATH = os.path.join(ROOT, 'benchmarks', 'baseline_startup.json')
+
+MODES = {
+    'lazy': {'PARSER_PRELOAD': 'false'},
+    'preload': {'PARSER_PRELOAD': 'true'},
+}
+# Libraries that must stay out of a lazily started API worker
+HEAVY_MODULES = ['camelot', 'cv2', 'pandas', 'fitz']
+
+# A value regresses when it grows by this fraction AND by at least the absolute delta
+TOLERANCE = 0.25
+MIN_DELTA_SECONDS = 0.05
+MIN_DELTA_MB = 5.0
+
+# Runs in a fresh interpreter: imports the app, then forks a "worker" that loads the parsing stack
+_PROBE = r'''
+import gc, os, sys, json, time
+
+def memory_kb(fields):
+    found = {}
+    for path in ('/proc/self/smaps_rollup', '/proc/self/status'):
+        try:
+            with open(path) as f:
+                for line in f:
+                    name, _, value = line.partition(':')
+                    if name in fields and name not in found:
+                        found[name] = int(value.split()[0])
+        except OSError:
+            pass
+    return sum(found.values())
+
+sys.path.insert(0, os.path.join(sys.argv[1], 'src/api'))
+started = time.perf_counter()
+import app
+result = {'import_seconds': time.perf_counter() - started,
+          'rss_mb': memory_kb({'VmRSS'}) / 1024,
+          'heavy_modules': [m for m in json.loads(sys.argv[2]) if m in sys.modules]}
+
+read_end, write_end = os.pipe()
+if os.fork() == 0:
+    started = time.perf_counter()
+    import parser_engine
+    gc.collect()  # touches every object header, like a long-running worker eventually does
+    worker = {'worker_ready_seconds': time.perf_counter() - started,
+              'worker_private_mb': memory_kb({'Private_Clean', 'Private_Dirty'}) / 1024}
+    os.write(write_end, json.dumps(worker).encode())
+    os._exit(0)
+os.close(write_end)
+with os.fdopen(read_end) as pipe:
+    result.update(json.loads(pipe.read()))
+os.wait()
+print(json.dumps(result))
+'''
+
+
+def _probe(env: Dict[str, str]) -> Dict[str, Any]:
+    output = subprocess.run([sys.executable, '-c', _PROBE, ROOT, json.dumps(HEAVY_MODULES)],
+                            env=env, cwd=ROOT, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def run_mode(mode: str, repeat: int = 5) -> Dict[str, Any]:
+    """Starts the app `repeat` times in `mode` and returns the median of every measure."""
+    with tempfile.TemporaryDirectory(prefix='cr_startup_') as uploads:
+        env = dict(os.environ, UPLOAD_FOLDER=uploads, PYTHONDONTWRITEBYTECODE='1', **MODES[mode])
+        _probe(env)  # warm the OS file cache so the first timed run is not an outlier
+        runs = [_probe(env) for _ in range(repeat)]
+
+    result = {key: round(statistics.median(run[key] for run in runs), 4 if key.endswith('seconds') else 1)
+              for key in runs[0] if key != 'heavy_modules'}
+    result['heavy_modules'] = runs[0]['heavy_modules']
+    return result
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float = TOLERANCE) -> List[str]:
+    """Returns a description of every startup time or memory figure that grew past the baseline."""
+    regressions = []
+    for mode, current in results['modes'].items():
+        if mode == 'lazy' and current['heavy_modules']:
+            regressions.append(f"lazy: the API import loads {', '.join(current['heavy_modules'])}")
+        previous = baseline.get('modes', {}).get(mode)
+        if previous is None:
+            continue
+        for key, value in current.items():
+            before = previous.get(key)
+            if key == 'heavy_modules' or before is None:
+                continue
+            min_delta = MIN_DELTA_SECONDS if key.endswith('seconds') else MIN_DELTA_MB
+            if value > before * (1 + tolerance) and value - before > min_delta:
+                regressions.append(f"{mode} {key}: {before} -> {value}")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark API cold start time and per-worker memory.")
+    parser.add_argument("--mode", action="append", choices=sorted(MODES), help="Mode(s) to run (default: all)")
+    parser.add_argument("--repeat", type=int, default=5, help="Cold starts per mode (median is reported)")
+    parser.add_argument("--output", default=RESULTS_PATH, help="Where to write the results JSON")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="Baseline JSON to compare against / save to")
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE, help="Allowed growth before flagging (0.25 = 25%%)")
+    args = parser.parse_args(argv)
+
+    results = {
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'modes': {mode: run_mode(mode, args.repeat) for mode in args.mode or list(MODES)},
+    }
+    print(f"{'mode':<10}{'import s':>10}{'RSS MB':>10}{'worker s':>10}{'worker MB':>11}  heavy modules")
+    for mode, r in results['modes'].items():
+        print(f"{mode:<10}{r['import_seconds']:>10.4f}{r['rss_mb']:>10}{r['worker_ready_seconds']:>10.4f}"
+              f"{r['worker_private_mb']:>11}  {', '.join(r['heavy_modules']) or '-'}")
+
+    for path in [args.output] + ([args.baseline] if args.save_baseline else []):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(results, f, indent=2)
+    print(f"\nResults written to {args.output}" + (f" and saved as baseline {args.baseline}" if args.save_baseline else ""))
+
+    baseline = {}
+    if not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    regressions = compare(results, baseline, args.tolerance)
+    for line in regressions:
+        print(f"REGRESSION {line}")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,5 +1,10 @@
 # This file holds abstract rules that define how to parse financial reports.
 
+# --- PARSER VERSION ---
+# Part of the result cache key (content hash + version): bump it whenever the rules below or the
+# parsing/output logic change, so previously stored results are no longer served for new uploads.
+PARSER_VERSION = "1.0.0"
+
 # --- METADATA EXTRACTION RULES ---
 # Defines the regex patterns for the parser engine to find fixed headers (e.g., date, VAT number).
 # The parser code will iterate through these rules.
@@ -9,7 +9,7 @@ class BaseConfig:
     TESTING = False
     LOG_LEVEL = logging.INFO
     UPLOAD_FOLDER = os.path.abspath('temp_uploads')
-    MAX_CONTENT_LENGTH = 20 * 1024 * 1024 # 20MB Max file size
+    MAX_CONTENT_LENGTH = int(os.environ.get("MAX_CONTENT_MB", 20)) * 1024 * 1024 # Max upload size (20MB default)
 
 class DevelopmentConfig(BaseConfig):
     DEBUG = True
@@ -1,69 +1,144 @@
 import os
-from fpdf import FPDF
+import random
+import argparse
+import fitz  # PyMuPDF
 
 # --- Configuration ---
 # The script will output the test PDF here
 OUTPUT_DIR = "data_samples"
 PDF_FILENAME = "test_financial_report.pdf"
 
-class CustomPDF(FPDF):
-    """PDF class customized for generating financial report structure."""
-    
-    def header(self):
-        """Adds a professional header to the top of the PDF."""
-        self.set_font('Arial', 'B', 12)
-        # Title matches the financial domain
-        self.cell(0, 10, 'SYNTHETIC FINANCIAL REPORT - DUMMY DATA', 0, 1, 'C')
-        self.ln(5)
-
-    def footer(self):
-        """Adds page numbering to the bottom."""
-        self.set_y(-15)
-        self.set_font('Arial', 'I', 8)
-        self.cell(0, 10, f'Page {self.page_no()}', 0, 0, 'C')
+# A4 in PDF points
+PORTRAIT = (595, 842)
+LANDSCAPE = (842, 595)
+MARGIN = 40
+FONT_SIZE = 8
+
+HEADERS = ['Intermediario', 'Tipo di Rapporto', 'Stato', 'Importo Finale (EUR)']
+# Landscape pages carry the wide variant of the table (more columns)
+WIDE_HEADERS = HEADERS + ['Data Apertura', 'Garanzia', 'Sconfinamento', 'Quota (%)']
+
+SAMPLE_ROWS = [
+    ['Test Bank Alpha', 'Fido', 'Accordato', '150.000,00'],
+    ['Demo Credit Beta', 'Mutuo', 'Utilizzato', '75.000,00'],
+    ['Financial Mockup', 'Leasing', 'Residuo', '20.500,00'],
+    ['Risk Free Co.', 'Linea BT', 'Chiuso', '0,00'],
+]
+BANKS = ['Test Bank Alpha', 'Demo Credit Beta', 'Financial Mockup', 'Risk Free Co.', 'Banca Sintetica',
+         'Credito Fittizio', 'Cassa Esempio']
+RELATIONSHIPS = ['Fido', 'Mutuo', 'Leasing', 'Linea BT', 'Factoring', 'Anticipo SBF']
+STATES = ['Accordato', 'Utilizzato', 'Residuo', 'Chiuso']
+
+# Boilerplate of the real reports (legends, notes): no table keywords, no ruled tables
+NOISE_TEXT = ("Note e legenda. Le informazioni riportate sono fornite a titolo esemplificativo "
+              "e non costituiscono dati reali. Categoria di censimento, fenomeno correlato e "
+              "stato del rapporto seguono le istruzioni della circolare di riferimento. ")
+
+
+def _amount(rng: random.Random) -> str:
+    """Random amount in Italian format (e.g. 1.234.567,89)."""
+    whole, cents = divmod(rng.randint(0, 250_000_000), 100)
+    return f"{whole:,}".replace(',', '.') + f",{cents:02d}"
+
+
+def _row(rng: random.Random, wide: bool) -> list:
+    row = [rng.choice(BANKS), rng.choice(RELATIONSHIPS), rng.choice(STATES), _amount(rng)]
+    if wide:
+        row += [f"{rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/{rng.randint(2000, 2025)}",
+                rng.choice(['Reale', 'Personale', 'Nessuna']), _amount(rng), f"{rng.uniform(0, 100):.2f}%"]
+    return row
+
+
+def _write_metadata(page, y: float) -> float:
+    """Header fields targeted by METADATA_RULES. Returns the next free y position."""
+    for line in ("DATA DI RIFERIMENTO: 01/2025", "Intestatario: SYNTHETIC CORP, INC.",
+                 "Codice Fiscale: 99999999999",
+                 "Le informazioni sono disponibili a far tempo dal 15/02/2025"):
+        page.insert_text((MARGIN, y), line, fontsize=FONT_SIZE + 2)
+        y += 14
+    return y + 6
+
+
+def _draw_table(page, top: float, headers: list, rows: list, row_height: float) -> float:
+    """Draws a ruled (lattice) table with its text. Returns the table's bottom y position."""
+    width = page.rect.width - 2 * MARGIN
+    col_width = width / len(headers)
+    bottom = top + row_height * (len(rows) + 1)
+    xs = [MARGIN + i * col_width for i in range(len(headers) + 1)]
+    ys = [top + i * row_height for i in range(len(rows) + 2)]
+    shape = page.new_shape()
+    for y in ys:
+        shape.draw_line((xs[0], y), (xs[-1], y))
+    for x in xs:
+        shape.draw_line((x, top), (x, bottom))
+    shape.finish(color=(0, 0, 0), width=0.5)
+    shape.commit()
+
+    baseline = row_height / 2 + FONT_SIZE / 3
+    for r, cells in enumerate([headers] + rows):
+        for c, text in enumerate(cells):
+            page.insert_text((xs[c] + 3, ys[r] + baseline), str(text), fontsize=FONT_SIZE)
+    return bottom
+
+
+def generate_report(path: str, pages: int = 1, tables_per_page: int = 1, rows: int = 4,
+                    landscape_pages: int = 0, noise_pages: int = 0, seed: int = 0) -> str:
+    """
+    Generates a synthetic Centrale Rischi-like report for tests and benchmarks.
+    - `pages` table pages, each with `tables_per_page` ruled tables of `rows` rows
+      (rows are shrunk to fit the page when needed);
+    - the last `landscape_pages` of them are landscape with a wider table;
+    - `noise_pages` legend pages without tables are interleaved with the table pages.
+    Output is deterministic for a given `seed`.
+    """
+    rng = random.Random(seed)
+    doc = fitz.open()
+    noise_every = pages // noise_pages if noise_pages else 0
+    noise_left = noise_pages
+
+    for n in range(pages):
+        wide = n >= pages - landscape_pages
+        page = doc.new_page(width=(LANDSCAPE if wide else PORTRAIT)[0], height=(LANDSCAPE if wide else PORTRAIT)[1])
+        y = _write_metadata(page, MARGIN + 10) if n == 0 else MARGIN + 10
+
+        gap = 24
+        available = page.rect.height - MARGIN - y - gap * tables_per_page
+        row_height = max(6.0, min(16.0, available / (tables_per_page * (rows + 1))))
+        table_rows = [[_row(rng, wide) for _ in range(rows)] for _ in range(tables_per_page)]
+        if n == 0 and not wide and rows == len(SAMPLE_ROWS):
+            table_rows[0] = [list(r) for r in SAMPLE_ROWS]  # Keep the classic sample rows on page 1
+        for rows_of_table in table_rows:
+            y = _draw_table(page, y, WIDE_HEADERS if wide else HEADERS, rows_of_table, row_height) + gap
+
+        if noise_left and noise_every and (n + 1) % noise_every == 0:
+            noise = doc.new_page(width=PORTRAIT[0], height=PORTRAIT[1])
+            noise.insert_textbox(fitz.Rect(MARGIN, MARGIN, PORTRAIT[0] - MARGIN, PORTRAIT[1] - MARGIN),
+                                 NOISE_TEXT * 12, fontsize=FONT_SIZE + 1)
+            noise_left -= 1
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    doc.save(path, garbage=3, deflate=True)
+    doc.close()
+    return path
+
 
 def create_structured_dummy_file():
     """Generates the structured PDF file for parser testing."""
-    pdf = CustomPDF()
-    pdf.add_page()
-    
-    # 1. Metadata Headers (Crucial for regex testing in parser_engine)
-    pdf.set_font('Arial', '', 10)
-    pdf.cell(0, 5, "DATA DI RIFERIMENTO: 01/2025", 0, 1) # Target for date parsing
-    pdf.cell(0, 5, "Intestatario: SYNTHETIC CORP, INC.", 0, 1) # Target for header parsing
-    pdf.cell(0, 5, "Codice Fiscale: 99999999999", 0, 1) # Target for VAT/Fiscale parsing
-    pdf.ln(8)
-    
-    # 2. Table Header (The structure the parser must extract)
-    pdf.set_font('Arial', 'B', 9)
-    col_width = 38
-    headers = ['Intermediario', 'Tipo di Rapporto', 'Stato', 'Importo Finale (EUR)']
-    
-    for header in headers:
-        pdf.cell(col_width, 8, header, 1, 0, 'C')
-    pdf.ln()
-    
-    # 3. Dummy Data Rows
-    pdf.set_font('Arial', '', 9)
-    dummy_data = [
-        ['Test Bank Alpha', 'Fido', 'Accordato', '150,000.00'],
-        ['Demo Credit Beta', 'Mutuo', 'Utilizzato', '75,000.00'],
-        ['Financial Mockup', 'Leasing', 'Residuo', '20,500.00'],
-        ['Risk Free Co.', 'Linea BT', 'Chiuso', '0.00'],
-    ]
-    
-    for row in dummy_data:
-        for item in row:
-            pdf.cell(col_width, 8, item, 1, 0, 'C')
-        pdf.ln()
-
-    # Create output directory if it doesn't exist
-    if not os.path.exists(OUTPUT_DIR):
-        os.makedirs(OUTPUT_DIR)
-        
-    pdf.output(os.path.join(OUTPUT_DIR, PDF_FILENAME))
-    print(f"\n[SUCCESS] Dummy PDF created at: {OUTPUT_DIR}/{PDF_FILENAME}")
+    path = generate_report(os.path.join(OUTPUT_DIR, PDF_FILENAME))
+    print(f"\n[SUCCESS] Dummy PDF created at: {path}")
+
 
 if __name__ == "__main__":
-    # Note: Requires 'fpdf' library to run locally.
-    create_structured_dummy_file()
+    parser = argparse.ArgumentParser(description="Generate a synthetic Centrale Rischi report.")
+    parser.add_argument("--output", default=os.path.join(OUTPUT_DIR, PDF_FILENAME))
+    parser.add_argument("--pages", type=int, default=1, help="Pages with tables")
+    parser.add_argument("--tables-per-page", type=int, default=1)
+    parser.add_argument("--rows", type=int, default=4, help="Rows per table")
+    parser.add_argument("--landscape", type=int, default=0, help="How many of the table pages are landscape")
+    parser.add_argument("--noise", type=int, default=0, help="Legend pages without tables")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    path = generate_report(args.output, args.pages, args.tables_per_page, args.rows,
+                           args.landscape, args.noise, args.seed)
+    print(f"\n[SUCCESS] Dummy PDF created at: {path}")
@@ -0,0 +1,45 @@
+# Gunicorn settings for the parser API (gunicorn -c gunicorn.conf.py src.api.app:app).
+# Every value is overridable via environment, like the rest of the service configuration.
+import os
+import glob
+import tempfile
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:5000")
+# job_executor reads the same variable to split the cores between the workers' parsing pools
+workers = int(os.environ.get("GUNICORN_WORKERS", 4))
+# Parsing runs on the job executor, but large uploads can still take a while to spool
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 1800))
+accesslog = "-"
+errorlog = "-"
+
+# With PARSER_PRELOAD the app (and the parsing stack, see app.py) is imported once in the
+# master and shared copy-on-write by the workers, instead of being loaded by each of them.
+preload_app = os.environ.get("PARSER_PRELOAD", "false").lower() in ("1", "true", "yes")
+# Start each worker's parsing processes at boot rather than on the first upload.
+WARM_WORKERS = os.environ.get("PARSER_WARM_WORKERS", "true").lower() in ("1", "true", "yes")
+# nginx sends each /metrics scrape to any one worker: every worker publishes its metrics in this
+# directory and the scraped one merges them, so the scrape covers the whole node (see metrics.py).
+# Set before the app is imported, so the workers' registry picks it up.
+METRICS_DIR = os.environ.setdefault("PARSER_METRICS_DIR", os.path.join(tempfile.gettempdir(), "cr_parser_metrics"))
+
+
+def on_starting(server):
+    # Files of a previous run describe processes that are gone: start the node's totals from zero
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    for path in glob.glob(os.path.join(METRICS_DIR, "metrics-*.json*")):
+        os.remove(path)
+
+
+def post_worker_init(worker):
+    # metrics and job_executor are on sys.path once the app is loaded (app.py adds src/core)
+    from metrics import registry
+    # Parsing processes first, while the worker has no other thread (matters with PARSER_START_METHOD=fork)
+    if WARM_WORKERS:
+        from job_executor import default_executor
+        default_executor.warm_up(timeout=120)
+    registry.start()
+    # With PARSER_JOB_QUEUE set, every worker pulls jobs from the shared queue from the start,
+    # including the ones left behind by a worker that was restarted
+    consumer = worker.wsgi.extensions.get('job_queue_consumer')
+    if consumer is not None:
+        consumer.start()
@@ -1,8 +1,15 @@
 import os
 import uuid
+import atexit
+import time
+import hashlib
+import zipfile
 import threading
+from collections import deque
 import logging
-from flask import Flask, jsonify, request
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
+from flask import Flask, Response, jsonify, request
 import sys
 
 # Add source directories to Python path for internal imports
@@ -10,10 +17,21 @@ import sys
 # Note: You may need to create __init__.py files in these folders for the import to work.
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../core')))
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../storage')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
 
 # Import modules from our own project structure
-from parser_engine import FinancialReportParser
-from aws_utils import upload_file_to_s3, save_result_to_dynamo, send_webhook_notification
+from utils.data_utils import chunker
+from aws_utils import (upload_fileobj_to_s3, save_result_to_dynamo, save_backup_status,
+                       save_table_batch, save_job_progress, get_job_progress, load_results, RESULT_BATCH_SIZE,
+                       document_key, claim_document, subscribe_to_document, finish_document_claim,
+                       save_batch, load_batch, load_status, download_file_from_s3)
+from webhook_dispatcher import default_dispatcher, send_webhook_notification
+from job_queue import default_job_queue, QueueConsumer, PRIORITY_INTERACTIVE, PRIORITY_BATCH
+from job_executor import (default_executor, QueueFullError, ExecutorShutdownError, JobTimeoutError,
+                          JOB_TIMEOUT, RETRY_AFTER, PARSER_PRELOAD, API_WORKERS)
+from utils.result_codec import CODECS, encode_json, compress, available_codec, as_records, tables_to_parquet
+from config.parser_config import PARSER_VERSION
+from metrics import StageTimings, registry
 
 # Configure logging for the application (Professional Standard)
 logging.basicConfig(level=logging.INFO)
@@ -24,47 +42,484 @@ app = Flask(__name__)
 # Configuration loaded from environment variables
 UPLOAD_FOLDER = os.environ.get("UPLOAD_FOLDER", "./temp_uploads")
 BASE_WEBHOOK_URL = os.environ.get("DEFAULT_WEBHOOK_URL", "http://localhost:5000/webhook")
+# The parsing stack (parser_engine: camelot, OpenCV, pandas, fitz) is imported lazily by the
+# job workers, so an API worker starts and answers requests without loading it. With
+# PARSER_PRELOAD (and `preload_app` in gunicorn.conf.py) it is imported once here instead,
+# in the Gunicorn master, and shared copy-on-write by every forked worker.
+if PARSER_PRELOAD:
+    import parser_engine  # noqa: F401
+# Layout of the stored tables: 'rows' or 'columns' (compact, column labels stated once) or 'records'
+# (one {column: value} dict per row, the original format). Clients can always ask for 'records'.
+RESULT_FORMAT = os.environ.get("PARSER_RESULT_FORMAT", "rows").lower()
+# Largest request body accepted (MB, 0 = unlimited); bigger uploads get a 413 before being spooled.
+# With a job memory budget (PARSER_JOB_MEMORY_MB) document size no longer bounds parsing memory.
+MAX_CONTENT_MB = int(os.environ.get("MAX_CONTENT_MB", 20))
+app.config['MAX_CONTENT_LENGTH'] = MAX_CONTENT_MB * 1024 * 1024 or None
+# Threads running the I/O-bound ingestion stage (S3 backup, initial status) per API worker
+INGEST_THREADS = int(os.environ.get("INGEST_THREADS", 4))
+
+# A PROCESSING dedup claim older than this (seconds) is considered abandoned and can be taken over.
+# In durable queue mode a job may wait longer than that: its claim is only taken over once the job
+# is no longer in the queue either (see find_duplicate).
+DEDUP_CLAIM_TTL = int(os.environ.get("DEDUP_CLAIM_TTL", (JOB_TIMEOUT or 3600) * 2))
+SPOOL_CHUNK_SIZE = 1024 * 1024
+# Batch uploads: maximum documents per batch, maximum (uncompressed) size of one document (same limit
+# as a single upload by default, 0 = none) and of all the documents expanded from the ZIP archives of a batch
+BATCH_MAX_DOCUMENTS = int(os.environ.get("BATCH_MAX_DOCUMENTS", 1000))
+BATCH_MAX_DOCUMENT_MB = int(os.environ.get("BATCH_MAX_DOCUMENT_MB", MAX_CONTENT_MB))
+BATCH_MAX_MB = int(os.environ.get("BATCH_MAX_MB", 500))
+# Batch documents waiting in an API worker for a free slot (executor mode) before new batches get a 429 (0 = no limit)
+BATCH_QUEUE_MAX = int(os.environ.get("BATCH_QUEUE_MAX", 2000))
+# Durable queue mode (PARSER_JOB_QUEUE): uploads are refused with a 429 beyond this many waiting jobs
+# (0 = no limit). The default is the backlog the API workers of one node would admit without the queue.
+JOB_QUEUE_MAX = int(os.environ.get("JOB_QUEUE_MAX", default_executor.capacity * API_WORKERS))
+
+# I/O stage of the ingestion pipeline; threads are started lazily on first use
+ingest_executor = ThreadPoolExecutor(max_workers=INGEST_THREADS, thread_name_prefix='ingest')
+
+# Documents being parsed by this API worker: dedup key -> (owner request id, job future).
+# Lets identical uploads attach to the running job without a DynamoDB round trip.
+_inflight = {}
+_inflight_lock = threading.Lock()
 
 if not os.path.exists(UPLOAD_FOLDER):
     os.makedirs(UPLOAD_FOLDER)
 
+# --- METRICS (exposed on /metrics; job stage times are reported back by the worker processes) ---
+UPLOADS = registry.counter("cr_parser_uploads_total", "Documents received, by outcome.", ("outcome",))
+JOBS = registry.counter("cr_parser_jobs_total", "Parsing jobs finished, by status.", ("status",))
+JOB_SECONDS = registry.histogram("cr_parser_job_seconds", "Wall time of a parsing job.")
+STAGE_SECONDS = registry.histogram("cr_parser_stage_seconds", "Time spent per pipeline stage and job.", ("stage",))
+PAGES = registry.counter("cr_parser_pages_total", "Pages scanned by finished jobs (rate() = pages/sec).")
+PAGES_PER_SECOND = registry.histogram("cr_parser_job_pages_per_second", "Parsing throughput of a job.",
+                                      buckets=(0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500))
+ACCURACY = registry.histogram("cr_parser_extraction_accuracy", "Extraction accuracy of parsed tables (%).",
+                              buckets=(50, 70, 80, 90, 95, 98, 99, 100))
+# Gauges are summed over the node's API workers (see metrics.METRICS_DIR)
+registry.gauge("cr_parser_active_jobs", "Parsing jobs currently running.", lambda: default_executor.active)
+registry.gauge("cr_parser_capacity", "Parsing jobs admitted (running + waiting) before uploads get a 429.",
+               lambda: default_executor.capacity)
+registry.gauge("cr_parser_queue_depth", "Admitted jobs waiting for a worker process.", lambda: default_executor.queued)
+registry.gauge("cr_parser_batch_queue_depth", "Batch documents waiting for an executor slot.",
+               lambda: batch_feeder.pending)
+registry.gauge("cr_parser_job_queue_depth", "Jobs waiting in the durable job queue (all nodes).",
+               lambda: len(default_job_queue) if default_job_queue is not None else 0, mode='max')
+registry.gauge("cr_parser_webhook_pending", "Webhook notifications queued or being retried.",
+               lambda: default_dispatcher.pending)
+
 # --- ASYNCHRONOUS PROCESSING LOGIC ---
 
-def process_document_background(file_path: str, request_id: str, webhook_url: str):
+def backup_document_background(spooled_file, request_id: str, object_name: str):
+    """
+    Ingestion stage (runs on the API worker's I/O thread pool, concurrently with parsing):
+    records the initial status and backs the raw PDF up to S3 with a multipart transfer.
+    `spooled_file` is a handle opened before the parsing job was queued, so the upload
+    still works after the job has removed the spooled file from disk.
+    """
+    try:
+        # Never overwrite a status the parsing job may already have written
+        with STAGE_SECONDS.time(stage='status_write'):
+            save_result_to_dynamo(request_id, "PROCESSING", only_if_new=True)
+
+        # Store Raw File in S3 for backup/audit trail
+        with STAGE_SECONDS.time(stage='s3_backup'):
+            upload_fileobj_to_s3(spooled_file, object_name)
+        save_backup_status(request_id, "DONE")
+    except Exception as e:
+        logger.critical(f"Raw file backup failed for {request_id}: {e}")
+        save_backup_status(request_id, "FAILED", error_msg=str(e))
+    finally:
+        spooled_file.close()
+
+def process_document_background(file_path: str, request_id: str) -> dict:
     """
-    Background thread to handle the long-running parsing task.
+    Background job (runs on a JobExecutor worker process) to handle the long-running parsing task.
     Prevents the API call from timing out.
+    Returns the outcome ({'status': 'finished'|'error', 'error': ...}, 'partial' with the
+    'failed_pages' when some pages could not be parsed) with the job's stage
+    breakdown, pages and table accuracies for the API process metrics; the client webhook is
+    sent from the API process, so the worker never waits on a client endpoint.
+    The stage breakdown is also stored on the status record.
+    A document spooled on another node (durable queue) is fetched from its S3 backup; until
+    that backup exists the outcome is marked 'retryable'.
     """
-    # Initialize the core parser
-    parser = FinancialReportParser()
-    
+    if not os.path.exists(file_path):
+        try:
+            download_file_from_s3(f"{request_id}.pdf", file_path)
+        except Exception as e:
+            return {'status': 'error', 'error': f"Document not available yet: {e}", 'retryable': True}
+
+    # Initialize the core parser (imported here: a no-op once the worker is warm)
+    from parser_engine import FinancialReportParser
+    parser = FinancialReportParser(result_format=RESULT_FORMAT)
+    timings = StageTimings()
+    accuracies = []
+
+    def report(outcome: dict) -> dict:
+        timings.merge(parser.timings.seconds)
+        timings.add('total', time.perf_counter() - started)
+        return dict(outcome, timings=timings.as_dict(), pages=parser.pages_scanned, accuracies=accuracies)
+
+    started = time.perf_counter()
     try:
-        logger.info(f"Processing started for Request ID: {request_id}")
-        
-        # 1. Execute the Core Parsing Logic
-        parsing_results = parser.process_document(file_path)
+        save_result_to_dynamo(request_id, "PROCESSING")
+
+        # Resume after the last persisted page if an earlier attempt was interrupted
+        progress = get_job_progress(request_id) or {'resume_page': 1, 'resume_index': 0}
+        logger.info(f"Processing started for Request ID: {request_id} (from page {progress['resume_page']})")
         
-        # 2. Save Results and Final Status to Storage (DynamoDB/S3)
-        save_result_to_dynamo(request_id, "DONE", parsing_results)
+        # 1. Execute the Core Parsing Logic, streaming tables to storage as they are parsed
+        tables = parser.iter_tables(file_path, progress['resume_page'], progress['resume_index'])
+        saved_count = progress['resume_index']
+        page_start_index = {}
+        for batch in chunker(tables, RESULT_BATCH_SIZE):
+            with timings.measure('storage'):
+                save_table_batch(request_id, batch)
+            for parsed_table in batch:
+                page_start_index.setdefault(parsed_table['page_number'], parsed_table['table_index'])
+                accuracies.append(parsed_table['extraction_accuracy'])
+            # Checkpoint: the last page may have more tables in the next batch, so resume re-parses it
+            last_page = batch[-1]['page_number']
+            with timings.measure('storage'):
+                save_job_progress(request_id, last_page, page_start_index[last_page])
+            saved_count = batch[-1]['table_index'] + 1
         
-        # 3. Notify Client via Webhook
-        send_webhook_notification(webhook_url, request_id, "finished")
-        logger.info(f"Parsing and notification completed for {request_id}")
+        # A failed pre-scan or shard leaves the result incomplete: never store it as DONE
+        if parser.errors:
+            error_message = "Parsing incomplete: " + "; ".join(parser.errors)
+            logger.error(f"Error processing {request_id}: {error_message}")
+            outcome = report({'status': 'error', 'error': error_message, 'partial': True,
+                              'result_count': saved_count, 'failed_pages': parser.failed_pages})
+            save_result_to_dynamo(request_id, "ERROR", error_msg=error_message, result_count=saved_count,
+                                  timings=outcome['timings'], metadata=parser.metadata)
+            return outcome
 
-    except Exception as e:
+        # 2. Save Final Status (and the job's stage breakdown) to Storage (DynamoDB)
+        outcome = report({'status': 'finished', 'result_count': saved_count})
+        save_result_to_dynamo(request_id, "DONE", result_count=saved_count, timings=outcome['timings'],
+                              metadata=parser.metadata)
+        logger.info(f"Parsing completed for {request_id} in {outcome['timings']['total']:.2f}s: {outcome['timings']}")
+        return outcome
+
+    except (Exception, JobTimeoutError) as e:
         error_message = str(e)
         logger.error(f"Error processing {request_id}: {error_message}", exc_info=True)
-        # On failure, log error status to DB and notify client
-        save_result_to_dynamo(request_id, "ERROR", error_msg=error_message)
-        send_webhook_notification(webhook_url, request_id, "error", error_message)
+        # On failure, log error status to DB (the client is notified by the API process)
+        outcome = report({'status': 'error', 'error': error_message})
+        save_result_to_dynamo(request_id, "ERROR", error_msg=error_message, timings=outcome['timings'])
+        return outcome
         
     finally:
         # Crucial: Always clean up local files
         if os.path.exists(file_path):
             os.remove(file_path)
 
+def _job_outcome(future: Future) -> dict:
+    try:
+        return future.result()
+    except BaseException as e:
+        return {'status': 'error', 'error': f"Parsing worker failed: {e!r}", 'crashed': True}
+
+def notify_client(request_id: str, webhook_url: str, content_key: str, future: Future):
+    """
+    Done-callback of a parsing job (runs in the API process): settles the dedup claim and
+    queues the webhooks of the client and of every duplicate upload that subscribed to the job.
+    Also covers jobs that died without reporting (e.g. a crashed worker).
+    """
+    outcome = _job_outcome(future)
+    if outcome.get('crashed') or outcome.get('retryable'):
+        logger.error(f"Job {request_id} did not complete: {outcome['error']}")
+        save_result_to_dynamo(request_id, "ERROR", error_msg=outcome['error'])
+    record_job_metrics(outcome)
+
+    with _inflight_lock:
+        _inflight.pop(content_key, None)
+    finished = outcome['status'] == 'finished'
+    # Partial results (a failed shard or pre-scan) report an error: the next upload parses again
+    subscribers = finish_document_claim(content_key, request_id, "DONE" if finished else "ERROR",
+                                        outcome.get('result_count') if finished else None)
+    for url in [webhook_url, *subscribers]:
+        send_webhook_notification(url, request_id, outcome['status'], outcome.get('error'))
+
+def record_job_metrics(outcome: dict):
+    """Feeds the outcome of a finished job (stage breakdown, pages, accuracies) into the metrics."""
+    JOBS.inc(status=outcome['status'])
+    timings = outcome.get('timings', {})
+    for stage, seconds in timings.items():
+        if stage != 'total':
+            STAGE_SECONDS.observe(seconds, stage=stage)
+    if 'total' in timings:
+        JOB_SECONDS.observe(timings['total'])
+        if outcome.get('pages'):
+            PAGES.inc(outcome['pages'])
+            PAGES_PER_SECOND.observe(outcome['pages'] / max(timings['total'], 1e-6))
+    for accuracy in outcome.get('accuracies', []):
+        ACCURACY.observe(accuracy)
+
+def notify_subscriber(request_id: str, webhook_url: str, future: Future):
+    """Done-callback for a duplicate upload attached to a job running in this API worker."""
+    outcome = _job_outcome(future)
+    send_webhook_notification(webhook_url, request_id, outcome['status'], outcome.get('error'))
+
+def start_document(file_path: str, request_id: str, content_key: str, webhook_url: str) -> Future:
+    """
+    Hands a spooled, claimed document to the bounded process pool and starts its S3 backup.
+    Raises QueueFullError / ExecutorShutdownError (leaving the spool and the claim to the caller).
+    """
+    # Keep a handle for the backup stage: it must outlive the parsing job's cleanup
+    spooled_file = open(file_path, 'rb')
+    try:
+        with _inflight_lock:
+            job = default_executor.submit(process_document_background, file_path, request_id)
+            _inflight[content_key] = (request_id, job)
+    except BaseException:
+        spooled_file.close()
+        raise
+    job.add_done_callback(partial(notify_client, request_id, webhook_url, content_key))
+
+    # Status + S3 backup run concurrently with parsing (no S3 round trip on the request path)
+    ingest_executor.submit(backup_document_background, spooled_file, request_id, f"{request_id}.pdf")
+    return job
+
+def enqueue_document(file_path: str, request_id: str, content_key: str, webhook_url: str,
+                     priority: int = PRIORITY_INTERACTIVE):
+    """
+    Durable queue mode: records a spooled, claimed document as a job (any consumer of the queue
+    may parse it, even after this worker restarts) and starts its S3 backup.
+    """
+    spooled_file = open(file_path, 'rb')
+    try:
+        default_job_queue.put({'file_path': os.path.abspath(file_path), 'request_id': request_id,
+                               'content_key': content_key, 'webhook_url': webhook_url}, priority, job_id=request_id)
+    except BaseException:
+        spooled_file.close()
+        raise
+    ingest_executor.submit(backup_document_background, spooled_file, request_id, f"{request_id}.pdf")
+    queue_consumer.start()
+    queue_consumer.notify()
+
+def is_saturated() -> bool:
+    """True when a new upload would be refused: executor full, or JOB_QUEUE_MAX jobs waiting in queue mode."""
+    if default_job_queue is not None:
+        return bool(JOB_QUEUE_MAX) and len(default_job_queue) >= JOB_QUEUE_MAX
+    return default_executor.saturated
+
+def waiting_documents() -> int:
+    """Accepted documents not started yet: the durable queue's depth in queue mode, else the batch feeder's."""
+    return len(default_job_queue) if default_job_queue is not None else batch_feeder.pending
+
+def submit_document(file_path: str, request_id: str, content_key: str, webhook_url: str):
+    """Hands an uploaded document to the durable queue when configured, else to this worker's executor."""
+    if default_job_queue is None:
+        start_document(file_path, request_id, content_key, webhook_url)
+        return
+    if JOB_QUEUE_MAX and len(default_job_queue) >= JOB_QUEUE_MAX:
+        raise QueueFullError(f"{JOB_QUEUE_MAX} jobs are already waiting in the queue.")
+    enqueue_document(file_path, request_id, content_key, webhook_url)
+
+def start_queued_job(job):
+    """Consumer callback: runs a job leased from the durable queue on this worker's executor."""
+    payload = job.payload
+    with _inflight_lock:
+        future = default_executor.submit(process_document_background, payload['file_path'], payload['request_id'])
+        _inflight[payload['content_key']] = (payload['request_id'], future)
+    future.add_done_callback(partial(finish_queued_job, job))
+
+def finish_queued_job(job, future: Future):
+    """
+    Done-callback of a queued job: settles its lease, then notifies like notify_client. A job
+    whose worker crashed, or whose document was not reachable yet, goes back to the queue
+    (with backoff) until its attempts run out; parsing errors are final.
+    """
+    payload = job.payload
+    outcome = _job_outcome(future)
+    try:
+        if not (outcome.get('crashed') or outcome.get('retryable')):
+            default_job_queue.complete(job)
+        elif default_job_queue.fail(job, outcome['error']):
+            logger.warning(f"Job {payload['request_id']} will be retried: {outcome['error']}")
+            with _inflight_lock:
+                _inflight.pop(payload['content_key'], None)
+            return
+    finally:
+        queue_consumer.finished(job)
+    notify_client(payload['request_id'], payload['webhook_url'], payload['content_key'], future)
+
+def dead_queued_job(job, error: str):
+    """A job whose workers kept dying was dead-lettered: settle its status and claim, notify the client."""
+    payload = job.payload
+    logger.error(f"Job {payload['request_id']} abandoned: {error}")
+    outcome = Future()
+    outcome.set_result({'status': 'error', 'error': error, 'retryable': True})
+    notify_client(payload['request_id'], payload['webhook_url'], payload['content_key'], outcome)
+
+def _has_capacity() -> bool:
+    # Lease only what can start right away: waiting jobs stay in the queue for other consumers
+    return default_executor.accepting and default_executor.pending < default_executor.max_workers
+
+# Pulls jobs from the durable queue (started on the first enqueue, or at boot by gunicorn.conf.py)
+queue_consumer = QueueConsumer(default_job_queue, start_queued_job, _has_capacity,
+                               on_dead=dead_queued_job) if default_job_queue is not None else None
+app.extensions['job_queue_consumer'] = queue_consumer
+
+def release_document(file_path: str, request_id: str, content_key: str, reason: str):
+    """Drops a document that will not be parsed: removes the spool and releases its claim (and subscribers)."""
+    if os.path.exists(file_path):
+        os.remove(file_path)
+    for url in finish_document_claim(content_key, request_id, "ERROR"):
+        send_webhook_notification(url, request_id, "error", reason)
+
+class BatchFeeder(object):
+    """
+    Holds the documents of batch uploads that did not fit in the executor yet and submits
+    them, in arrival order, whenever an executor slot frees (whichever job held it).
+    Entries are (file_path, request_id, content_key, webhook_url) of spooled, claimed documents.
+    """
+    def __init__(self):
+        self._queue = deque()
+        self._lock = threading.Lock()
+        self._feeding = False
+        self._requested = False
+
+    @property
+    def pending(self) -> int:
+        return len(self._queue)
+
+    def add(self, entries: list):
+        with self._lock:
+            self._queue.extend(entries)
+        self.feed()
+
+    def feed(self, *_):
+        # A job that is already done releases its slot inside submit(), re-entering feed():
+        # only one caller starts documents, the others ask it for another round
+        with self._lock:
+            self._requested = True
+            if self._feeding:
+                return
+            self._feeding = True
+        while True:
+            with self._lock:
+                if not self._requested or not self._queue:
+                    self._feeding = False
+                    return
+                self._requested = False
+                entry = self._queue[0]
+            try:
+                start_document(*entry)
+            except (QueueFullError, ExecutorShutdownError):
+                # Retried by the next slot release
+                continue
+            with self._lock:
+                if self._queue and self._queue[0] is entry:
+                    self._queue.popleft()
+                self._requested = True
+
+    def abandon(self):
+        """Shutdown: queued documents are reported as failed so clients can resubmit them."""
+        with self._lock:
+            entries, self._queue = list(self._queue), deque()
+        for file_path, request_id, content_key, webhook_url in entries:
+            message = "Service shut down before the document was parsed, please resubmit."
+            save_result_to_dynamo(request_id, "ERROR", error_msg=message)
+            release_document(file_path, request_id, content_key, message)
+            send_webhook_notification(webhook_url, request_id, "error", message)
+
+batch_feeder = BatchFeeder()
+default_executor.add_release_callback(batch_feeder.feed)
+
+def _drain_on_exit():
+    # Finish admitted jobs first: their callbacks still queue webhooks on the dispatcher.
+    # Jobs of the durable queue that were not started stay queued for the other consumers.
+    if queue_consumer is not None:
+        queue_consumer.stop()
+    batch_feeder.abandon()
+    default_executor.shutdown(wait=True)
+    default_dispatcher.shutdown()
+
+atexit.register(_drain_on_exit)
+
 # --- API ENDPOINT ---
 
+def spool_upload(stream, file_path: str) -> str:
+    """Writes an uploaded stream to the local volume, hashing it on the way. Returns the SHA-256 hex digest."""
+    digest = hashlib.sha256()
+    with open(file_path, 'wb') as spooled:
+        for chunk in iter(lambda: stream.read(SPOOL_CHUNK_SIZE), b''):
+            digest.update(chunk)
+            spooled.write(chunk)
+    return digest.hexdigest()
+
+def find_duplicate(content_key: str, request_id: str, webhook_url: str):
+    """
+    Resolves an upload against the documents already parsed or being parsed.
+    Returns None when `request_id` now owns the document (it must be parsed),
+    otherwise the response body for the duplicate: the stored result, or the id of the
+    running job this request was attached to (its webhook fires when that job ends).
+    """
+    with _inflight_lock:
+        running = _inflight.get(content_key)
+    if running:
+        owner_id, job = running
+        job.add_done_callback(partial(notify_subscriber, owner_id, webhook_url))
+        return _duplicate_response(owner_id, 'PROCESSING')
+
+    # Not parsed here: claim the document across API workers (at most twice, the claim may settle meanwhile)
+    for _ in range(2):
+        claim = claim_document(content_key, request_id, DEDUP_CLAIM_TTL if default_job_queue is None else None)
+        if claim is None:
+            return None
+        owner_id = claim['RequestId']
+        if default_job_queue is not None and claim['ClaimState'] == 'PROCESSING' and _claim_abandoned(claim):
+            claim = claim_document(content_key, request_id, DEDUP_CLAIM_TTL)
+            if claim is None:
+                logger.warning(f"Took over the abandoned claim of {owner_id} for {request_id}")
+                return None
+            owner_id = claim['RequestId']
+        if claim['ClaimState'] == 'DONE':
+            send_webhook_notification(webhook_url, owner_id, 'finished')
+            owner = load_status(owner_id) or {}
+            return _duplicate_response(owner_id, 'DONE', load_results(owner_id, claim.get('ResultCount', 0)),
+                                       owner.get('Metadata'))
+        if subscribe_to_document(content_key, webhook_url):
+            return _duplicate_response(owner_id, 'PROCESSING')
+    raise RuntimeError(f"Could not resolve the dedup claim {content_key}")
+
+def _claim_abandoned(claim: dict) -> bool:
+    """
+    Durable queue mode: a claim is abandoned when it is older than DEDUP_CLAIM_TTL and its job
+    left the queue without settling it. A job still waiting or running keeps its claim however
+    long it waits; one that ends (done or dead-lettered) settles the claim itself.
+    """
+    age = time.time() - float(claim.get('ClaimedAt', 0))
+    return age > DEDUP_CLAIM_TTL and default_job_queue.state(claim['RequestId']) is None
+
+def _duplicate_response(owner_id: str, status: str, results: list = None, metadata: dict = None) -> dict:
+    body = {
+        'statusCode': 200,
+        'Request_Id': owner_id,
+        'status': status,
+        'deduplicated': True,
+        'message': 'Identical document already parsed, returning the stored result.' if status == 'DONE'
+                   else 'Identical document already in processing, attached to the running job.'
+    }
+    if results is not None:
+        body['metadata'] = metadata or {}
+        body['results'] = results
+    return body
+
+@app.errorhandler(413)
+def request_too_large(e):
+    UPLOADS.inc(outcome='too_large')
+    return jsonify({'error': f'Uploads are limited to {MAX_CONTENT_MB} MB.'}), 413
+
+def _busy_response(message: str, status_code: int):
+    """Builds a 429/503 response carrying a Retry-After hint for the client."""
+    response = jsonify({'error': message})
+    response.status_code = status_code
+    response.headers['Retry-After'] = str(RETRY_AFTER)
+    return response
+
 @app.route('/cr_parse', methods=['POST'])
 def cr_parse_endpoint():
     """
@@ -73,6 +528,13 @@ def cr_parse_endpoint():
     # 1. Input Validation
     if 'file' not in request.files or not request.files['file'].filename:
         return jsonify({'error': 'No valid file provided in the request.'}), 400
+
+    # Admission Control: refuse early, before the upload is spooled, hashed and claimed
+    if not default_executor.accepting:
+        return _busy_response('Service is shutting down, please retry later.', 503)
+    if is_saturated():
+        UPLOADS.inc(outcome='rejected')
+        return _busy_response('Too many documents in queue, please retry later.', 429)
         
     file = request.files['file']
     client_webhook = request.form.get('webhook_url', BASE_WEBHOOK_URL)
@@ -84,23 +546,33 @@ def cr_parse_endpoint():
     file_path = os.path.join(UPLOAD_FOLDER, safe_filename)
     
     try:
-        # Save file temporarily on the local container volume
-        file.save(file_path)
-        
-        # 3. Store Raw File in S3 for backup/audit trail
-        upload_file_to_s3(file_path, safe_filename)
-        
-        # 4. Initialize Status in DynamoDB
-        save_result_to_dynamo(request_id, "PROCESSING")
-        
-        # 5. Start ASYNC Processing
-        thread = threading.Thread(
-            target=process_document_background, 
-            args=(file_path, request_id, client_webhook)
-        )
-        thread.start()
-
-        # 6. Immediate Response to Client
+        # Spool the upload once on the local container volume, hashing it on the way
+        content_key = document_key(spool_upload(file.stream, file_path), PARSER_VERSION)
+
+        # 3. Exact duplicates reuse the stored result or attach to the job already parsing them
+        duplicate = find_duplicate(content_key, request_id, client_webhook)
+        if duplicate is not None:
+            os.remove(file_path)
+            UPLOADS.inc(outcome='deduplicated')
+            logger.info(f"Upload {request_id} deduplicated against {duplicate['Request_Id']}")
+            if 'results' in duplicate and request.form.get('format') == 'records':
+                duplicate['results'] = as_records(duplicate['results'])
+            return jsonify(duplicate)
+
+        # 4. Start ASYNC Processing on the bounded process pool or the durable queue (S3 backup runs alongside)
+        try:
+            submit_document(file_path, request_id, content_key, client_webhook)
+        except (QueueFullError, ExecutorShutdownError) as e:
+            # Nothing was parsed yet: drop the spool and release the claim (and its subscribers)
+            logger.warning(f"Rejected {request_id}: {e}")
+            UPLOADS.inc(outcome='rejected')
+            release_document(file_path, request_id, content_key, "Document was rejected, please resubmit.")
+            if isinstance(e, QueueFullError):
+                return _busy_response('Too many documents in queue, please retry later.', 429)
+            return _busy_response('Service is shutting down, please retry later.', 503)
+
+        # 5. Immediate Response to Client
+        UPLOADS.inc(outcome='accepted')
         return jsonify({
             'statusCode': 200,
             'Request_Id': request_id,
@@ -111,6 +583,200 @@ def cr_parse_endpoint():
         logger.critical(f"Fatal error during API ingestion: {e}")
         return jsonify({'error': 'Internal Server Error during ingestion process.'}), 500
 
+class BatchTooLargeError(Exception):
+    """A batch holds more than BATCH_MAX_DOCUMENTS documents or its ZIP archives expand beyond BATCH_MAX_MB."""
+
+def _batch_members(uploads):
+    """
+    Yields (filename, stream or None, error) for each document of a batch upload.
+    ZIP archives are expanded (PDF members only); oversized documents carry an error instead of a stream.
+    Raises BatchTooLargeError before spooling an archive whose members would exceed the batch budget.
+    """
+    max_bytes = BATCH_MAX_DOCUMENT_MB * 1024 * 1024
+    budget = BATCH_MAX_MB * 1024 * 1024
+    expanded = 0
+    for upload in uploads:
+        if not upload.filename.lower().endswith('.zip'):
+            yield upload.filename, upload.stream, None
+            continue
+        with zipfile.ZipFile(upload.stream) as archive:
+            members = []
+            for info in archive.infolist():
+                name = os.path.basename(info.filename)
+                if info.is_dir() or name.startswith('.') or not name.lower().endswith('.pdf'):
+                    continue
+                members.append(info)
+                if not max_bytes or info.file_size <= max_bytes:
+                    # Declared sizes are binding: zipfile stops reading a member at its file_size
+                    expanded += info.file_size
+            if budget and expanded > budget:
+                raise BatchTooLargeError(f"A batch expands to at most {BATCH_MAX_MB} MB of documents.")
+            for info in members:
+                if max_bytes and info.file_size > max_bytes:
+                    yield info.filename, None, f"Document larger than {BATCH_MAX_DOCUMENT_MB} MB."
+                    continue
+                with archive.open(info) as member:
+                    yield info.filename, member, None
+
+def batch_backlog_full() -> bool:
+    """True when a new batch would be refused: JOB_QUEUE_MAX jobs waiting in queue mode, else BATCH_QUEUE_MAX in the feeder."""
+    if default_job_queue is not None:
+        return is_saturated()
+    return bool(BATCH_QUEUE_MAX) and batch_feeder.pending >= BATCH_QUEUE_MAX
+
+@app.route('/cr_parse_batch', methods=['POST'])
+def cr_parse_batch_endpoint():
+    """
+    Batch API endpoint: accepts several PDFs (form-data field `files`) and/or ZIP archives of PDFs
+    and returns one batch id with the status of every document. Documents that do not fit in the
+    executor yet are queued in this API worker and started as soon as slots free up.
+    """
+    uploads = [f for f in request.files.getlist('files') + request.files.getlist('file') if f.filename]
+    if not uploads:
+        return jsonify({'error': 'No valid file provided in the request.'}), 400
+    if not default_executor.accepting:
+        return _busy_response('Service is shutting down, please retry later.', 503)
+    if batch_backlog_full():
+        UPLOADS.inc(outcome='rejected')
+        return _busy_response('Too many documents in queue, please retry later.', 429)
+
+    client_webhook = request.form.get('webhook_url', BASE_WEBHOOK_URL)
+    batch_id = str(uuid.uuid4())
+    started_at = time.monotonic()
+    documents, to_start = [], []
+
+    try:
+        for filename, stream, error in _batch_members(uploads):
+            if len(documents) >= BATCH_MAX_DOCUMENTS:
+                raise BatchTooLargeError(f'A batch holds at most {BATCH_MAX_DOCUMENTS} documents.')
+            request_id = str(uuid.uuid4())
+            if error:
+                documents.append({'filename': filename, 'request_id': request_id, 'status': 'INVALID', 'error': error})
+                continue
+
+            file_path = os.path.join(UPLOAD_FOLDER, f"{request_id}.pdf")
+            content_key = document_key(spool_upload(stream, file_path), PARSER_VERSION)
+            duplicate = find_duplicate(content_key, request_id, client_webhook)
+            if duplicate is not None:
+                os.remove(file_path)
+                UPLOADS.inc(outcome='deduplicated')
+                documents.append({'filename': filename, 'request_id': duplicate['Request_Id'],
+                                  'status': duplicate['status'], 'deduplicated': True})
+                continue
+            documents.append({'filename': filename, 'request_id': request_id, 'status': 'QUEUED'})
+            to_start.append((file_path, request_id, content_key, client_webhook))
+    except (zipfile.BadZipFile, BatchTooLargeError) as e:
+        # Release what was already claimed in this request
+        for file_path, request_id, content_key, _ in to_start:
+            release_document(file_path, request_id, content_key, "Batch upload was rejected.")
+        if isinstance(e, BatchTooLargeError):
+            return jsonify({'error': str(e)}), 413
+        return jsonify({'error': 'Invalid ZIP archive.'}), 400
+    except Exception as e:
+        logger.critical(f"Fatal error during batch ingestion {batch_id}: {e}")
+        for file_path, request_id, content_key, _ in to_start:
+            release_document(file_path, request_id, content_key, "Batch upload was rejected.")
+        return jsonify({'error': 'Internal Server Error during ingestion process.'}), 500
+
+    # Record the batch before any job can report on it, then start (or queue) its documents
+    save_batch(batch_id, documents)
+    UPLOADS.inc(len(to_start), outcome='accepted')
+    if default_job_queue is not None:
+        for entry in to_start:
+            enqueue_document(*entry, priority=PRIORITY_BATCH)
+    else:
+        batch_feeder.add(to_start)
+
+    elapsed = time.monotonic() - started_at
+    logger.info(f"Batch {batch_id}: {len(documents)} documents ingested in {elapsed:.2f}s "
+                f"({len(to_start)} to parse, {waiting_documents()} waiting for a worker)")
+    return jsonify({
+        'statusCode': 200,
+        'Batch_Id': batch_id,
+        'document_count': len(documents),
+        'ingest_seconds': round(elapsed, 3),
+        'documents': documents,
+        'message': 'Batch accepted, documents are processed asynchronously.'
+    })
+
+@app.route('/cr_parse_batch/<batch_id>', methods=['GET'])
+def cr_parse_batch_status(batch_id: str):
+    """Batch progress: the current status of every document, totals per status and throughput."""
+    batch = load_batch(batch_id)
+    if batch is None:
+        return jsonify({'error': 'Unknown batch id.'}), 404
+    return jsonify(batch)
+
+@app.route('/cr_parse/<request_id>/results', methods=['GET'])
+def cr_parse_results(request_id: str):
+    """
+    Parsed tables of a finished request, in the stored layout unless `?format=` asks for 'records'
+    (compatibility view) or 'parquet' (analytics export, one row per cell). JSON is compressed
+    with zstd or gzip when the client accepts it.
+    """
+    result_format = request.args.get('format', RESULT_FORMAT)
+    if result_format not in ('records', 'rows', 'columns', 'parquet'):
+        return jsonify({'error': f'Unknown format {result_format!r}.'}), 400
+    status = load_status(request_id)
+    if status is None:
+        return jsonify({'error': 'Unknown request id.'}), 404
+    if status.get('Status') != 'DONE':
+        return jsonify({'Request_Id': request_id, 'status': status.get('Status')}), 409
+
+    tables = load_results(request_id, status.get('ResultCount', 0))
+    if result_format == 'parquet':
+        try:
+            body = tables_to_parquet(tables)
+        except RuntimeError as e:
+            return jsonify({'error': str(e)}), 501
+        return Response(body, mimetype='application/vnd.apache.parquet',
+                        headers={'Content-Disposition': f'attachment; filename={request_id}.parquet'})
+    if result_format == 'records':
+        tables = as_records(tables)
+
+    body = encode_json({'Request_Id': request_id, 'metadata': status.get('Metadata', {}), 'results': tables})
+    response = Response(body, mimetype='application/json')
+    for codec in ('zstd', 'gzip'):
+        if codec in request.accept_encodings and available_codec(codec) == codec:
+            response.set_data(compress(body, codec))
+            response.headers['Content-Encoding'] = CODECS[codec][1]
+            break
+    response.headers['Vary'] = 'Accept-Encoding'
+    return response
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Prometheus scrape endpoint (text exposition format) for this API worker."""
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/health', methods=['GET'])
+def health_endpoint():
+    """
+    Liveness/readiness probe: 200 while the worker accepts jobs, 503 while draining.
+    The top-level figures are this API worker's; 'node' sums them over all the node's workers.
+    """
+    accepting = default_executor.accepting
+    body = {
+        'status': 'ok' if accepting else 'draining',
+        'parser_version': PARSER_VERSION,
+        'active_jobs': default_executor.active,
+        'queued_jobs': default_executor.queued,
+        'capacity': default_executor.capacity,
+        'batch_queue': waiting_documents(),
+        'webhooks_pending': default_dispatcher.pending
+    }
+    node = registry.collect()
+    body['node'] = {
+        'active_jobs': node['cr_parser_active_jobs'],
+        'queued_jobs': node['cr_parser_queue_depth'],
+        'capacity': node['cr_parser_capacity'],
+        'batch_queue': node['cr_parser_batch_queue_depth'] if default_job_queue is None else waiting_documents(),
+        'webhooks_pending': node['cr_parser_webhook_pending']
+    }
+    if default_job_queue is not None:
+        body['job_queue'] = default_job_queue.stats()
+    return jsonify(body), 200 if accepting else 503
+
 if __name__ == '__main__':
     # Production deployment will use Gunicorn/Nginx
     app.run(host='0.0.0.0', port=5000)
@@ -0,0 +1,176 @@
+"""
+Bulk parsing CLI: runs FinancialReportParser over a directory of PDFs on a process pool.
+
+Meant for backfills, where going through the HTTP API would pay per-request overhead and
+round trips for every document. Each document's tables are written in one go to
+<output>/<name>.json (or .json.gz / .json.zst / .parquet, see --format and --compress),
+and a manifest.jsonl line records its outcome and timing.
+
+Usage:
+    python src/cli/batch_parse.py /data/cr_reports --output /data/cr_results --workers 8
+    python src/cli/batch_parse.py /data/cr_reports -o /data/cr_results --format rows --compress zstd
+    python src/cli/batch_parse.py /data/cr_reports -o /data/cr_lake --format parquet
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import logging
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Dict, Iterator, List, Optional
+
+# Add source directories to Python path for internal imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../core')))
+from utils.result_codec import CODECS, available_codec, encode_json, compress, tables_to_parquet
+
+logger = logging.getLogger("batch_parse")
+
+# Output layouts: the parser's table formats, or 'parquet' (one row per cell, for analytics)
+OUTPUT_FORMATS = ('records', 'rows', 'columns', 'parquet')
+
+# One parser per worker process, built once by the pool initializer
+_parser = None
+_output = {'format': 'records', 'compression': 'none'}
+
+
+def _init_worker(engine: Optional[str], output_format: str = 'records', compression: str = 'none'):
+    global _parser
+    # Imported here: the parent process only schedules work and never loads the parsing stack
+    from parser_engine import FinancialReportParser
+    logging.getLogger().setLevel(logging.WARNING)
+    # Extraction inside a document stays serial: parallelism comes from the documents.
+    # Parquet is built from the compact 'rows' layout.
+    _parser = FinancialReportParser(max_workers=1, engine=engine,
+                                    result_format='rows' if output_format == 'parquet' else output_format)
+    _output.update(format=output_format, compression=compression)
+
+
+def output_suffix(output_format: str = 'records', compression: str = 'none') -> str:
+    return '.parquet' if output_format == 'parquet' else '.json' + CODECS[available_codec(compression)][0]
+
+
+def parse_one(pdf_path: str, output_path: str) -> Dict[str, Any]:
+    """Worker task: parses one document and writes all its tables to `output_path` at once."""
+    started = time.perf_counter()
+    try:
+        tables = _parser.process_document(pdf_path)
+        if _parser.errors:
+            # An incomplete result is not written, so a resumed run parses the document again
+            return {'file': pdf_path, 'status': 'ERROR', 'error': "; ".join(_parser.errors),
+                    'failed_pages': _parser.failed_pages, 'seconds': round(time.perf_counter() - started, 3)}
+        tmp_path = output_path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            if _output['format'] == 'parquet':
+                tables_to_parquet(tables, f)
+            else:
+                f.write(compress(encode_json(tables), _output['compression']))
+        os.replace(tmp_path, output_path)  # a half-written file never looks finished
+        # The report header is recorded once per document, in its manifest line
+        return {'file': pdf_path, 'status': 'DONE', 'tables': len(tables), 'metadata': _parser.metadata,
+                'seconds': round(time.perf_counter() - started, 3)}
+    except Exception as e:
+        return {'file': pdf_path, 'status': 'ERROR', 'error': str(e),
+                'seconds': round(time.perf_counter() - started, 3)}
+
+
+def find_documents(directory: str, recursive: bool = False) -> List[str]:
+    """Lists the PDFs of a directory in a stable order."""
+    if recursive:
+        found = [os.path.join(root, name) for root, _, names in os.walk(directory) for name in names]
+    else:
+        found = [os.path.join(directory, name) for name in os.listdir(directory)]
+    return sorted(path for path in found if path.lower().endswith('.pdf') and os.path.isfile(path))
+
+
+def output_path_for(pdf_path: str, directory: str, output: str, suffix: str = '.json') -> str:
+    relative = os.path.splitext(os.path.relpath(pdf_path, directory))[0]
+    return os.path.join(output, relative.replace(os.sep, '__') + suffix)
+
+
+def run_batch(directory: str, output: str, workers: int = os.cpu_count() or 1, recursive: bool = False,
+              resume: bool = True, engine: Optional[str] = None, progress_every: int = 10,
+              output_format: str = 'records', compression: str = 'none') -> Dict[str, Any]:
+    """
+    Parses every PDF of `directory` on `workers` processes and returns the run summary.
+    At most `workers * 2` documents are in flight, so huge directories do not pile up futures.
+    With `resume`, documents whose output file already exists are skipped.
+    """
+    os.makedirs(output, exist_ok=True)
+    documents = find_documents(directory, recursive)
+    suffix = output_suffix(output_format, compression)
+    todo = [(path, output_path_for(path, directory, output, suffix)) for path in documents]
+    if resume:
+        todo = [(path, out) for path, out in todo if not os.path.exists(out)]
+    skipped = len(documents) - len(todo)
+    logger.info(f"{len(documents)} documents found, {len(todo)} to parse ({skipped} already done) "
+                f"on {workers} workers.")
+
+    summary = {'documents': len(todo), 'skipped': skipped, 'done': 0, 'errors': 0, 'tables': 0}
+    started = time.perf_counter()
+    with open(os.path.join(output, 'manifest.jsonl'), 'a', encoding='utf-8') as manifest, \
+            ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                initargs=(engine, output_format, compression)) as pool:
+        queue = iter(todo)
+        in_flight = set()
+        completed = 0
+        while True:
+            for path, out in queue:
+                in_flight.add(pool.submit(parse_one, path, out))
+                if len(in_flight) >= workers * 2:
+                    break
+            if not in_flight:
+                break
+            finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in finished:
+                result = future.result()
+                manifest.write(json.dumps(result) + '\n')
+                completed += 1
+                if result['status'] == 'DONE':
+                    summary['done'] += 1
+                    summary['tables'] += result['tables']
+                else:
+                    summary['errors'] += 1
+                    logger.error(f"{result['file']}: {result['error']}")
+                if completed % progress_every == 0 or completed == len(todo):
+                    _report_progress(completed, len(todo), summary, time.perf_counter() - started)
+            manifest.flush()
+
+    elapsed = time.perf_counter() - started
+    summary['seconds'] = round(elapsed, 3)
+    summary['documents_per_second'] = round(completed / elapsed, 3) if elapsed else 0.0
+    summary['tables_per_second'] = round(summary['tables'] / elapsed, 3) if elapsed else 0.0
+    return summary
+
+
+def _report_progress(completed: int, total: int, summary: Dict[str, Any], elapsed: float):
+    rate = completed / elapsed if elapsed else 0.0
+    eta = (total - completed) / rate if rate else 0.0
+    logger.info(f"[{completed}/{total}] {rate:.2f} docs/s, {summary['tables'] / elapsed if elapsed else 0:.1f} tables/s, "
+                f"{summary['errors']} errors, ETA {eta:.0f}s")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Parse a directory of Centrale Rischi PDFs in bulk.")
+    parser.add_argument("directory", help="Directory containing the PDF reports")
+    parser.add_argument("--output", "-o", required=True, help="Directory for the JSON results and manifest.jsonl")
+    parser.add_argument("--workers", "-w", type=int, default=os.cpu_count() or 1, help="Worker processes")
+    parser.add_argument("--recursive", "-r", action="store_true", help="Also parse PDFs in subdirectories")
+    parser.add_argument("--no-resume", action="store_true", help="Re-parse documents that already have a result")
+    parser.add_argument("--engine", choices=["auto", "camelot"], help="Table extraction engine")
+    parser.add_argument("--progress-every", type=int, default=10, help="Report progress every N documents")
+    parser.add_argument("--format", choices=OUTPUT_FORMATS, default="records",
+                        help="Table layout of the results ('rows'/'columns' are compact, 'parquet' needs pyarrow)")
+    parser.add_argument("--compress", choices=["none", "gzip", "zstd"], default="none", help="Compression of JSON results")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    summary = run_batch(args.directory, args.output, args.workers, args.recursive,
+                        resume=not args.no_resume, engine=args.engine, progress_every=args.progress_every,
+                        output_format=args.format, compression=args.compress)
+    logger.info(f"Batch finished: {json.dumps(summary)}")
+    return 1 if summary['errors'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
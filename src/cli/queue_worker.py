@@ -0,0 +1,47 @@
+"""
+Job queue worker: a parsing node without the HTTP API.
+
+Pulls documents from the durable job queue (PARSER_JOB_QUEUE) and parses them on the local job
+executor, exactly like an API worker in queue mode does, so extra capacity can be added next to
+the API containers by starting more of these against the same queue.
+
+Usage:
+    PARSER_JOB_QUEUE=sqlite:////app/queue/jobs.sqlite3 python src/cli/queue_worker.py
+"""
+import os
+import sys
+import signal
+import logging
+import threading
+
+# The API module wires the queue consumer to the executor, the status table and the webhooks
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../api')))
+
+logger = logging.getLogger("queue_worker")
+
+
+def main() -> int:
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+    import app
+    from job_queue import JOB_QUEUE_URL
+
+    if app.queue_consumer is None:
+        logger.error("PARSER_JOB_QUEUE is not set: there is no queue to consume.")
+        return 2
+
+    stop = threading.Event()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda *_: stop.set())
+
+    app.registry.start()
+    app.default_executor.warm_up(timeout=120)
+    app.queue_consumer.start()
+    logger.info(f"Consuming {JOB_QUEUE_URL} with {app.default_executor.max_workers} worker processes.")
+    stop.wait()
+    # Running jobs finish (and settle their leases) in the exit handlers; queued ones stay queued
+    logger.info("Stopping: no new jobs will be leased.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
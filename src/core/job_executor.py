@@ -0,0 +1,230 @@
+import os
+import signal
+import atexit
+import logging
+import importlib
+import threading
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+# --- CONFIGURATION (overridable via environment) ---
+# API worker processes of this node (Gunicorn 'workers'), each of which owns an executor.
+API_WORKERS = max(1, int(os.environ.get("GUNICORN_WORKERS", 4)))
+# Camelot lattice parsing is CPU-bound, so the node's cores are split between the API workers'
+# pools: together they run one parsing process per core, and back-pressure (429) starts there.
+MAX_WORKERS = int(os.environ.get("PARSER_MAX_WORKERS", max(1, (os.cpu_count() or 1) // API_WORKERS)))
+# Number of accepted jobs allowed to wait for a free worker before new uploads are refused.
+QUEUE_SIZE = int(os.environ.get("PARSER_QUEUE_SIZE", MAX_WORKERS * 4))
+# Hard wall-clock limit for a single parsing job (seconds). 0 disables the limit.
+JOB_TIMEOUT = int(os.environ.get("PARSER_JOB_TIMEOUT", 900))
+# Hint returned to clients (Retry-After header) when the queue is full.
+RETRY_AFTER = int(os.environ.get("PARSER_RETRY_AFTER", 30))
+# How worker processes are started ('fork', 'forkserver', 'spawn'; empty = platform default).
+# Forkserver by default where available: the API worker runs threads (metrics flush, webhooks,
+# queue consumer), and a process forked from it while another thread holds a lock (logging, malloc)
+# can hang. The fork server is single-threaded and preloads WARM_MODULES, so workers still start warm.
+START_METHOD = os.environ.get("PARSER_START_METHOD",
+                              "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "")
+# Modules every worker process imports when it starts, so the first job does not pay for them.
+WARM_MODULES = tuple(m for m in os.environ.get("PARSER_WARM_MODULES", "parser_engine").split(",") if m)
+# Import the parsing stack in the API process itself (before Gunicorn forks its workers with
+# preload_app), so workers and their pool processes share it copy-on-write.
+PARSER_PRELOAD = os.environ.get("PARSER_PRELOAD", "false").lower() in ("1", "true", "yes")
+
+
+class QueueFullError(Exception):
+    """Raised when the executor has no free worker and the waiting queue is full."""
+
+
+class ExecutorShutdownError(Exception):
+    """Raised when a job is submitted while the executor is draining or stopped."""
+
+
+class JobTimeoutError(BaseException):
+    """
+    Raised inside a worker process when a job exceeds its time limit.
+    Derives from BaseException so the broad `except Exception` blocks in the
+    parsing stages cannot swallow it and report a partial result as success.
+    """
+
+
+def _raise_job_timeout(signum, frame):
+    raise JobTimeoutError("Job exceeded its time limit.")
+
+
+def import_modules(modules: Iterable[str]):
+    """Pool initializer: imports `modules` once per worker process (already loaded ones are free)."""
+    for module in modules:
+        try:
+            importlib.import_module(module)
+        except ImportError as e:
+            logger.warning(f"Worker could not preload {module}: {e}")
+
+
+def _noop():
+    """Warm-up probe."""
+
+
+def _run_with_timeout(fn: Callable, timeout: int, args: tuple) -> Any:
+    """
+    Worker-side wrapper. Pool workers execute jobs on their main thread,
+    so a SIGALRM interval timer can interrupt a job that runs too long.
+    """
+    if not timeout:
+        return fn(*args)
+
+    previous_handler = signal.signal(signal.SIGALRM, _raise_job_timeout)
+    signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        return fn(*args)
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous_handler)
+
+
+class JobExecutor:
+    """
+    Bounded process pool for long-running parsing jobs.
+    At most `max_workers` jobs run concurrently and at most `queue_size` more wait;
+    anything beyond that is refused immediately (admission control) instead of
+    piling up threads and memory inside the web worker.
+    """
+    def __init__(self, max_workers: int = MAX_WORKERS, queue_size: int = QUEUE_SIZE,
+                 job_timeout: int = JOB_TIMEOUT, initializer: Optional[Callable] = None,
+                 initargs: tuple = (), start_method: str = START_METHOD):
+        self.max_workers = max(1, max_workers)
+        self.queue_size = max(0, queue_size)
+        self.job_timeout = job_timeout
+        self.initializer = initializer
+        self.initargs = initargs
+        self.start_method = start_method or None
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_pid: Optional[int] = None
+        self._slots = threading.BoundedSemaphore(self.max_workers + self.queue_size)
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._accepting = True
+        self._release_callbacks = []
+
+    @property
+    def capacity(self) -> int:
+        """Total number of jobs (running + waiting) the executor admits."""
+        return self.max_workers + self.queue_size
+
+    @property
+    def pending(self) -> int:
+        """Number of admitted jobs that have not finished yet."""
+        return self._pending
+
+    @property
+    def active(self) -> int:
+        """Admitted jobs currently running (at most one per worker process)."""
+        return min(self._pending, self.max_workers)
+
+    @property
+    def queued(self) -> int:
+        """Admitted jobs waiting for a free worker process."""
+        return self._pending - self.active
+
+    @property
+    def accepting(self) -> bool:
+        return self._accepting
+
+    @property
+    def saturated(self) -> bool:
+        """True when every worker is busy and the waiting queue is full (the next submit would fail)."""
+        return self._pending >= self.capacity
+
+    def add_release_callback(self, fn: Callable[[], None]):
+        """Registers `fn()` to run each time a job finishes and frees its slot (in the thread that completed it)."""
+        self._release_callbacks.append(fn)
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        # The pool is created lazily so importing the API module never forks. A pool inherited
+        # through fork (e.g. from a preloading Gunicorn master) belongs to the parent: start our own.
+        if self._pool is None or self._pool_pid != os.getpid():
+            context = multiprocessing.get_context(self.start_method)
+            if context.get_start_method() == 'forkserver' and self.initargs:
+                # The fork server imports the modules once; workers are forked from it warm
+                context.set_forkserver_preload(list(self.initargs[0]))
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=context,
+                                             initializer=self.initializer, initargs=self.initargs)
+            self._pool_pid = os.getpid()
+            logger.info(f"Job executor started with {self.max_workers} worker processes "
+                        f"({context.get_start_method()}).")
+        return self._pool
+
+    def warm_up(self, timeout: Optional[float] = None) -> bool:
+        """
+        Starts the worker processes ahead of the first job (running the initializer in each)
+        and waits for them. Returns False if they were not all ready within `timeout`.
+        """
+        with self._lock:
+            if not self._accepting:
+                return False
+            pool = self._get_pool()
+            probes = [pool.submit(_noop) for _ in range(self.max_workers)]
+        done, not_done = wait(probes, timeout=timeout)
+        logger.info(f"Job executor warmed up ({len(done)}/{len(probes)} probes answered).")
+        return not not_done
+
+    def submit(self, fn: Callable, *args: Any) -> Future:
+        """
+        Schedules `fn(*args)` on a worker process.
+        Raises QueueFullError when no slot is free and ExecutorShutdownError while draining.
+        """
+        if not self._accepting:
+            raise ExecutorShutdownError("Executor is shutting down.")
+        if not self._slots.acquire(blocking=False):
+            raise QueueFullError(f"All {self.capacity} job slots are in use.")
+
+        try:
+            with self._lock:
+                if not self._accepting:
+                    raise ExecutorShutdownError("Executor is shutting down.")
+                try:
+                    future = self._get_pool().submit(_run_with_timeout, fn, self.job_timeout, args)
+                except BrokenProcessPool:
+                    # A worker process died (e.g. OOM-killed) and took the pool down: start a new one
+                    logger.warning("Job executor pool is broken, restarting its worker processes.")
+                    self._pool = None
+                    future = self._get_pool().submit(_run_with_timeout, fn, self.job_timeout, args)
+                self._pending += 1
+        except BaseException:
+            self._slots.release()
+            raise
+
+        future.add_done_callback(self._release_slot)
+        return future
+
+    def _release_slot(self, future: Future):
+        with self._lock:
+            self._pending -= 1
+        self._slots.release()
+        for fn in self._release_callbacks:
+            try:
+                fn()
+            except Exception as e:
+                logger.exception(f"Job executor release callback failed: {e}")
+
+    def shutdown(self, wait: bool = True):
+        """
+        Stops admitting new jobs. With `wait=True` the call blocks until every
+        admitted job (running or queued) has finished (graceful drain).
+        """
+        with self._lock:
+            self._accepting = False
+            pool = self._pool
+        if pool is not None:
+            logger.info(f"Draining job executor ({self._pending} jobs pending)...")
+            pool.shutdown(wait=wait, cancel_futures=not wait)
+            logger.info("Job executor stopped.")
+
+
+# Process-wide executor used by the API layer
+default_executor = JobExecutor(initializer=import_modules, initargs=(WARM_MODULES,))
+atexit.register(default_executor.shutdown)
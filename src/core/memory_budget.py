@@ -0,0 +1,100 @@
+import os
+import gc
+import ctypes
+import ctypes.util
+import logging
+from typing import Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+# --- CONFIGURATION (overridable via environment) ---
+# Resident memory (MB) a parsing job may use before it is rejected (0 = no budget).
+# Size it so that (API workers x parsing workers x budget) fits the container limit.
+JOB_MEMORY_MB = int(os.environ.get("PARSER_JOB_MEMORY_MB", 0))
+# Fraction of the budget above which the parser shrinks its window of pages in flight.
+MEMORY_PRESSURE = float(os.environ.get("PARSER_MEMORY_PRESSURE", 0.8))
+
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def _load_libc():
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6')
+        return libc if hasattr(libc, 'malloc_trim') else None
+    except OSError:
+        return None
+
+
+_libc = _load_libc()
+
+
+def rss_bytes(pid: str = 'self') -> int:
+    """Current resident set size of a process (0 where /proc is not available or it exited)."""
+    try:
+        with open(f'/proc/{pid}/statm') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        return 0
+
+
+def pss_bytes(pid: int) -> int:
+    """
+    Proportional set size of a process: pages it shares (e.g. the parsing stack a forked worker
+    inherited) count for their share only. Falls back to the RSS without smaps_rollup.
+    """
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            for line in f:
+                if line.startswith('Pss:'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, IndexError, ValueError):
+        pass
+    return rss_bytes(str(pid))
+
+
+def job_memory_bytes(worker_pids: Iterable[int] = ()) -> int:
+    """Memory of a job: this process's RSS plus the proportional size of its extraction workers."""
+    return rss_bytes() + sum(pss_bytes(pid) for pid in worker_pids)
+
+
+class MemoryBudgetError(MemoryError):
+    """Raised when a job needs more memory than its budget, before the container runs out."""
+
+
+class MemoryBudget(object):
+    """
+    Per-job resident memory budget, checked by the parser before it starts extracting more pages.
+    `check()` reports OK, PRESSURE (above `pressure` x limit: work in smaller windows) or OVER
+    (still above the limit after freeing what the process can give back to the OS). The job's
+    memory includes its extraction worker processes (`worker_pids`) in parallel mode.
+    """
+    OK, PRESSURE, OVER = 'ok', 'pressure', 'over'
+
+    def __init__(self, limit_mb: int = JOB_MEMORY_MB, pressure: float = MEMORY_PRESSURE):
+        self.limit_bytes = limit_mb * 1024 * 1024
+        self.pressure_bytes = int(self.limit_bytes * pressure)
+
+    def check(self, worker_pids: Iterable[int] = ()) -> str:
+        worker_pids = list(worker_pids)
+        used = job_memory_bytes(worker_pids)
+        if used <= self.pressure_bytes:
+            return self.OK
+        if used > self.limit_bytes:
+            # Freed DataFrames and rasters often stay in the allocator's arenas: hand them back first
+            gc.collect()
+            if _libc is not None:
+                _libc.malloc_trim(0)
+            used = job_memory_bytes(worker_pids)
+            if used > self.limit_bytes:
+                return self.OVER
+        return self.PRESSURE if used > self.pressure_bytes else self.OK
+
+    def describe(self, worker_pids: Iterable[int] = ()) -> str:
+        worker_pids = list(worker_pids)
+        workers = f" with {len(worker_pids)} extraction workers" if worker_pids else ""
+        return (f"{job_memory_bytes(worker_pids) / 2 ** 20:.0f} MB resident{workers}, "
+                f"budget {self.limit_bytes / 2 ** 20:.0f} MB")
+
+
+# Budget applied by FinancialReportParser (None when PARSER_JOB_MEMORY_MB is not set)
+default_memory_budget: Optional[MemoryBudget] = MemoryBudget() if JOB_MEMORY_MB > 0 else None
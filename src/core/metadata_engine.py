@@ -0,0 +1,71 @@
+import os
+import re
+import sys
+import logging
+from typing import Dict, Iterable, Optional
+
+# Make the repository root importable so the shared `config` package can be found
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+from config.parser_config import METADATA_RULES
+
+logger = logging.getLogger(__name__)
+
+
+def _field_name(rule_name: str) -> str:
+    """Maps a rule key to its output field (e.g. 'VAT_CODE_PATTERN' -> 'vat_code')."""
+    return re.sub(r'_PATTERN$', '', rule_name).lower()
+
+
+class MetadataExtractor:
+    """
+    Applies METADATA_RULES to the text of a report in a single pass.
+
+    All rules are compiled once into one alternation. Every rule is wrapped in a
+    lookahead, so a long match of one rule can never hide the start of another,
+    and the scan stops as soon as every field has been found.
+    """
+    def __init__(self, rules: Dict[str, str] = METADATA_RULES):
+        self.fields = [_field_name(name) for name in rules]
+        alternatives = []
+        # Maps the named group of each rule to (field, index of the value group)
+        self._groups: Dict[str, tuple] = {}
+        group_index = 1
+        for i, (name, pattern) in enumerate(rules.items()):
+            group_name = f"rule{i}"
+            inner_groups = re.compile(pattern).groups
+            value_index = group_index + 1 if inner_groups else group_index
+            self._groups[group_name] = (self.fields[i], value_index)
+            alternatives.append(f"(?=(?P<{group_name}>{pattern}))")
+            group_index += 1 + inner_groups
+        self._pattern = re.compile('|'.join(alternatives))
+
+    def scan(self, text: str, found: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+        """
+        Scans one text in a single pass, adding fields not found yet to `found`.
+        The first occurrence of each field wins.
+        """
+        found = {} if found is None else found
+        for match in self._pattern.finditer(text):
+            field, value_index = self._groups[match.lastgroup]
+            if field not in found:
+                found[field] = match.group(value_index).strip()
+                if len(found) == len(self.fields):
+                    break
+        return found
+
+    def extract(self, texts: Iterable[str]) -> Dict[str, Optional[str]]:
+        """
+        Extracts all metadata fields from an iterable of page texts.
+        Pages are consumed lazily: once every field is found, later pages are never read.
+        Missing fields are returned as None.
+        """
+        found: Dict[str, str] = {}
+        for text in texts:
+            self.scan(text, found)
+            if len(found) == len(self.fields):
+                break
+        return {field: found.get(field) for field in self.fields}
+
+
+# Rules are compiled once, at import time
+default_extractor = MetadataExtractor()
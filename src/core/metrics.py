@@ -0,0 +1,318 @@
+import os
+import json
+import time
+import atexit
+import bisect
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Default latency buckets (seconds), from sub-millisecond stages up to long parsing jobs
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 900)
+
+# --- CONFIGURATION (overridable via environment) ---
+# Directory shared by the processes of a node (the Gunicorn workers), where each one publishes
+# its metrics; /metrics merges them, so whichever worker is scraped reports the whole node.
+# Empty = every process only reports its own metrics. gunicorn.conf.py sets it for the API.
+METRICS_DIR = os.environ.get("PARSER_METRICS_DIR", "")
+# Seconds between two publications of a process's metrics to METRICS_DIR.
+METRICS_FLUSH_INTERVAL = float(os.environ.get("PARSER_METRICS_FLUSH_INTERVAL", 1.0))
+
+
+class StageTimings(object):
+    """
+    Accumulates wall time per named stage of a pipeline run.
+    Plain dict underneath, so a breakdown can be returned from a worker process and stored as-is.
+    """
+    def __init__(self):
+        self.seconds: Dict[str, float] = {}
+
+    @contextmanager
+    def measure(self, stage: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - started)
+
+    def add(self, stage: str, seconds: float):
+        self.seconds[stage] = self.seconds.get(stage, 0.0) + seconds
+
+    def merge(self, other: Dict[str, float]):
+        for stage, seconds in other.items():
+            self.add(stage, seconds)
+
+    def as_dict(self, digits: int = 4) -> Dict[str, float]:
+        return {stage: round(seconds, digits) for stage, seconds in self.seconds.items()}
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], le: Optional[str] = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if le is not None:
+        pairs.append(f'le="{le}"')
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class _Metric(object):
+    kind = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def state(self) -> Any:
+        """JSON-serializable values of the metric, as published to the metrics directory."""
+        raise NotImplementedError
+
+    def merge(self, states: List[Any]) -> Any:
+        """Combines the states published by several processes into one."""
+        raise NotImplementedError
+
+    def samples(self, state: Any = None) -> Iterator[str]:
+        raise NotImplementedError
+
+    def render(self, state: Any = None) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples(state))
+        return '\n'.join(lines)
+
+
+class Counter(_Metric):
+    """Monotonically increasing count, optionally split by labels."""
+    kind = 'counter'
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def state(self) -> List[list]:
+        with self._lock:
+            return [[list(key), value] for key, value in self._values.items()]
+
+    def merge(self, states: List[Any]) -> List[list]:
+        totals: Dict[Tuple[str, ...], float] = {}
+        for state in states:
+            for key, value in state:
+                totals[tuple(key)] = totals.get(tuple(key), 0.0) + value
+        return [[list(key), value] for key, value in totals.items()]
+
+    def samples(self, state: Any = None) -> Iterator[str]:
+        items = sorted((tuple(key), value) for key, value in (self.state() if state is None else state))
+        for key, value in items:
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {value:g}"
+
+
+class Gauge(_Metric):
+    """
+    Current value; either set explicitly or read from a callback at scrape time.
+    Across processes, the values of the live ones are summed (`mode='sum'`, e.g. running jobs),
+    or the largest is kept (`mode='max'`, for values every process reads from a shared source).
+    """
+    kind = 'gauge'
+
+    def __init__(self, name: str, documentation: str, function: Optional[Callable[[], float]] = None,
+                 mode: str = 'sum'):
+        super().__init__(name, documentation)
+        self._value = 0.0
+        self._function = function
+        self.mode = mode
+
+    def set(self, value: float):
+        self._value = value
+
+    def set_function(self, function: Callable[[], float]):
+        self._function = function
+
+    def value(self) -> float:
+        return float(self._function()) if self._function else self._value
+
+    def state(self) -> float:
+        return self.value()
+
+    def merge(self, states: List[Any]) -> float:
+        return (max if self.mode == 'max' else sum)(states) if states else 0.0
+
+    def samples(self, state: Any = None) -> Iterator[str]:
+        yield f"{self.name} {self.value() if state is None else state:g}"
+
+
+class Histogram(_Metric):
+    """Cumulative bucket counts, sum and count of observations, optionally split by labels."""
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label key -> [bucket counts..., +Inf count], sum
+        self._series: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._series.setdefault(key, ([0] * (len(self.buckets) + 1), [0.0]))
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            total[0] += value
+
+    @contextmanager
+    def time(self, **labels: str):
+        """Observes the wall time of the enclosed block."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def count(self, **labels: str) -> int:
+        series = self._series.get(self._key(labels))
+        return sum(series[0]) if series else 0
+
+    def state(self) -> List[list]:
+        with self._lock:
+            return [[list(key), list(counts), total[0]] for key, (counts, total) in self._series.items()]
+
+    def merge(self, states: List[Any]) -> List[list]:
+        merged: Dict[Tuple[str, ...], list] = {}
+        for state in states:
+            for key, counts, total in state:
+                series = merged.setdefault(tuple(key), [[0] * len(counts), 0.0])
+                series[0] = [a + b for a, b in zip(series[0], counts)]
+                series[1] += total
+        return [[list(key), counts, total] for key, (counts, total) in merged.items()]
+
+    def samples(self, state: Any = None) -> Iterator[str]:
+        items = sorted((tuple(key), (counts, total))
+                       for key, counts, total in (self.state() if state is None else state))
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else f'{bound:g}'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, key)} {total:g}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}"
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class Registry(object):
+    """
+    Holds the metrics of a process and renders them in the Prometheus text exposition format.
+
+    With a `directory`, every process that called `start()` publishes its metrics there
+    (one JSON file per pid, rewritten every METRICS_FLUSH_INTERVAL seconds and at exit), and
+    `render()` merges all of them: counters and histograms add up, including those of exited
+    processes so totals never go backwards when a worker is replaced; gauges only count the
+    processes still alive.
+    """
+    def __init__(self, directory: str = ''):
+        self._metrics: Dict[str, _Metric] = {}
+        self.directory = directory
+        self._flusher_pid = None
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, function: Optional[Callable[[], float]] = None,
+              mode: str = 'sum') -> Gauge:
+        return self.register(Gauge(name, documentation, function, mode))
+
+    def histogram(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def _path(self, pid: int) -> str:
+        return os.path.join(self.directory, f"metrics-{pid}.json")
+
+    def flush(self):
+        """Publishes this process's metrics to the directory (atomically replacing its previous file)."""
+        if not self.directory:
+            return
+        path = self._path(os.getpid())
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({name: metric.state() for name, metric in self._metrics.items()}, f)
+        os.replace(tmp_path, path)
+
+    def start(self):
+        """Starts publishing this process's metrics (idempotent; call it in every worker process)."""
+        if not self.directory or self._flusher_pid == os.getpid():
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        self._flusher_pid = os.getpid()
+        self.flush()
+        atexit.register(self.flush)
+        threading.Thread(target=self._flush_periodically, name='metrics-flush', daemon=True).start()
+
+    def _flush_periodically(self):
+        pid = os.getpid()
+        while True:
+            time.sleep(METRICS_FLUSH_INTERVAL)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.warning(f"Could not publish the metrics of process {pid}: {e}")
+
+    def collect(self) -> Dict[str, Any]:
+        """Merged state of every metric: over all published processes, or of this process alone."""
+        own = {name: metric.state() for name, metric in self._metrics.items()}
+        if not self.directory or self._flusher_pid != os.getpid():
+            return own
+        published: Dict[str, List[Any]] = {name: [state] for name, state in own.items()}
+        for filename in os.listdir(self.directory):
+            if not (filename.startswith('metrics-') and filename.endswith('.json')):
+                continue
+            pid = int(filename[len('metrics-'):-len('.json')])
+            if pid == os.getpid():
+                continue
+            try:
+                with open(os.path.join(self.directory, filename)) as f:
+                    states = json.load(f)
+            except (OSError, ValueError):
+                continue
+            alive = _alive(pid)
+            for name, state in states.items():
+                metric = self._metrics.get(name)
+                if metric is not None and (alive or metric.kind != 'gauge'):
+                    published[name].append(state)
+        return {name: self._metrics[name].merge(states) for name, states in published.items()}
+
+    def render(self) -> str:
+        states = self.collect()
+        return '\n'.join(metric.render(states[name]) for name, metric in self._metrics.items()) + '\n'
+
+
+# Process-wide registry. With PARSER_METRICS_DIR (set by gunicorn.conf.py) it reports the whole node.
+registry = Registry(METRICS_DIR)
@@ -0,0 +1,125 @@
+import os
+import json
+import time
+import zlib
+import sqlite3
+import logging
+import threading
+from typing import Any, Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+# --- CONFIGURATION (overridable via environment) ---
+# SQLite file holding extracted tables by page fingerprint (empty = cache disabled).
+# Point it at a persistent volume so month-over-month reports reuse unchanged pages.
+PAGE_CACHE_PATH = os.environ.get("PARSER_PAGE_CACHE_PATH", "")
+# Size budget of the cached payloads (MB); least recently used pages are evicted beyond it.
+PAGE_CACHE_MB = int(os.environ.get("PARSER_PAGE_CACHE_MB", 512))
+
+
+class PageCache(object):
+    """
+    Persistent, size-bounded LRU cache of per-page extraction results.
+
+    Entries are keyed by a page fingerprint and hold a JSON-serializable value
+    (stored zlib-compressed). The cache lives in a SQLite file in WAL mode, so the
+    worker processes of the API can read and write it concurrently; every process
+    (and thread) opens its own connection lazily. Triggers keep the total payload size
+    in a meta row, so a put only evicts (oldest first) once that total exceeds the budget.
+    """
+    def __init__(self, path: str, max_bytes: int = PAGE_CACHE_MB * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute('CREATE TABLE IF NOT EXISTS pages ('
+                               'fingerprint TEXT PRIMARY KEY, payload BLOB NOT NULL, '
+                               'size INTEGER NOT NULL, last_used REAL NOT NULL)')
+            connection.execute('CREATE INDEX IF NOT EXISTS pages_last_used ON pages (last_used)')
+            with connection:
+                connection.execute('BEGIN IMMEDIATE')
+                connection.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)')
+                if connection.execute("SELECT 1 FROM meta WHERE key = 'total_bytes'").fetchone() is None:
+                    # First open (or a cache file from before the running total): count it once
+                    connection.execute("INSERT INTO meta SELECT 'total_bytes', COALESCE(SUM(size), 0) FROM pages")
+                for event, delta in (('INSERT', 'NEW.size'), ('DELETE', '-OLD.size'),
+                                     ('UPDATE OF size', 'NEW.size - OLD.size')):
+                    name = 'pages_total_' + event.split()[0].lower()
+                    connection.execute(f"CREATE TRIGGER IF NOT EXISTS {name} AFTER {event} ON pages BEGIN "
+                                       f"UPDATE meta SET value = value + {delta} WHERE key = 'total_bytes'; END")
+            self._local.connection, self._local.pid = connection, os.getpid()
+        return connection
+
+    def get_many(self, fingerprints: Iterable[str]) -> Dict[str, Any]:
+        """Returns the cached values found for `fingerprints` and marks them as recently used."""
+        keys = list(dict.fromkeys(fingerprints))
+        found = {}
+        connection = self._connection()
+        # Stay well under SQLite's bound-parameter limit
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            placeholders = ','.join('?' * len(chunk))
+            rows = connection.execute(
+                f'SELECT fingerprint, payload FROM pages WHERE fingerprint IN ({placeholders})', chunk).fetchall()
+            for fingerprint, payload in rows:
+                found[fingerprint] = json.loads(zlib.decompress(payload))
+            if rows:
+                hits = [fingerprint for fingerprint, _ in rows]
+                connection.execute(f"UPDATE pages SET last_used = ? WHERE fingerprint IN ({','.join('?' * len(hits))})",
+                                   [time.time(), *hits])
+        return found
+
+    def put_many(self, entries: Dict[str, Any]):
+        """Stores values by fingerprint, then evicts least recently used entries over the size budget."""
+        if not entries:
+            return
+        now = time.time()
+        rows = []
+        for fingerprint, value in entries.items():
+            payload = zlib.compress(json.dumps(value, separators=(',', ':')).encode('utf-8'))
+            rows.append((fingerprint, payload, len(payload), now))
+
+        connection = self._connection()
+        evicted = 0
+        with connection:
+            connection.execute('BEGIN IMMEDIATE')
+            # An upsert (not REPLACE) so the UPDATE trigger keeps the running total exact
+            connection.executemany('INSERT INTO pages VALUES (?, ?, ?, ?) ON CONFLICT (fingerprint) DO UPDATE SET '
+                                   'payload = excluded.payload, size = excluded.size, last_used = excluded.last_used',
+                                   rows)
+            excess = self.total_bytes() - self.max_bytes
+            while excess > 0:
+                # Walk the last_used index from the oldest entry until enough space is freed
+                victims = []
+                for fingerprint, size in connection.execute(
+                        'SELECT fingerprint, size FROM pages ORDER BY last_used LIMIT 256'):
+                    victims.append(fingerprint)
+                    excess -= size
+                    if excess <= 0:
+                        break
+                if not victims:
+                    break
+                connection.execute(f"DELETE FROM pages WHERE fingerprint IN ({','.join('?' * len(victims))})",
+                                   victims)
+                evicted += len(victims)
+        if evicted:
+            logger.info(f"Page cache evicted {evicted} least recently used pages.")
+
+    def total_bytes(self) -> int:
+        """Size of the cached payloads (running total maintained by triggers)."""
+        return self._connection().execute("SELECT value FROM meta WHERE key = 'total_bytes'").fetchone()[0]
+
+    def __len__(self) -> int:
+        return self._connection().execute('SELECT COUNT(*) FROM pages').fetchone()[0]
+
+
+# Process-wide cache used by FinancialReportParser (None when no path is configured)
+default_page_cache: Optional[PageCache] = PageCache(PAGE_CACHE_PATH) if PAGE_CACHE_PATH else None
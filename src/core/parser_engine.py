@@ -1,39 +1,448 @@
 import camelot
 import fitz  # PyMuPDF
 import os
+import re
+import sys
+import bisect
+import time
+import hashlib
 import logging
 import pandas as pd
-from typing import List, Dict, Any
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple
+
+from utils.data_utils import chunker, parse_page_range, clean_tables, frame_to_content, RESULT_FORMATS
+from metadata_engine import default_extractor
+from page_cache import PageCache, default_page_cache
+from memory_budget import MemoryBudget, MemoryBudgetError, default_memory_budget
+from metrics import StageTimings
+
+# Make the repository root importable so the shared `config` package can be found
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+from config.parser_config import TABLE_RULES, PARSER_VERSION
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-class ConversionBackend(object):
+# --- EXTRACTION TUNING (overridable via environment) ---
+# Worker processes used to extract page shards in parallel (1 = serial extraction).
+# Keep this at 1 when the API already runs one parsing job per core.
+EXTRACTION_WORKERS = int(os.environ.get("PARSER_EXTRACTION_WORKERS", 1))
+# Number of pages handed to each worker in a single Camelot call.
+SHARD_SIZE = int(os.environ.get("PARSER_SHARD_SIZE", 4))
+# Shards extracted ahead of the consumer when extracting in parallel (0 = twice the workers).
+# Bounds how many pages' results wait in memory; halved (with the shard size) under memory pressure.
+WINDOW_SHARDS = int(os.environ.get("PARSER_WINDOW_SHARDS", 0))
+# Rasterization settings for lattice line detection (grayscale is enough to find ruling lines).
+RASTER_DPI = int(os.environ.get("PARSER_RASTER_DPI", 72))
+RASTER_GRAYSCALE = os.environ.get("PARSER_RASTER_GRAYSCALE", "true").lower() == "true"
+# Maximum number of rendered pages kept in memory per job.
+RASTER_CACHE_PAGES = int(os.environ.get("PARSER_RASTER_CACHE_PAGES", 8))
+
+_CAMELOT_PAGE_NAME = re.compile(r'^page-(\d+)\.pdf$')
+_WHITESPACE = re.compile(rb'\s+')
+
+# Region-of-interest tuning (PDF points): padding added around the text of a table so its
+# ruling lines fall inside the area, and the vertical gap that ends a table region.
+ROI_MARGIN = 24.0
+ROI_MAX_GAP = 30.0
+
+# Extraction engine: 'auto' rebuilds ruled tables from the PDF's vector drawings and only
+# falls back to Camelot (rasterization + line detection) for pages without a vector grid;
+# 'camelot' always uses Camelot.
+ENGINE = os.environ.get("PARSER_ENGINE", "auto").lower()
+# Coordinate tolerance (PDF points) when matching vector ruling lines.
+VECTOR_SNAP = 2.0
+# Layout of each table's 'content' (see data_utils.RESULT_FORMATS): 'records' keeps the original
+# one-dict-per-row output; 'rows' and 'columns' state the column labels once (about half the size).
+RESULT_FORMAT = os.environ.get("PARSER_RESULT_FORMAT", "records").lower()
+
+# Camelot options per flavor ('backend' and 'line_scale' are lattice-only arguments)
+FLAVOR_OPTIONS = {
+    'lattice': {'line_scale': 40},  # Adjust line detection sensitivity
+    'stream': {},
+}
+
+class PageRasterizer(object):
     """
-    Custom backend for Camelot to convert PDF pages to PNG using PyMuPDF (fitz).
+    Camelot image backend that rasterizes pages with PyMuPDF (fitz).
     This serves as a lightweight alternative to Ghostscript.
+
+    Camelot splits the document into single-page files named 'page-N.pdf' and asks the
+    backend to convert each one. Instead of reopening that file, the rasterizer keeps one
+    `fitz.Document` handle on the original report for the whole job, renders only page N
+    at the configured DPI/colorspace and keeps the encoded PNG in a bounded LRU cache,
+    so a page is never rendered twice while it is cached.
+
+    Camelot rewrites 'page-N.pdf' rotated when it detects a landscape page from its text; the
+    image must then match that file's geometry, not the original's, so such pages are
+    rendered from the file Camelot wrote.
     """
+    def __init__(self, file_path: str, dpi: int = RASTER_DPI, grayscale: bool = RASTER_GRAYSCALE,
+                 cache_size: int = RASTER_CACHE_PAGES):
+        self.file_path = file_path
+        self.dpi = dpi
+        self.colorspace = fitz.csGRAY if grayscale else fitz.csRGB
+        self.cache_size = max(1, cache_size)
+        self._cache: "OrderedDict[int, bytes]" = OrderedDict()
+        self._doc = None
+        # Time spent converting pages for Camelot (reported as the 'rasterization' stage)
+        self.convert_seconds = 0.0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Releases the document handle and every cached raster."""
+        self._cache.clear()
+        if self._doc is not None:
+            self._doc.close()
+            self._doc = None
+
+    def render(self, page_number: int) -> bytes:
+        """Returns the PNG bytes of a 1-based page, rendering it only on a cache miss."""
+        if page_number in self._cache:
+            self._cache.move_to_end(page_number)
+            return self._cache[page_number]
+
+        if self._doc is None:
+            self._doc = fitz.open(self.file_path)
+        pix = self._doc[page_number - 1].get_pixmap(dpi=self.dpi, colorspace=self.colorspace)
+        png_bytes = pix.tobytes("png")
+
+        self._cache[page_number] = png_bytes
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return png_bytes
+
+    def _same_geometry(self, page_number: int, page) -> bool:
+        """True when Camelot's single-page file has the size and rotation of the original page."""
+        if self._doc is None:
+            self._doc = fitz.open(self.file_path)
+        original = self._doc[page_number - 1]
+        return (page.rotation == original.rotation and
+                all(abs(a - b) < 0.5 for a, b in zip(page.rect, original.rect)))
+
     def convert(self, pdf_path, png_path):
+        started = time.perf_counter()
         try:
-            # Determine output filename based on the PDF path
-            output_name = os.path.splitext(pdf_path)[0] + '.png'
-            doc = fitz.open(pdf_path)
-            for page in doc:
-                pix = page.get_pixmap()
-                pix.save(output_name)
+            with fitz.open(pdf_path) as doc:
+                # Camelot names its single-page files 'page-N.pdf' after the source page number
+                match = _CAMELOT_PAGE_NAME.match(os.path.basename(pdf_path))
+                if match and self._same_geometry(int(match.group(1)), doc[0]):
+                    png_bytes = self.render(int(match.group(1)))
+                else:
+                    png_bytes = doc[0].get_pixmap(dpi=self.dpi, colorspace=self.colorspace).tobytes("png")
+
+            with open(png_path, 'wb') as f:
+                f.write(png_bytes)
             logger.debug(f"Converted {pdf_path} to PNG for Camelot processing.")
         except Exception as e:
-            logger.error(f"ConversionBackend Error: {e}")
+            logger.error(f"PageRasterizer Error: {e}")
             raise e
+        finally:
+            self.convert_seconds += time.perf_counter() - started
+
+class ExtractedTable(object):
+    """
+    Lightweight, picklable result of a table extraction.
+    Exposes the same `df` / `parsing_report` interface as a Camelot table, without
+    carrying the page raster and line segments Camelot keeps for plotting.
+    """
+    def __init__(self, df: pd.DataFrame, page: int, accuracy: float, flavor: str = 'lattice'):
+        self.df = df
+        self.page = page
+        self.accuracy = accuracy
+        self.flavor = flavor
+
+    @classmethod
+    def from_camelot(cls, table) -> 'ExtractedTable':
+        return cls(table.df, table.page, table.accuracy, table.flavor)
+
+    def to_cache(self) -> Dict[str, Any]:
+        """JSON form stored in the page cache (the raw, uncleaned cells)."""
+        return {'columns': self.df.columns.tolist(), 'data': self.df.values.tolist(),
+                'accuracy': self.accuracy, 'flavor': self.flavor}
+
+    @classmethod
+    def from_cache(cls, entry: Dict[str, Any], page: int) -> 'ExtractedTable':
+        return cls(pd.DataFrame(entry['data'], columns=entry['columns']), page, entry['accuracy'], entry['flavor'])
+
+    @property
+    def parsing_report(self) -> Dict[str, Any]:
+        return {'page': self.page, 'accuracy': self.accuracy, 'flavor': self.flavor}
+
+
+def _page_fingerprint(doc, page_number: int, flavor: str, regions: Optional[List[str]], engine: str) -> str:
+    """
+    Identifies a page's extraction result independently of the document it comes from:
+    the whitespace-normalized content stream, the text layer (covers font remapping) and
+    the raw streams of its images (scans share a trivial content stream), plus everything
+    else the result depends on (page geometry, flavor, regions, engine, parser version and
+    the extraction settings: raster DPI/colorspace, Camelot options, vector snapping).
+    """
+    page = doc[page_number - 1]
+    digest = hashlib.sha256()
+    settings = (RASTER_DPI, RASTER_GRAYSCALE, VECTOR_SNAP, sorted(FLAVOR_OPTIONS.get(flavor, {}).items()))
+    for part in (PARSER_VERSION, engine, flavor, repr(regions), repr(tuple(page.rect)), str(page.rotation),
+                 repr(settings)):
+        digest.update(part.encode('utf-8') + b'\0')
+    digest.update(_WHITESPACE.sub(b' ', page.read_contents()).strip() + b'\0')
+    digest.update(page.get_text().encode('utf-8') + b'\0')
+    for image in page.get_images(full=True):
+        digest.update(hashlib.sha256(doc.xref_stream_raw(image[0]) or b'').digest())
+    return digest.hexdigest()
+
+
+def _collect_segments(page) -> Tuple[List[tuple], List[tuple]]:
+    """
+    Collects ruling lines from the page's vector drawings.
+    Returns horizontal segments as (x0, x1, y) and vertical segments as (y0, y1, x).
+    Stroked rectangles (cell borders) contribute their four edges; filled-only
+    rectangles are shading unless thin enough to be a drawn line.
+    """
+    horizontal, vertical = [], []
+    for path in page.get_drawings():
+        stroked = path.get('color') is not None
+        for item in path['items']:
+            if item[0] == 'l':
+                p1, p2 = item[1], item[2]
+                if abs(p1.y - p2.y) <= VECTOR_SNAP and abs(p1.x - p2.x) > VECTOR_SNAP:
+                    horizontal.append((min(p1.x, p2.x), max(p1.x, p2.x), (p1.y + p2.y) / 2))
+                elif abs(p1.x - p2.x) <= VECTOR_SNAP and abs(p1.y - p2.y) > VECTOR_SNAP:
+                    vertical.append((min(p1.y, p2.y), max(p1.y, p2.y), (p1.x + p2.x) / 2))
+            elif item[0] == 're':
+                r = item[1]
+                if r.height <= VECTOR_SNAP and r.width > VECTOR_SNAP:
+                    horizontal.append((r.x0, r.x1, (r.y0 + r.y1) / 2))
+                elif r.width <= VECTOR_SNAP and r.height > VECTOR_SNAP:
+                    vertical.append((r.y0, r.y1, (r.x0 + r.x1) / 2))
+                elif stroked and r.width > VECTOR_SNAP and r.height > VECTOR_SNAP:
+                    horizontal.extend([(r.x0, r.x1, r.y0), (r.x0, r.x1, r.y1)])
+                    vertical.extend([(r.y0, r.y1, r.x0), (r.y0, r.y1, r.x1)])
+    return horizontal, vertical
+
+
+def _snap(values: List[float]) -> List[float]:
+    """Merges coordinates closer than VECTOR_SNAP into a single sorted grid line."""
+    snapped = []
+    for value in sorted(values):
+        if not snapped or value - snapped[-1] > VECTOR_SNAP:
+            snapped.append(value)
+    return snapped
+
+
+def _group_segments(horizontal: List[tuple], vertical: List[tuple]) -> List[Tuple[List[tuple], List[tuple]]]:
+    """Groups intersecting segments into connected grids (one per table) with a union-find."""
+    parent = list(range(len(horizontal) + len(vertical)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    offset = len(horizontal)
+    for h_idx, (x0, x1, y) in enumerate(horizontal):
+        for v_idx, (y0, y1, x) in enumerate(vertical):
+            if x0 - VECTOR_SNAP <= x <= x1 + VECTOR_SNAP and y0 - VECTOR_SNAP <= y <= y1 + VECTOR_SNAP:
+                parent[find(h_idx)] = find(offset + v_idx)
+
+    groups: Dict[int, Tuple[List[tuple], List[tuple]]] = {}
+    for h_idx, segment in enumerate(horizontal):
+        groups.setdefault(find(h_idx), ([], []))[0].append(segment)
+    for v_idx, segment in enumerate(vertical):
+        groups.setdefault(find(offset + v_idx), ([], []))[1].append(segment)
+    return list(groups.values())
+
+
+def _region_rects(page, table_regions: Optional[List[str]]) -> List[fitz.Rect]:
+    """Converts Camelot region strings (bottom-left origin) back to fitz rectangles."""
+    height = page.rect.height
+    rects = []
+    for region in table_regions or []:
+        x1, y1, x2, y2 = (float(v) for v in region.split(','))
+        rects.append(fitz.Rect(x1, height - y1, x2, height - y2))
+    return rects
+
+
+def _extract_vector_tables(page, page_number: int, table_regions: Optional[List[str]] = None) -> List[ExtractedTable]:
+    """
+    Vector fast path for born-digital pages: rebuilds each table grid from the ruling
+    lines drawn in the PDF and assigns words to cells by their coordinates, without
+    rasterizing the page. Returns an empty list when the page has no vector grid
+    (e.g. scans), so the caller can fall back to Camelot.
+    """
+    if page.rotation:
+        return []
+    horizontal, vertical = _collect_segments(page)
+    if len(horizontal) < 2 or len(vertical) < 2:
+        return []
+
+    words = page.get_text('words')
+    regions = _region_rects(page, table_regions)
+    grids = []
+    for h_segments, v_segments in _group_segments(horizontal, vertical):
+        ys = _snap([y for _, _, y in h_segments])
+        xs = _snap([x for _, _, x in v_segments])
+        if len(ys) < 2 or len(xs) < 2:
+            continue
+        bbox = fitz.Rect(xs[0], ys[0], xs[-1], ys[-1])
+        if regions and not any(bbox.intersects(region) for region in regions):
+            continue  # grid lies outside every region of interest (e.g. a decorative frame)
+        grids.append((ys, xs, bbox))
+
+    tables = []
+    # Top-most table first, as Camelot orders tables on a page
+    for ys, xs, bbox in sorted(grids, key=lambda grid: grid[0][0]):
+        cells = [[[] for _ in range(len(xs) - 1)] for _ in range(len(ys) - 1)]
+        placed, split = 0, 0
+        for x0, y0, x1, y1, text, block_no, line_no, _ in words:
+            cx, cy = (x0 + x1) / 2, (y0 + y1) / 2
+            if not (bbox.x0 < cx < bbox.x1 and bbox.y0 < cy < bbox.y1):
+                continue
+            row, col = bisect.bisect(ys, cy) - 1, bisect.bisect(xs, cx) - 1
+            cells[row][col].append(((block_no, line_no), text))
+            placed += 1
+            # A word crossing a ruling line is an extraction error (mirrors Camelot's accuracy)
+            if bisect.bisect(xs, x0 + VECTOR_SNAP) != bisect.bisect(xs, x1 - VECTOR_SNAP):
+                split += 1
+
+        data = []
+        for row in cells:
+            data.append(['\n'.join(' '.join(t for key, t in cell if key == line)
+                                   for line in dict.fromkeys(key for key, _ in cell))
+                         for cell in row])
+        accuracy = 100.0 * (1 - split / placed) if placed else 100.0
+        tables.append(ExtractedTable(pd.DataFrame(data), page_number, accuracy, flavor='vector'))
+    return tables
+
+
+def _extract_pages(file_path: str, page_numbers: List[int], flavor: str = 'lattice',
+                   table_regions: Optional[Dict[int, List[str]]] = None,
+                   engine: str = ENGINE, timings: Optional[StageTimings] = None) -> List[ExtractedTable]:
+    """
+    Extracts the tables of a list of pages.
+    For lattice pages the 'auto' engine tries the vector fast path first; only the pages
+    without a vector grid are sent to Camelot with the given flavor.
+    Camelot applies `table_regions` to every page of a call, so pages with their own
+    regions of interest get a dedicated call; the others share a single full-page call.
+    Regions (unlike fixed `table_areas`) restrict line detection and text parsing to the
+    region while still letting Camelot find each table's exact grid inside it.
+    Stage times go to `timings`: 'vector_extraction', 'rasterization' and 'camelot_extraction'
+    (Camelot line detection and text parsing, without the page rasterization).
+    Defined at module level so it can be pickled to worker processes.
+    """
+    table_regions = table_regions or {}
+    timings = timings if timings is not None else StageTimings()
+    tables = []
+    if flavor == 'lattice' and engine == 'auto':
+        remaining = []
+        with timings.measure('vector_extraction'), fitz.open(file_path) as doc:
+            for page_number in page_numbers:
+                found = _extract_vector_tables(doc[page_number - 1], page_number, table_regions.get(page_number))
+                if found:
+                    tables.extend(found)
+                else:
+                    remaining.append(page_number)
+        if not remaining:
+            return tables
+        logger.debug(f"No vector grid on pages {remaining}, falling back to Camelot.")
+        page_numbers = remaining
+
+    calls = [([p], {'table_regions': table_regions[p]}) for p in page_numbers if table_regions.get(p)]
+    full_pages = [p for p in page_numbers if not table_regions.get(p)]
+    if full_pages:
+        calls.append((full_pages, {}))
+
+    # Using the custom PageRasterizer for image processing (one document handle per job)
+    started = time.perf_counter()
+    with PageRasterizer(file_path) as rasterizer:
+        for pages, options in calls:
+            if flavor == 'lattice':
+                options['backend'] = rasterizer
+            camelot_tables = camelot.read_pdf(
+                file_path,
+                flavor=flavor,
+                pages=','.join(str(p) for p in pages),
+                **FLAVOR_OPTIONS.get(flavor, {}),
+                **options
+            )
+            tables.extend(ExtractedTable.from_camelot(table) for table in camelot_tables)
+    timings.add('rasterization', rasterizer.convert_seconds)
+    timings.add('camelot_extraction', time.perf_counter() - started - rasterizer.convert_seconds)
+    return tables
+
+
+def _extract_shard(file_path: str, shard: List[Tuple[int, str, Optional[List[str]]]],
+                   engine: str = ENGINE) -> Tuple[List[ExtractedTable], Dict[str, float]]:
+    """
+    Worker entry point: extracts one shard of consecutive (page, flavor, regions) entries.
+    Pages are grouped by flavor for the Camelot calls and the tables returned in page order,
+    together with the shard's stage times (so they survive the trip back from a worker process).
+    Defined at module level so it can be pickled to worker processes.
+    """
+    timings = StageTimings()
+    tables = []
+    for flavor in dict.fromkeys(f for _, f, _ in shard):
+        page_numbers = [p for p, f, _ in shard if f == flavor]
+        regions = {p: r for p, f, r in shard if f == flavor and r}
+        tables.extend(_extract_pages(file_path, page_numbers, flavor, regions, engine, timings))
+    tables.sort(key=lambda table: table.page)
+    return tables, timings.seconds
+
 
 class FinancialReportParser:
     """
     Core engine for processing Financial Reports (Centrale Rischi).
     Handles layout detection, table extraction, and data cleaning.
     """
-    def __init__(self):
+    def __init__(self, max_workers: Optional[int] = None, shard_size: Optional[int] = None,
+                 table_rules: Optional[List[Dict[str, Any]]] = None, use_table_rules: bool = True,
+                 use_table_regions: bool = True, engine: Optional[str] = None,
+                 page_cache: Optional[PageCache] = None, memory_budget: Optional[MemoryBudget] = None,
+                 window_shards: Optional[int] = None, result_format: Optional[str] = None):
         self.logger = logging.getLogger(__name__)
+        self.result_format = result_format or RESULT_FORMAT
+        if self.result_format not in RESULT_FORMATS:
+            raise ValueError(f"Unknown result format {self.result_format!r} (expected one of {RESULT_FORMATS})")
+        self.max_workers = max_workers or EXTRACTION_WORKERS
+        self.shard_size = shard_size or SHARD_SIZE
+        self.window_shards = window_shards or WINDOW_SHARDS or self.max_workers * 2
+        # Per-job resident memory budget; None disables the checks
+        self.memory_budget = memory_budget if memory_budget is not None else default_memory_budget
+        # Sliding window of the current run (shrunk under memory pressure)
+        self._shard_pages = self.shard_size
+        self._window = self.window_shards
+        self.use_table_rules = use_table_rules
+        self.use_table_regions = use_table_regions
+        self.engine = engine or ENGINE
+        # Extraction results of already seen pages (by fingerprint); None disables the cache
+        self.page_cache = page_cache if page_cache is not None else default_page_cache
+        # Stage breakdown, page count and header metadata of the last document run through iter_tables
+        self.timings = StageTimings()
+        self.pages_scanned = 0
+        self.metadata: Dict[str, Optional[str]] = {}
+        # Failures of the last run (page pre-scan or shard extraction): its tables are then incomplete
+        self.errors: List[str] = []
+        self.failed_pages: List[int] = []
+
+        # Compile every rule's keywords into one alternation so a page is scanned only once
+        self.table_rules = [dict(rule, _keywords={k.upper() for k in rule['keywords']})
+                            for rule in (table_rules if table_rules is not None else TABLE_RULES)]
+        keywords = sorted({k for rule in self.table_rules for k in rule['_keywords']}, key=len, reverse=True)
+        self._keyword_pattern = re.compile('|'.join(re.escape(k) for k in keywords) or r'(?!)', re.IGNORECASE)
+
+    @staticmethod
+    def _is_landscape(page) -> bool:
+        # If width > height, it's likely Landscape
+        rect = page.rect
+        return rect.width > rect.height
 
     def _detect_page_orientation(self, file_path: str) -> bool:
         """
@@ -41,72 +450,370 @@ class FinancialReportParser:
         Returns: True if Landscape, False if Portrait.
         """
         try:
-            doc = fitz.open(file_path)
-            page = doc[0]
-            rect = page.rect
-            # If width > height, it's likely Landscape
-            is_landscape = rect.width > rect.height
+            with fitz.open(file_path) as doc:
+                is_landscape = self._is_landscape(doc[0])
             self.logger.info(f"Page Orientation Detected: {'Landscape' if is_landscape else 'Portrait'}")
             return is_landscape
         except Exception as e:
             self.logger.warning(f"Could not detect orientation, defaulting to Portrait. Error: {e}")
             return False
 
+    def _table_regions(self, page, blocks: List[tuple], anchors: List[int]) -> Optional[List[str]]:
+        """
+        Layout stage: derives Camelot `table_regions` (regions of interest) from text positions.
+        Each anchor block (a block containing a rule keyword, e.g. a header row) opens a
+        region that grows downwards through the following blocks until a vertical gap larger
+        than ROI_MAX_GAP. Portrait regions are clipped to the text width; landscape pages
+        (wide tables) keep the full page width. Returns None to process the full page.
+        """
+        if not anchors or page.rotation:
+            # Camelot re-orients rotated pages on its own: keep the full page there
+            return None
+
+        width, height = page.rect.width, page.rect.height
+        landscape = self._is_landscape(page)
+        ordered = sorted(range(len(blocks)), key=lambda i: (blocks[i][1], blocks[i][0]))
+        regions = []
+        for position, index in enumerate(ordered):
+            if index not in anchors:
+                continue
+            x0, top, x1, bottom = blocks[index][:4]
+            if any(r_top <= top <= r_bottom for _, r_top, _, r_bottom in regions):
+                continue  # Header already covered by the region of a previous anchor
+            for following in ordered[position + 1:]:
+                bx0, by0, bx1, by1 = blocks[following][:4]
+                if by0 - bottom > ROI_MAX_GAP:
+                    break
+                x0, x1, bottom = min(x0, bx0), max(x1, bx1), max(bottom, by1)
+            regions.append((x0, top, x1, bottom))
+
+        roi = []
+        for x0, top, x1, bottom in regions:
+            left = 0.0 if landscape else max(0.0, x0 - ROI_MARGIN)
+            right = width if landscape else min(width, x1 + ROI_MARGIN)
+            top, bottom = max(0.0, top - ROI_MARGIN), min(height, bottom + ROI_MARGIN)
+            # Camelot expects "x1,y1,x2,y2" (top-left, bottom-right) with a bottom-left origin
+            roi.append(f"{left:.1f},{height - top:.1f},{right:.1f},{height - bottom:.1f}")
+        return roi
+
+    def _plan_pages(self, file_path: str, pages: str = 'all') -> List[Tuple[str, List[int], Dict[int, List[str]]]]:
+        """
+        Pre-scan stage: reads each page's text layer and matches it against the keywords
+        of every TABLE_RULES entry in a single regex pass. Only matching pages are kept,
+        grouped by the extraction flavor of the first (highest priority) rule they satisfy,
+        together with the table regions located around that rule's keywords.
+        Pages without a text layer (scans) cannot be classified and default to lattice.
+        Returns: list of (flavor, page_numbers, table_regions) groups.
+        """
+        with fitz.open(file_path) as doc:
+            page_numbers = parse_page_range(pages, len(doc))
+            if not self.use_table_rules:
+                self.pages_scanned = len(page_numbers)
+                return [('lattice', page_numbers, {})]
+
+            rule_pages = [set(parse_page_range(rule['pages'], len(doc))) for rule in self.table_rules]
+            plan: Dict[str, Tuple[List[int], Dict[int, List[str]]]] = OrderedDict()
+            for page_number in page_numbers:
+                page = doc[page_number - 1]
+                blocks = [b for b in page.get_text('blocks') if b[6] == 0 and b[4].strip()]
+                if not blocks:
+                    plan.setdefault('lattice', ([], {}))[0].append(page_number)
+                    continue
+
+                found = [{m.group(0).upper() for m in self._keyword_pattern.finditer(b[4])} for b in blocks]
+                page_keywords = set().union(*found)
+                for rule, allowed_pages in zip(self.table_rules, rule_pages):
+                    if page_number in allowed_pages and page_keywords.intersection(rule['_keywords']):
+                        group_pages, group_regions = plan.setdefault(rule.get('extraction_method', 'lattice'), ([], {}))
+                        group_pages.append(page_number)
+                        if self.use_table_regions:
+                            anchors = [i for i, keywords in enumerate(found) if keywords & rule['_keywords']]
+                            regions = self._table_regions(page, blocks, anchors)
+                            if regions:
+                                group_regions[page_number] = regions
+                        break
+
+        self.pages_scanned = len(page_numbers)
+        kept = sum(len(group_pages) for group_pages, _ in plan.values())
+        self.logger.info(f"Pre-scan kept {kept} of {len(page_numbers)} pages for table extraction.")
+        return [(flavor, group_pages, group_regions) for flavor, (group_pages, group_regions) in plan.items()]
+
+    def extract_metadata(self, file_path: str) -> Dict[str, Optional[str]]:
+        """
+        Extracts the report header fields (METADATA_RULES) in a single pass over the pages' text.
+        Pages are read lazily, so the scan usually ends on the first page.
+        """
+        try:
+            with fitz.open(file_path) as doc:
+                return default_extractor.extract(page.get_text() for page in doc)
+        except Exception as e:
+            self.logger.warning(f"Could not extract metadata. Error: {e}")
+            return default_extractor.extract([])
+
+    def _shards(self, plan: List[Tuple[str, List[int], Dict[int, List[str]]]]) -> Iterator[list]:
+        """
+        Merges the flavor groups of a plan into page order and splits them into shards.
+        Shards are cut lazily, so a shard size reduced under memory pressure applies to the next one.
+        """
+        pages = sorted((page_number, flavor, table_regions.get(page_number))
+                       for flavor, page_numbers, table_regions in plan for page_number in page_numbers)
+        position = 0
+        while position < len(pages):
+            shard = pages[position:position + self._shard_pages]
+            position += len(shard)
+            yield shard
+
+    def _check_memory(self, can_wait: bool, pool: Optional[ProcessPoolExecutor] = None) -> bool:
+        """
+        Memory budget gate, called before a shard is extracted. Under pressure the window shrinks
+        (smaller shards, fewer shards in flight). Over budget, returns False when the caller can
+        wait for results in flight to be consumed, and rejects the job otherwise.
+        The extraction `pool`'s worker processes count towards the job's memory.
+        """
+        if self.memory_budget is None:
+            return True
+        # ProcessPoolExecutor keeps its live worker processes by pid
+        worker_pids = list(getattr(pool, '_processes', None) or ())
+        state = self.memory_budget.check(worker_pids)
+        if state == MemoryBudget.PRESSURE and (self._shard_pages > 1 or self._window > 1):
+            self._shard_pages = max(1, self._shard_pages // 2)
+            self._window = max(1, self._window // 2)
+            self.logger.warning(f"Memory pressure ({self.memory_budget.describe(worker_pids)}): window reduced to "
+                                f"{self._window} shards of {self._shard_pages} pages.")
+        elif state == MemoryBudget.OVER:
+            if can_wait:
+                return False
+            raise MemoryBudgetError(f"Document exceeds the job memory budget "
+                                    f"({self.memory_budget.describe(worker_pids)}).")
+        return True
+
+    def _shard_failed(self, shard: list, error: Exception):
+        pages = [p for p, _, _ in shard]
+        self.logger.error(f"Critical Error during extraction of pages {pages}: {error}")
+        self.errors.append(f"Extraction of pages {pages[0]}-{pages[-1]} failed: {error}")
+        self.failed_pages.extend(pages)
+
+    def _run_shards(self, file_path: str, shards: Iterable[list]) -> Iterator[Tuple[list, Optional[List[ExtractedTable]]]]:
+        """
+        Extracts shards in order and yields (shard, tables) pairs (tables is None when the shard
+        failed, see `self.errors` / `self.failed_pages`), adding the shards' stage times to `self.timings`. Empty shards (pages served
+        from the page cache) are passed through.
+        With more than one worker configured, shards run on a process pool; at most the window
+        of shards is extracted ahead of the consumer, so results never pile up in memory.
+        """
+        if self.max_workers <= 1:
+            for shard in shards:
+                if not shard:
+                    yield shard, []
+                    continue
+                self._check_memory(can_wait=False)
+                try:
+                    tables, seconds = _extract_shard(file_path, shard, self.engine)
+                except Exception as e:
+                    self._shard_failed(shard, e)
+                    yield shard, None
+                    continue
+                self.timings.merge(seconds)
+                yield shard, tables
+            return
+
+        pool = None
+        shards = iter(shards)
+        in_flight = deque()
+        exhausted = False
+        try:
+            while True:
+                # Refill the window; over budget, drain results in flight before extracting more
+                while not exhausted and len(in_flight) < self._window:
+                    if in_flight and not self._check_memory(can_wait=True, pool=pool):
+                        break
+                    shard = next(shards, None)
+                    if shard is None:
+                        exhausted = True
+                        break
+                    future = None
+                    if shard:
+                        if not in_flight:
+                            self._check_memory(can_wait=False, pool=pool)
+                        if pool is None:
+                            self.logger.info(f"Extracting page shards on {self.max_workers} workers.")
+                            pool = ProcessPoolExecutor(max_workers=self.max_workers)
+                        future = pool.submit(_extract_shard, file_path, shard, self.engine)
+                    in_flight.append((shard, future))
+                if not in_flight:
+                    break
+
+                shard, future = in_flight.popleft()
+                if future is None:
+                    yield shard, []
+                    continue
+                try:
+                    tables, seconds = future.result()
+                except Exception as e:
+                    self._shard_failed(shard, e)
+                    yield shard, None
+                    continue
+                self.timings.merge(seconds)
+                yield shard, tables
+            if pool is not None:
+                pool.shutdown(wait=True)
+        except BaseException:
+            # Job time limit fired, memory budget exceeded or the consumer stopped early:
+            # do not wait for the remaining shards
+            if pool is not None:
+                pool.shutdown(wait=False, cancel_futures=True)
+            raise
+
+    def _cached_pages(self, doc, shard: list) -> Tuple[Dict[int, str], Dict[int, List[ExtractedTable]]]:
+        """Fingerprints the pages of a shard and returns (fingerprints, cached tables by page)."""
+        try:
+            fingerprints = {p: _page_fingerprint(doc, p, flavor, regions, self.engine) for p, flavor, regions in shard}
+            entries = self.page_cache.get_many(fingerprints.values())
+        except Exception as e:
+            self.logger.warning(f"Page cache unavailable, extracting pages {[p for p, _, _ in shard]}. Error: {e}")
+            return {}, {}
+        hits = {p: [ExtractedTable.from_cache(entry, p) for entry in entries[fp]]
+                for p, fp in fingerprints.items() if fp in entries}
+        return fingerprints, hits
+
+    def _iter_shard_tables(self, file_path: str, plan) -> Iterator[Tuple[List[int], List[ExtractedTable]]]:
+        """
+        Extracts the plan shard by shard and yields (shard page numbers, tables) in page order.
+        With a page cache, pages whose fingerprint was seen before reuse the cached tables and
+        only new or changed pages are extracted; their results are added to the cache.
+        Cache lookups follow the extraction window, so only the pages in flight are held in memory.
+        A failing shard is logged and recorded in `self.errors` and yields no tables, without
+        discarding the other shards.
+        """
+        self._shard_pages, self._window = self.shard_size, self.window_shards
+        doc = None
+        if self.page_cache is not None:
+            try:
+                doc = fitz.open(file_path)
+            except Exception as e:
+                self.logger.warning(f"Page cache unavailable, extracting every page. Error: {e}")
+        lookups = deque()
+        counts = {'pages': 0, 'hits': 0}
+
+        def pending():
+            for shard in self._shards(plan):
+                fingerprints, hits = {}, {}
+                if doc is not None:
+                    with self.timings.measure('page_cache'):
+                        fingerprints, hits = self._cached_pages(doc, shard)
+                    counts['pages'] += len(shard)
+                    counts['hits'] += len(hits)
+                lookups.append((fingerprints, hits))
+                yield [entry for entry in shard if entry[0] not in hits]
+
+        try:
+            for to_extract, extracted in self._run_shards(file_path, pending()):
+                fingerprints, hits = lookups.popleft()
+                shard_pages = sorted({p for p, _, _ in to_extract} | set(hits))
+                if extracted is None:
+                    extracted = []
+                elif fingerprints and to_extract:
+                    by_page = {p: [] for p, _, _ in to_extract}
+                    for table in extracted:
+                        if table.page in by_page:
+                            by_page[table.page].append(table.to_cache())
+                    try:
+                        with self.timings.measure('page_cache'):
+                            self.page_cache.put_many({fingerprints[p]: entries for p, entries in by_page.items()})
+                    except Exception as e:
+                        self.logger.warning(f"Could not update the page cache. Error: {e}")
+                cached = [table for p in shard_pages for table in hits.get(p, [])]
+                yield shard_pages, sorted(extracted + cached, key=lambda table: table.page)
+        finally:
+            if doc is not None:
+                doc.close()
+                self.logger.info(f"Page cache: {counts['hits']} of {counts['pages']} pages unchanged, "
+                                 f"{counts['pages'] - counts['hits']} extracted.")
+
     def parse_tables(self, file_path: str, pages: str = 'all') -> List[Any]:
         """
-        Extracts tables from the PDF using Camelot's 'Lattice' mode.
-        Lattice is optimized for tables with distinct grid lines, common in financial reports.
+        Extracts tables from the PDF.
+        Lattice is optimized for tables with distinct grid lines, common in financial reports;
+        pages matched by a TABLE_RULES entry asking for 'stream' are parsed with that flavor.
+        With more than one worker configured, the page range is split into shards
+        that are extracted on separate processes and merged back in page order.
         """
         self.logger.info(f"Starting table extraction for: {file_path}")
-        
+        self.errors, self.failed_pages = [], []
+
         try:
-            # Using the custom ConversionBackend for image processing
-            tables = camelot.read_pdf(
-                file_path, 
-                backend=ConversionBackend(), 
-                flavor='lattice',  
-                line_scale=40,     # Adjust line detection sensitivity
-                pages=pages
-            )
-            self.logger.info(f"Successfully extracted {len(tables)} tables.")
-            return tables
-            
+            plan = self._plan_pages(file_path, pages)
         except Exception as e:
-            self.logger.error(f"Critical Error during Camelot extraction: {e}")
+            self.logger.error(f"Critical Error during page pre-scan: {e}")
+            self.errors.append(f"Page pre-scan failed: {e}")
             return []
 
-    def process_document(self, file_path: str) -> List[Dict[str, Any]]:
+        tables = [table for _, shard_tables in self._iter_shard_tables(file_path, plan) for table in shard_tables]
+        self.logger.info(f"Successfully extracted {len(tables)} tables.")
+        return tables
+
+    def iter_tables(self, file_path: str, start_page: int = 1, start_index: int = 0) -> Iterator[Dict[str, Any]]:
         """
-        Main entry point for the parser.
-        Orchestrates layout detection, extraction, and data structuring.
+        Streaming entry point: yields each structured table as soon as its shard of pages
+        is parsed, instead of building the whole result in memory.
+        `start_page` / `start_index` resume a partially processed document: extraction
+        starts at that page and table numbering continues from `start_index`.
+        The stage breakdown of the run is kept in `self.timings`, and the document-level
+        metadata (extracted before the first table is yielded) in `self.metadata`: it is
+        stored once per document, not on every table.
+        A failed pre-scan or shard does not stop the run: it is recorded in `self.errors`
+        (and its pages in `self.failed_pages`), so callers can tell an incomplete result apart.
         """
         if not os.path.exists(file_path):
             raise FileNotFoundError(f"File not found: {file_path}")
+        self.timings = StageTimings()
+        self.pages_scanned = 0
+        self.metadata = {}
+        self.errors, self.failed_pages = [], []
+
+        # 1. Header Metadata (reference date, Intestatario, Codice Fiscale, ...)
+        with self.timings.measure('metadata'):
+            self.metadata = self.extract_metadata(file_path)
+
+        # 2. Layout Analysis (orientation and table regions are resolved per page during the pre-scan)
+        self.logger.info(f"Starting table extraction for: {file_path}")
+        try:
+            with self.timings.measure('layout'):
+                plan = self._plan_pages(file_path, f"{start_page}-end")
+        except Exception as e:
+            self.logger.error(f"Critical Error during page pre-scan: {e}")
+            self.errors.append(f"Page pre-scan failed: {e}")
+            return
 
-        # 1. Layout Analysis
-        is_landscape = self._detect_page_orientation(file_path)
-        
-        # 2. Table Extraction
-        raw_tables = self.parse_tables(file_path)
-        
-        processed_data = []
-        
-        # 3. Data Cleaning & Structuring
-        for i, table in enumerate(raw_tables):
-            df = table.df
-            
-            # Data Cleaning: Remove artifacts like newlines in cell text
-            df = df.replace(r'\n', ' ', regex=True)
-            
-            # Convert DataFrame to list of dictionaries (JSON-serializable)
-            table_records = df.to_dict(orient='records')
-            
-            # Enrich with metadata (Page number, Table confidence score)
-            processed_data.append({
-                "table_index": i,
-                "page_number": table.parsing_report['page'],
-                "content": table_records,
-                "extraction_accuracy": table.parsing_report['accuracy']
-            })
-            
-        return processed_data
+        # 3. Table Extraction, shard by shard
+        table_index = start_index
+        for _, raw_tables in self._iter_shard_tables(file_path, plan):
+            # 4. Data Cleaning & Typing (one vectorized pass over the tables of the shard)
+            with self.timings.measure('cleaning'):
+                cleaned_frames = deque(clean_tables([table.df for table in raw_tables]))
+            reports = [table.parsing_report for table in raw_tables]
+            # The raw frames are not needed once cleaned; cleaned frames go as each table is emitted
+            del raw_tables
+
+            # 5. Structuring
+            for report in reports:
+                df = cleaned_frames.popleft()
+                # Convert DataFrame to JSON-serializable content (records, rows or columns)
+                with self.timings.measure('serialization'):
+                    content = frame_to_content(df, self.result_format)
+                del df
+                # Enrich with metadata (Page number, Table confidence score)
+                yield {
+                    "table_index": table_index,
+                    "page_number": report['page'],
+                    "content": content,
+                    "extraction_accuracy": report['accuracy']
+                }
+                table_index += 1
+
+    def process_document(self, file_path: str) -> List[Dict[str, Any]]:
+        """
+        Main entry point for the parser.
+        Orchestrates layout detection, extraction, and data structuring.
+        """
+        return list(self.iter_tables(file_path))
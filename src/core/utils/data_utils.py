@@ -1,12 +1,35 @@
+from __future__ import annotations
+
 import re
-from typing import List, Dict, Any, Generator
+from functools import lru_cache
+from itertools import islice
+from typing import TYPE_CHECKING, List, Dict, Any, Generator, Iterable, Tuple
+
+# numpy/pandas are imported by the table functions that need them: the API process only
+# uses chunker() and must not load the numeric stack at startup.
+if TYPE_CHECKING:
+    import numpy as np
+    import pandas as pd
+
+# --- NUMBER / DATE FORMATS FOUND IN THE REPORTS ---
+# Italian amounts come first ('150.000,00', '1500,5', '12'); unambiguous English ones
+# ('150,000.00', '0.00') are accepted as a fallback. Long digit runs and numbers with a
+# leading zero are identifiers (Codice Fiscale, ABI/CAB codes) and stay text.
+_ITALIAN_NUMBER = r'[-+]?(?:\d{1,3}(?:\.\d{3})+(?:,\d+)?|\d+,\d+|[1-9]\d{0,8}|0)'
+_ENGLISH_NUMBER = r'[-+]?(?:\d{1,3}(?:,\d{3})+(?:\.\d+)?|\d+\.\d+)'
+_FULL_DATE = r'\d{2}/\d{2}/\d{4}'      # e.g. 31/01/2025
+_MONTH_DATE = r'\d{2}/\d{4}'            # e.g. 01/2025 (reference month)
 
-def chunker(sequence: List[Any], size: int) -> Generator[List[Any], None, None]:
+def chunker(sequence: Iterable[Any], size: int) -> Generator[List[Any], None, None]:
     """
     Splits a large sequence (list of items) into smaller, fixed-size chunks.
     This is essential for batch processing or adhering to database limits (e.g., DynamoDB 400KB).
+    Any other iterable (e.g. a generator of parsed tables) is consumed lazily, one chunk at a time.
     """
-    return (sequence[pos:pos + size] for pos in range(0, len(sequence), size))
+    if isinstance(sequence, (list, tuple, str)):
+        return (sequence[pos:pos + size] for pos in range(0, len(sequence), size))
+    iterator = iter(sequence)
+    return (chunk for chunk in iter(lambda: list(islice(iterator, size)), []))
 
 def calculate_date_metadata(date_ref_str: str) -> Dict[str, str]:
     """
@@ -22,6 +45,14 @@ def calculate_date_metadata(date_ref_str: str) -> Dict[str, str]:
         # Returns None on failure, indicating incomplete metadata
         return {'year': "None", 'month': "None"}
 
+@lru_cache(maxsize=256)
+def _marker_patterns(start_marker: str, end_marker: str) -> Tuple[re.Pattern, re.Pattern]:
+    """Compiles (once per marker pair) the bounded and the open-ended extraction patterns."""
+    return (
+        re.compile(f'{re.escape(start_marker)}(.*?){re.escape(end_marker)}', re.IGNORECASE | re.DOTALL),
+        re.compile(f'{re.escape(start_marker)}(.*)', re.IGNORECASE | re.DOTALL),
+    )
+
 def extract_clean_value(start_marker: str, end_marker: str, text: str) -> str:
     """
     Extracts a substring between two markers using regex.
@@ -29,11 +60,12 @@ def extract_clean_value(start_marker: str, end_marker: str, text: str) -> str:
     from the complex text layout of the financial PDF headers.
     """
     try:
+        bounded, open_ended = _marker_patterns(start_marker, end_marker)
         # Attempt to find text between start and end markers
-        result = re.search(f'{re.escape(start_marker)}(.*?){re.escape(end_marker)}', text, re.IGNORECASE | re.DOTALL)
+        result = bounded.search(text)
         if not result:
             # Fallback: Find text from start marker to end of string
-            result = re.search(f'{re.escape(start_marker)}(.*)', text, re.IGNORECASE | re.DOTALL)
+            result = open_ended.search(text)
             
         if result:
             final_value = result.group(1).strip()
@@ -41,3 +73,174 @@ def extract_clean_value(start_marker: str, end_marker: str, text: str) -> str:
         return ""
     except Exception:
         return ""
+
+def parse_page_range(pages: str, page_count: int) -> List[int]:
+    """
+    Expands a Camelot-style page specification ('all', '1,3-5', '2-end') into a
+    sorted list of 1-based page numbers, clipped to the document's page count.
+    """
+    if str(pages).strip().lower() == 'all':
+        return list(range(1, page_count + 1))
+
+    page_numbers = set()
+    for part in str(pages).split(','):
+        part = part.strip().lower()
+        if not part:
+            continue
+        if '-' in part:
+            start, end = part.split('-', 1)
+            end = page_count if end == 'end' else int(end)
+            page_numbers.update(range(int(start), min(end, page_count) + 1))
+        elif int(part) <= page_count:
+            page_numbers.add(int(part))
+    return sorted(p for p in page_numbers if p >= 1)
+
+def _parse_numbers(text: pd.Series) -> pd.Series:
+    """Vectorized Italian/English amount and percentage parsing (NaN where not a number)."""
+    import numpy as np
+    import pandas as pd
+    body = text.str.replace(r'^€\s*', '', regex=True)
+    is_percent = body.str.endswith('%').fillna(False).astype(bool)
+    body = body.str.rstrip('%').str.strip()
+
+    italian = body.str.fullmatch(_ITALIAN_NUMBER).fillna(False).astype(bool)
+    english = ~italian & body.str.fullmatch(_ENGLISH_NUMBER).fillna(False).astype(bool)
+
+    numbers = pd.Series(np.nan, index=text.index, dtype='float64')
+    numbers[italian] = pd.to_numeric(
+        body[italian].str.replace('.', '', regex=False).str.replace(',', '.', regex=False))
+    numbers[english] = pd.to_numeric(body[english].str.replace(',', '', regex=False))
+    # Percentages are stored as fractions ('12,5%' -> 0.125)
+    numbers[is_percent] = numbers[is_percent] / 100
+    return numbers
+
+def _parse_dates(text: pd.Series) -> pd.Series:
+    """Vectorized dd/mm/yyyy and mm/yyyy parsing (NaT where not a date)."""
+    import pandas as pd
+    full = text.str.fullmatch(_FULL_DATE).fillna(False).astype(bool)
+    month = text.str.fullmatch(_MONTH_DATE).fillna(False).astype(bool)
+
+    dates = pd.Series(pd.NaT, index=text.index, dtype='datetime64[ns]')
+    dates[full] = pd.to_datetime(text[full], format='%d/%m/%Y', errors='coerce')
+    dates[month] = pd.to_datetime(text[month], format='%m/%Y', errors='coerce')
+    return dates
+
+def clean_tables(frames: List[pd.DataFrame]) -> List[pd.DataFrame]:
+    """
+    Batched cleaning and typing of all the tables of a document.
+
+    The tables are concatenated into one long Series of cells, so whitespace cleanup
+    and Italian number/percentage/date parsing run as a handful of vectorized string
+    operations per document instead of per table. A column is typed when every
+    non-empty cell below its first row parses (the first row usually holds the header);
+    its cells then become floats or Timestamps, and fully typed columns get a numeric or
+    datetime dtype. Other cells keep their cleaned text. Shapes and labels are preserved.
+    """
+    if not frames:
+        return []
+    import numpy as np
+    import pandas as pd
+
+    combined = pd.concat(frames, keys=range(len(frames)), names=['table', 'row'])
+    n_rows, n_cols = combined.shape
+    table_ids = np.repeat(combined.index.get_level_values('table').to_numpy(), n_cols)
+    row_positions = np.repeat(np.concatenate([np.arange(len(f)) for f in frames]), n_cols)
+    column_ids = np.tile(np.arange(n_cols), n_rows)
+
+    # Whitespace cleanup (newlines left by multi-line cells, repeated blanks)
+    cells = pd.Series(combined.to_numpy(dtype=object).ravel())
+    absent = cells.isna().to_numpy()
+    text = cells.astype('string').str.replace(r'\s+', ' ', regex=True).str.strip()
+    is_empty = (text.isna() | (text == '')).to_numpy()
+
+    numbers = _parse_numbers(text)
+    dates = _parse_dates(text)
+    is_number = numbers.notna().to_numpy()
+    is_date = dates.notna().to_numpy()
+
+    # Decide, per (table, column), whether the body (rows below the first) is typed
+    body = row_positions > 0
+    flags = pd.DataFrame({
+        'table': table_ids, 'column': column_ids,
+        'number_ok': ~body | is_number | is_empty, 'number_any': body & is_number,
+        'date_ok': ~body | is_date | is_empty, 'date_any': body & is_date,
+    })[~absent].groupby(['table', 'column']).agg(
+        number_ok=('number_ok', 'all'), number_any=('number_any', 'any'),
+        date_ok=('date_ok', 'all'), date_any=('date_any', 'any'))
+    typed_index = pd.MultiIndex.from_arrays([table_ids, column_ids])
+    number_column = (flags['number_ok'] & flags['number_any']).reindex(typed_index, fill_value=False).to_numpy()
+    date_column = (flags['date_ok'] & flags['date_any']).reindex(typed_index, fill_value=False).to_numpy()
+
+    values = text.fillna('').to_numpy(dtype=object, copy=True)
+    use_number = number_column & (is_number | is_empty)
+    use_date = date_column & ~number_column & (is_date | is_empty)
+    values[use_number] = numbers.to_numpy()[use_number]
+    values[use_date] = dates.to_numpy(dtype=object)[use_date]
+    values[use_date & is_empty] = pd.NaT
+
+    wide = pd.DataFrame(values.reshape(n_rows, n_cols), index=combined.index, columns=combined.columns)
+    # Split back per table, keeping each table's own columns and letting typed columns get real dtypes
+    return [wide.loc[i, list(frame.columns)].reset_index(drop=True).infer_objects()
+            for i, frame in enumerate(frames)]
+
+# Table content layouts: 'records' (one {column: value} dict per row, the original format),
+# 'rows' (column labels once, then one value array per row) and 'columns' (one typed value
+# array per column). The compact layouts are dicts, so a stored table tells which one it uses.
+RESULT_FORMATS = ('records', 'rows', 'columns')
+
+def _json_ready(df: pd.DataFrame) -> pd.DataFrame:
+    """Object copy of a cleaned table: missing values become None and dates ISO strings (YYYY-MM-DD)."""
+    import pandas as pd
+    values = df.astype(object).where(df.notna(), None)
+    for column in values.columns:
+        if df[column].dtype.kind in 'MO':
+            values[column] = values[column].apply(
+                lambda v: v.date().isoformat() if isinstance(v, pd.Timestamp) else v)
+    return values
+
+def _column_type(values: List[Any]) -> str:
+    """'number', 'date' or 'text' from the body cells of a column (the first row is usually its header)."""
+    import pandas as pd
+    kinds = {type(v) for v in values[1:] if v is not None and v == v}
+    if kinds and all(issubclass(kind, (int, float)) and not issubclass(kind, bool) for kind in kinds):
+        return 'number'
+    if kinds and all(issubclass(kind, pd.Timestamp) for kind in kinds):
+        return 'date'
+    return 'text'
+
+def frame_to_records(df: pd.DataFrame) -> List[Dict[Any, Any]]:
+    """
+    Converts a cleaned table to JSON-serializable records.
+    Missing values become None and dates become ISO strings (YYYY-MM-DD).
+    """
+    return _json_ready(df).to_dict(orient='records')
+
+def frame_to_content(df: pd.DataFrame, result_format: str = 'records') -> Any:
+    """
+    Converts a cleaned table to JSON-serializable content in one of RESULT_FORMATS:
+    - 'records': [{column: value, ...}, ...]
+    - 'rows': {'columns': [...], 'rows': [[value, ...], ...]}
+    - 'columns': {'columns': [...], 'types': ['number'|'date'|'text', ...], 'data': [[value, ...], ...]}
+      where data[i] holds every value of column i (header row included) and types[i] the
+      type of its cells below the first row.
+    """
+    if result_format == 'records':
+        return frame_to_records(df)
+    values = _json_ready(df)
+    columns = [c.item() if hasattr(c, 'item') else c for c in df.columns]
+    if result_format == 'rows':
+        return {'columns': columns, 'rows': values.to_numpy().tolist()}
+    if result_format == 'columns':
+        data = [values[column].tolist() for column in values.columns]
+        types = [_column_type(df[column].tolist()) for column in df.columns]
+        return {'columns': columns, 'types': types, 'data': data}
+    raise ValueError(f"Unknown result format {result_format!r} (expected one of {RESULT_FORMATS})")
+
+def content_to_records(content: Any) -> List[Dict[Any, Any]]:
+    """Compatibility view: converts table content in any of RESULT_FORMATS back to records."""
+    if isinstance(content, list):
+        return content
+    columns = content['columns']
+    if 'rows' in content:
+        return [dict(zip(columns, row)) for row in content['rows']]
+    return [dict(zip(columns, row)) for row in zip(*content['data'])]
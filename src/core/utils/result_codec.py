@@ -0,0 +1,104 @@
+import io
+import gzip
+import json
+from typing import Any, Dict, Iterable, List, Optional
+
+from utils.data_utils import content_to_records
+
+# Optional accelerators: orjson encodes results several times faster than the json module,
+# zstandard compresses faster and smaller than gzip. Both fall back transparently.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Compression codecs for stored/exported results, with the file suffix and HTTP Content-Encoding of each
+CODECS = {
+    'none': ('', None),
+    'gzip': ('.gz', 'gzip'),
+    'zstd': ('.zst', 'zstd'),
+}
+
+
+def encode_json(value: Any) -> bytes:
+    """Compact UTF-8 JSON; non-string keys (Camelot's integer column labels) become strings."""
+    if orjson is not None:
+        return orjson.dumps(value, default=str, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(value, default=str, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def decode_json(data: bytes) -> Any:
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+def available_codec(codec: str) -> str:
+    """Returns `codec`, or 'gzip' when zstd is requested but the zstandard package is missing."""
+    if codec not in CODECS:
+        raise ValueError(f"Unknown compression {codec!r} (expected one of {sorted(CODECS)})")
+    return 'gzip' if codec == 'zstd' and zstandard is None else codec
+
+
+def compress(data: bytes, codec: str = 'gzip') -> bytes:
+    codec = available_codec(codec)
+    if codec == 'gzip':
+        return gzip.compress(data, compresslevel=6)
+    if codec == 'zstd':
+        return zstandard.ZstdCompressor(level=3).compress(data)
+    return data
+
+
+def decompress(data: bytes, codec: Optional[str] = None) -> bytes:
+    """Decompresses `data`; without a codec it is recognized from its magic number."""
+    if codec is None:
+        codec = 'gzip' if data[:2] == b'\x1f\x8b' else 'zstd' if data[:4] == b'\x28\xb5\x2f\xfd' else 'none'
+    if codec == 'gzip':
+        return gzip.decompress(data)
+    if codec == 'zstd':
+        if zstandard is None:
+            raise RuntimeError("zstd-compressed result, but the zstandard package is not installed.")
+        return zstandard.ZstdDecompressor().decompressobj().decompress(data)
+    return data
+
+
+def as_records(tables: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Compatibility view: the tables with their content converted to the 'records' format."""
+    return [dict(table, content=content_to_records(table['content'])) for table in tables]
+
+
+def tables_to_parquet(tables: Iterable[Dict[str, Any]], destination=None) -> Optional[bytes]:
+    """
+    Analytics export: writes the cells of the parsed tables as one Parquet table in long format,
+    one row per cell (table_index, page_number, row, column, text, number, date), so tables of
+    any shape share a schema and typed values can be queried directly. Requires pyarrow.
+    Returns the Parquet bytes when no `destination` (path or binary file) is given.
+    """
+    import pandas as pd
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        raise RuntimeError("Parquet export needs the pyarrow package (pip install pyarrow).")
+
+    cells = {name: [] for name in ('table_index', 'page_number', 'row', 'column', 'text', 'number', 'date')}
+    for table in tables:
+        for row, record in enumerate(content_to_records(table['content'])):
+            for column, value in record.items():
+                is_number = isinstance(value, (int, float)) and not isinstance(value, bool)
+                is_date = isinstance(value, str) and len(value) == 10 and value[4] == '-' and value[7] == '-'
+                cells['table_index'].append(table['table_index'])
+                cells['page_number'].append(table['page_number'])
+                cells['row'].append(row)
+                cells['column'].append(str(column))
+                cells['text'].append(None if is_number or value is None else str(value))
+                cells['number'].append(float(value) if is_number else None)
+                cells['date'].append(value if is_date else None)
+
+    frame = pd.DataFrame(cells).astype({'table_index': 'int32', 'page_number': 'int32', 'row': 'int32',
+                                        'number': 'float64'})
+    frame['date'] = pd.to_datetime(frame['date'], format='%Y-%m-%d', errors='coerce')
+    buffer = destination if destination is not None else io.BytesIO()
+    frame.to_parquet(buffer, index=False, compression='zstd')
+    return buffer.getvalue() if destination is None else None
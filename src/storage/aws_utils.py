@@ -1,11 +1,19 @@
 import boto3
 import os
-import requests
+import sys
 import logging
 import json
-from botocore.exceptions import ClientError
+import threading
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+from botocore.exceptions import BotoCoreError, ClientError
 from datetime import datetime
-from typing import List, Dict, Any
+from decimal import Decimal
+from typing import List, Dict, Any, Optional, Tuple
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../core')))
+from utils.data_utils import chunker
+from utils.result_codec import CODECS, encode_json, decode_json, compress, decompress, available_codec
 
 # Configure logging for better CloudWatch integration
 logger = logging.getLogger()
@@ -16,32 +24,150 @@ logger.setLevel(logging.INFO)
 AWS_REGION = os.environ.get("AWS_REGION", "eu-south-1")
 S3_BUCKET = os.environ.get("S3_BUCKET_NAME", "cr-parser-backup")
 DYNAMO_TABLE = os.environ.get("DYNAMO_TABLE_NAME", "CR_Parsing_Results")
+# Parsed tables are streamed to DynamoDB in batches of this size (25 = one BatchWriteItem call)
+RESULT_BATCH_SIZE = int(os.environ.get("RESULT_BATCH_SIZE", 25))
+# Connection pool shared by the cached clients (keep >= concurrent threads using them)
+AWS_MAX_POOL_CONNECTIONS = int(os.environ.get("AWS_MAX_POOL_CONNECTIONS", 32))
+# DynamoDB rejects items over 400KB; leave headroom for attribute names and type overhead
+DYNAMO_ITEM_BUDGET = int(os.environ.get("DYNAMO_ITEM_BUDGET", 350 * 1024))
+# Tables needing more row chunks than this are offloaded to S3 as one compressed blob
+MAX_CONTENT_PARTS = int(os.environ.get("MAX_CONTENT_PARTS", 8))
+RESULTS_PREFIX = os.environ.get("S3_RESULTS_PREFIX", "results")
+# Compression of the tables offloaded to S3: 'gzip' or 'zstd' (needs the zstandard package)
+RESULT_COMPRESSION = os.environ.get("RESULT_COMPRESSION", "gzip").lower()
+
+# Multipart transfer tuning for raw PDF backups (parts are uploaded concurrently)
+TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=int(os.environ.get("S3_MULTIPART_THRESHOLD_MB", 8)) * 1024 * 1024,
+    multipart_chunksize=int(os.environ.get("S3_MULTIPART_CHUNK_MB", 8)) * 1024 * 1024,
+    max_concurrency=int(os.environ.get("S3_MAX_CONCURRENCY", 4)),
+    use_threads=True
+)
+
+BOTO_CONFIG = Config(
+    region_name=AWS_REGION,
+    max_pool_connections=AWS_MAX_POOL_CONNECTIONS,
+    retries={'max_attempts': 5, 'mode': 'adaptive'},
+    tcp_keepalive=True
+)
+
+# Process-wide cache of the session and clients. Sessions and their connections must not be
+# shared across fork(), so the cache is rebuilt whenever it is used from a new process id.
+_clients: Dict[str, Any] = {}
+_clients_lock = threading.Lock()
+# boto3 resources are not thread-safe: each thread gets its own DynamoDB Table resource
+_thread_local = threading.local()
+
+def reset_clients():
+    """Drops every cached session/client (used after configuration changes and in tests)."""
+    with _clients_lock:
+        _clients.clear()
+    _thread_local.__dict__.clear()
 
 def get_boto3_session():
-    """Returns a Boto3 Session using environment credentials (IAM Role / Env Vars)."""
+    """Returns the process-wide Boto3 Session using environment credentials (IAM Role / Env Vars)."""
     # This ensures credentials are not hardcoded.
-    return boto3.Session(region_name=AWS_REGION)
+    with _clients_lock:
+        if _clients.get('pid') != os.getpid():
+            _clients.clear()
+            _clients['pid'] = os.getpid()
+            _clients['session'] = boto3.Session(region_name=AWS_REGION)
+        return _clients['session']
+
+def get_s3_client():
+    """Returns the cached S3 client (thread-safe, pooled keep-alive connections)."""
+    session = get_boto3_session()
+    with _clients_lock:
+        if 's3' not in _clients:
+            _clients['s3'] = session.client('s3', config=BOTO_CONFIG)
+        return _clients['s3']
+
+def get_dynamo_resource():
+    """Returns this thread's cached DynamoDB service resource."""
+    session = get_boto3_session()
+    if getattr(_thread_local, 'session', None) is not session:
+        with _clients_lock:
+            _thread_local.dynamodb = session.resource('dynamodb', config=BOTO_CONFIG)
+        _thread_local.table = _thread_local.dynamodb.Table(DYNAMO_TABLE)
+        _thread_local.session = session
+    return _thread_local.dynamodb
+
+def get_dynamo_table():
+    """Returns this thread's cached DynamoDB Table resource."""
+    get_dynamo_resource()
+    return _thread_local.table
 
 def upload_file_to_s3(file_path: str, object_name: str):
     """Uploads the local PDF file to S3 for backup/audit trail."""
-    session = get_boto3_session()
-    s3_client = session.client('s3')
+    s3_client = get_s3_client()
     try:
-        s3_client.upload_file(file_path, S3_BUCKET, object_name)
+        s3_client.upload_file(file_path, S3_BUCKET, object_name, Config=TRANSFER_CONFIG)
         logger.info(f"S3 Upload Success: {object_name} backed up to {S3_BUCKET}")
     except ClientError as e:
         logger.error(f"S3 Upload Error for {object_name}: {e}")
         # We must raise here, as failure to backup the raw file is a critical failure.
         raise e
 
-def save_result_to_dynamo(request_id: str, status: str, results: List[Dict[str, Any]] = None, error_msg: str = None):
-    """Saves the processing status and results summary to DynamoDB."""
-    session = get_boto3_session()
-    dynamodb = session.resource('dynamodb')
-    table = dynamodb.Table(DYNAMO_TABLE)
+def upload_fileobj_to_s3(fileobj, object_name: str):
+    """
+    Uploads an open (seekable) file object to S3 with a multipart transfer.
+    Used by the ingestion pipeline: the handle stays readable even after the
+    parsing job has removed the spooled file from disk.
+    """
+    s3_client = get_s3_client()
+    try:
+        s3_client.upload_fileobj(fileobj, S3_BUCKET, object_name, Config=TRANSFER_CONFIG)
+        logger.info(f"S3 Upload Success: {object_name} backed up to {S3_BUCKET}")
+    except ClientError as e:
+        logger.error(f"S3 Upload Error for {object_name}: {e}")
+        raise e
+
+def download_file_from_s3(object_name: str, file_path: str):
+    """Fetches a backed-up object to a local file (e.g. a document queued by another node)."""
+    os.makedirs(os.path.dirname(os.path.abspath(file_path)), exist_ok=True)
+    get_s3_client().download_file(S3_BUCKET, object_name, file_path, Config=TRANSFER_CONFIG)
+    logger.info(f"Downloaded s3://{S3_BUCKET}/{object_name} to {file_path}")
+
+def _to_dynamo_value(value: Any) -> Any:
+    """Converts JSON-like data to DynamoDB types (floats -> Decimal, map keys -> str)."""
+    return json.loads(encode_json(value), parse_float=Decimal)
+
+def _update_status_item(request_id: str, attributes: Dict[str, Any], only_if_new: bool = False) -> bool:
+    """
+    Sets attributes on the status item of a request (creating it if needed).
+    With `only_if_new`, nothing is written when the item already has a Status.
+    Returns False when the conditional write was skipped.
+    """
+    table = get_dynamo_table()
+    update = {
+        'Key': {'PK': request_id},
+        'UpdateExpression': 'SET ' + ', '.join(f'#{k} = :{k}' for k in attributes),
+        'ExpressionAttributeNames': {f'#{k}': k for k in attributes},
+        'ExpressionAttributeValues': {f':{k}': v for k, v in attributes.items()}
+    }
+    if only_if_new:
+        update['ConditionExpression'] = 'attribute_not_exists(#StatusGuard)'
+        update['ExpressionAttributeNames']['#StatusGuard'] = 'Status'
+    try:
+        table.update_item(**update)
+        return True
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+            return False
+        raise
+
+def save_result_to_dynamo(request_id: str, status: str, results: List[Dict[str, Any]] = None, error_msg: str = None,
+                          result_count: int = None, only_if_new: bool = False, timings: Dict[str, float] = None,
+                          metadata: Dict[str, Any] = None):
+    """
+    Saves the processing status and results summary to DynamoDB.
+    The status item is updated in place, so resume checkpoints written during parsing are kept.
+    `only_if_new` never overwrites an existing status (e.g. a job that already finished).
+    `timings` (seconds per pipeline stage) is stored as the job's 'Timings' breakdown, and the
+    document-level `metadata` (report header) once as 'Metadata', instead of on every table.
+    """
     
     item = {
-        'PK': request_id,
         'Status': status,
         'Timestamp': datetime.now().isoformat()
     }
@@ -49,30 +175,345 @@ def save_result_to_dynamo(request_id: str, status: str, results: List[Dict[str,
     if results:
         # Saving the count demonstrates the scale of data processed.
         item['ResultCount'] = len(results)
+    if result_count is not None:
+        item['ResultCount'] = result_count
     if error_msg:
         item['ErrorMessage'] = error_msg
+    if timings:
+        item['Timings'] = _to_dynamo_value(timings)
+    if metadata:
+        item['Metadata'] = _to_dynamo_value(metadata)
         
     try:
-        table.put_item(Item=item)
-        logger.info(f"DynamoDB status updated for {request_id}: {status}")
+        if _update_status_item(request_id, item, only_if_new):
+            logger.info(f"DynamoDB status updated for {request_id}: {status}")
     except ClientError as e:
         logger.error(f"DynamoDB Error: {e}")
         # Failure to log status does not crash the main thread.
 
-def send_webhook_notification(url: str, request_id: str, status: str, error: str = None):
-    """Sends a completion/error notification back to the client's webhook endpoint."""
-    if not url:
-        return
+def save_backup_status(request_id: str, backup_status: str, error_msg: str = None):
+    """Records the outcome of the asynchronous raw-file backup on the status item."""
+    attributes = {'BackupStatus': backup_status}
+    if error_msg:
+        attributes['BackupError'] = error_msg
+    try:
+        _update_status_item(request_id, attributes)
+    except ClientError as e:
+        logger.error(f"DynamoDB backup status error for {request_id}: {e}")
+
+def _table_key(request_id: str, table_index: int) -> str:
+    return f"{request_id}#TABLE#{table_index:05d}"
+
+def _item_size(item: Dict[str, Any]) -> int:
+    """Approximates the DynamoDB item size with its JSON encoding (an upper bound in practice)."""
+    return len(encode_json(item))
+
+def _split_content(content: Any) -> Tuple[Optional[Dict[str, Any]], List[Any]]:
+    """
+    Separates table content into the part shared by all rows (None for records; the column
+    labels and types of the compact formats) and its list of rows, so large tables can be split.
+    """
+    if isinstance(content, list):
+        return None, content
+    if 'rows' in content:
+        return {k: v for k, v in content.items() if k != 'rows'}, content['rows']
+    return {k: v for k, v in content.items() if k != 'data'}, [list(row) for row in zip(*content['data'])]
+
+def _join_content(header: Optional[Dict[str, Any]], rows: List[Any]) -> Any:
+    """Inverse of _split_content."""
+    if header is None:
+        return rows
+    if 'rows' not in header and 'types' in header:
+        return dict(header, data=[list(column) for column in zip(*rows)] if rows else [[] for _ in header['columns']])
+    return dict(header, rows=rows)
+
+def _table_items(request_id: str, parsed_table: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Builds the DynamoDB items for one parsed table, keeping every item under DYNAMO_ITEM_BUDGET.
+    - Small tables: one item holding the whole table.
+    - Large tables: a header item ('ContentParts', plus the column labels of the compact
+      formats as 'ContentHeader') and the rows split with `chunker` into part items
+      ('<table key>#PART#<n>').
+    - Huge tables (more than MAX_CONTENT_PARTS parts): content offloaded to S3 as a JSON blob
+      compressed with RESULT_COMPRESSION; the header item keeps a 'ContentS3Key' pointer.
+    """
+    key = _table_key(request_id, parsed_table['table_index'])
+    item = {'PK': key, 'RequestId': request_id, **parsed_table}
+    size = _item_size(item)
+    if size <= DYNAMO_ITEM_BUDGET:
+        return [_to_dynamo_value(item)]
+
+    content_header, rows = _split_content(parsed_table['content'])
+    header = {k: v for k, v in item.items() if k != 'content'}
+    header['RowCount'] = len(rows)
+    rows_per_part = max(1, int(len(rows) * DYNAMO_ITEM_BUDGET * 0.9 / size))
+    parts = list(chunker(rows, rows_per_part))
+
+    if len(parts) > MAX_CONTENT_PARTS or any(_item_size({'content': part}) > DYNAMO_ITEM_BUDGET for part in parts):
+        codec = available_codec(RESULT_COMPRESSION)
+        suffix, encoding = CODECS[codec]
+        s3_key = f"{RESULTS_PREFIX}/{request_id}/table-{parsed_table['table_index']:05d}.json{suffix}"
+        extra = {'ContentEncoding': encoding} if encoding else {}
+        get_s3_client().put_object(
+            Bucket=S3_BUCKET, Key=s3_key,
+            Body=compress(encode_json(parsed_table['content']), codec),
+            ContentType='application/json', **extra
+        )
+        logger.info(f"Offloaded oversized table {key} ({size} bytes) to s3://{S3_BUCKET}/{s3_key}")
+        return [_to_dynamo_value({**header, 'ContentS3Key': s3_key})]
+
+    if content_header is not None:
+        header['ContentHeader'] = content_header
+    items = [_to_dynamo_value({**header, 'ContentParts': len(parts)})]
+    for n, part in enumerate(parts):
+        items.append(_to_dynamo_value({'PK': f"{key}#PART#{n:03d}", 'RequestId': request_id, 'content': part}))
+    return items
+
+def save_table_batch(request_id: str, tables: List[Dict[str, Any]]):
+    """
+    Persists a batch of parsed tables, one item per table (PK '<request_id>#TABLE#<index>'),
+    split or offloaded to S3 when a table would exceed the DynamoDB item size limit.
+    Writes are idempotent: re-parsing a page after a resume overwrites the same items.
+    """
+    table = get_dynamo_table()
+    try:
+        with table.batch_writer(overwrite_by_pkeys=['PK']) as writer:
+            for parsed_table in tables:
+                for item in _table_items(request_id, parsed_table):
+                    writer.put_item(Item=item)
+        logger.info(f"DynamoDB saved {len(tables)} tables for {request_id}")
+    except ClientError as e:
+        logger.error(f"DynamoDB batch write error for {request_id}: {e}")
+        # Losing parsed tables is a critical failure: the job must not be reported as DONE.
+        raise e
+
+def _from_dynamo_value(value: Any) -> Any:
+    """Converts DynamoDB Decimals back to int/float."""
+    if isinstance(value, list):
+        return [_from_dynamo_value(v) for v in value]
+    if isinstance(value, dict):
+        return {k: _from_dynamo_value(v) for k, v in value.items()}
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    return value
+
+def _batch_get(keys: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Reads items by PK with BatchGetItem (100 keys per call, retrying unprocessed keys)."""
+    dynamodb = get_dynamo_resource()
+    found = {}
+    for key_chunk in chunker(keys, 100):
+        request = {DYNAMO_TABLE: {'Keys': [{'PK': k} for k in key_chunk]}}
+        while request:
+            response = dynamodb.batch_get_item(RequestItems=request)
+            for raw in response['Responses'].get(DYNAMO_TABLE, []):
+                found[raw['PK']] = raw
+            request = response.get('UnprocessedKeys') or None
+    return found
+
+def load_results(request_id: str, result_count: int) -> List[Dict[str, Any]]:
+    """
+    Loads the parsed tables of a request in table order, reassembling
+    tables that were split into parts or offloaded to S3.
+    """
+    headers = _batch_get([_table_key(request_id, i) for i in range(result_count)])
+    part_keys = [f"{key}#PART#{n:03d}" for key, item in headers.items()
+                 for n in range(int(item.get('ContentParts', 0)))]
+    parts = _batch_get(part_keys) if part_keys else {}
+
+    results = []
+    for i in range(result_count):
+        item = headers.get(_table_key(request_id, i))
+        if item is None:
+            continue
+        if 'ContentS3Key' in item:
+            body = get_s3_client().get_object(Bucket=S3_BUCKET, Key=item['ContentS3Key'])['Body'].read()
+            item['content'] = decode_json(decompress(body))
+        elif 'ContentParts' in item:
+            item['content'] = _join_content(item.get('ContentHeader'),
+                                            [row for n in range(int(item['ContentParts']))
+                                             for row in parts[f"{item['PK']}#PART#{n:03d}"]['content']])
+        results.append(_from_dynamo_value(
+            {k: v for k, v in item.items()
+             if k not in ('PK', 'RequestId', 'ContentParts', 'ContentS3Key', 'ContentHeader', 'RowCount')}))
+    return results
+
+def save_job_progress(request_id: str, resume_page: int, resume_index: int):
+    """Stores the resume checkpoint of a partially processed document on its status item."""
+    try:
+        _update_status_item(request_id, {'ResumePage': resume_page, 'ResumeIndex': resume_index,
+                                         'Timestamp': datetime.now().isoformat()})
+    except ClientError as e:
+        logger.error(f"DynamoDB progress update error for {request_id}: {e}")
+
+def load_status(request_id: str) -> Optional[Dict[str, Any]]:
+    """Returns the status item of a request ('Status', 'ResultCount', 'Timings', ...), or None if unknown."""
+    item = get_dynamo_table().get_item(Key={'PK': request_id}).get('Item')
+    return _from_dynamo_value(item) if item else None
 
-    payload = {
-        'request_id': request_id,
-        'status': status
+def get_job_progress(request_id: str) -> Optional[Dict[str, int]]:
+    """Returns the resume checkpoint of an unfinished job, or None to start from the first page."""
+    table = get_dynamo_table()
+    try:
+        item = table.get_item(Key={'PK': request_id}).get('Item')
+    except ClientError as e:
+        logger.error(f"DynamoDB progress read error for {request_id}: {e}")
+        return None
+    if not item or item.get('Status') == 'DONE' or 'ResumePage' not in item:
+        return None
+    return {'resume_page': int(item['ResumePage']), 'resume_index': int(item['ResumeIndex'])}
+
+def save_webhook_dead_letter(url: str, payload: Dict[str, Any], attempts: int, reason: str):
+    """Records a webhook notification that could not be delivered, for inspection or replay."""
+    request_id = payload.get('request_id', 'unknown')
+    item = {
+        'PK': f"DLQ#WEBHOOK#{request_id}#{datetime.now().isoformat()}",
+        'RequestId': request_id,
+        'Url': url,
+        'Payload': _to_dynamo_value(payload),
+        'Attempts': attempts,
+        'ErrorMessage': reason or 'unknown',
+        'Timestamp': datetime.now().isoformat()
     }
-    if error:
-        payload['error'] = error
+    try:
+        get_dynamo_table().put_item(Item=item)
+        logger.info(f"Webhook for {request_id} dead-lettered after {attempts} attempts")
+    except (ClientError, BotoCoreError) as e:
+        logger.error(f"DynamoDB dead-letter write error for {request_id}: {e}")
+
+# --- DOCUMENT DEDUPLICATION (content hash -> owning request) ---
 
+def document_key(content_hash: str, parser_version: str) -> str:
+    """PK of the dedup record of a document: same bytes + same parser version = same result."""
+    return f"HASH#{content_hash}#{parser_version}"
+
+def claim_document(key: str, request_id: str, stale_after: Optional[int]) -> Optional[Dict[str, Any]]:
+    """
+    Atomically registers `request_id` as the request parsing the document `key`.
+    Returns None when the claim was taken, otherwise the existing dedup record
+    ('RequestId', 'ClaimState' PROCESSING/DONE, 'ResultCount', 'ClaimedAt').
+    Failed claims, and PROCESSING claims older than `stale_after` seconds
+    (e.g. a worker that was killed; None = never), can be taken over. A taken-over
+    claim keeps its subscribers, which are then notified when the new owner finishes.
+    """
+    table = get_dynamo_table()
+    now = int(datetime.now().timestamp())
+    condition = 'attribute_not_exists(PK) OR ClaimState = :error'
+    values = {':error': 'ERROR', ':rid': request_id, ':state': 'PROCESSING', ':now': now,
+              ':ts': datetime.now().isoformat()}
+    if stale_after is not None:
+        condition += ' OR (ClaimState = :state AND ClaimedAt < :stale)'
+        values[':stale'] = now - stale_after
     try:
-        requests.post(url, json=payload, timeout=5)
-        logger.info(f"Webhook sent successfully for {request_id} with status {status}")
-    except Exception as e:
-        logger.error(f"Webhook failed for {request_id}: {e}")
+        table.update_item(
+            Key={'PK': key},
+            UpdateExpression='SET RequestId = :rid, ClaimState = :state, ClaimedAt = :now, #Timestamp = :ts '
+                             'REMOVE ResultCount',
+            ConditionExpression=condition,
+            ExpressionAttributeNames={'#Timestamp': 'Timestamp'},
+            ExpressionAttributeValues=values
+        )
+        return None
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            raise
+    return _from_dynamo_value(table.get_item(Key={'PK': key}, ConsistentRead=True).get('Item'))
+
+def subscribe_to_document(key: str, webhook_url: str) -> bool:
+    """
+    Adds a client webhook to a document that is still being parsed by another API worker.
+    Returns False when the claim is no longer PROCESSING (the caller should re-read it).
+    """
+    try:
+        get_dynamo_table().update_item(
+            Key={'PK': key},
+            UpdateExpression='SET Subscribers = list_append(if_not_exists(Subscribers, :empty), :url)',
+            ConditionExpression='ClaimState = :processing',
+            ExpressionAttributeValues={':empty': [], ':url': [webhook_url], ':processing': 'PROCESSING'}
+        )
+        return True
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+            return False
+        raise
+
+def finish_document_claim(key: str, request_id: str, state: str, result_count: int = None) -> List[str]:
+    """
+    Marks the owner's claim as DONE (reusable result) or ERROR (next upload parses again)
+    and returns the webhooks of the requests that subscribed to it meanwhile.
+    """
+    update = 'SET ClaimState = :state, #Timestamp = :ts'
+    values = {':state': state, ':ts': datetime.now().isoformat(), ':rid': request_id}
+    if result_count is not None:
+        update += ', ResultCount = :count'
+        values[':count'] = result_count
+    try:
+        response = get_dynamo_table().update_item(
+            Key={'PK': key},
+            UpdateExpression=update + ' REMOVE Subscribers',
+            ConditionExpression='RequestId = :rid',
+            ExpressionAttributeNames={'#Timestamp': 'Timestamp'},
+            ExpressionAttributeValues=values,
+            ReturnValues='ALL_OLD'
+        )
+    except ClientError as e:
+        # Lost the claim (taken over as stale) or DynamoDB unavailable: nothing to hand over
+        logger.error(f"DynamoDB claim update error for {key}: {e}")
+        return []
+    return response.get('Attributes', {}).get('Subscribers', [])
+
+# --- BATCHES ---
+
+def save_batch(batch_id: str, documents: List[Dict[str, Any]]):
+    """Records a batch upload (PK 'BATCH#<id>') with the request id and initial status of each document."""
+    item = {
+        'PK': f"BATCH#{batch_id}",
+        'Documents': _to_dynamo_value(documents),
+        'DocumentCount': len(documents),
+        'CreatedAt': Decimal(str(round(datetime.now().timestamp(), 3))),
+        'Timestamp': datetime.now().isoformat()
+    }
+    try:
+        get_dynamo_table().put_item(Item=item)
+    except ClientError as e:
+        logger.error(f"DynamoDB batch record error for {batch_id}: {e}")
+        raise e
+
+def load_batch(batch_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Returns the progress of a batch: each document with the current status of its request
+    (read in bulk with BatchGetItem), totals per status and the throughput so far.
+    None when the batch does not exist.
+    """
+    item = get_dynamo_table().get_item(Key={'PK': f"BATCH#{batch_id}"}).get('Item')
+    if item is None:
+        return None
+    documents = _from_dynamo_value(item['Documents'])
+    statuses = _batch_get(list(dict.fromkeys(doc['request_id'] for doc in documents)))
+
+    counts: Dict[str, int] = {}
+    for doc in documents:
+        current = statuses.get(doc['request_id'], {})
+        if current.get('Status'):
+            doc['status'] = current['Status']
+        if 'ResultCount' in current:
+            doc['result_count'] = int(current['ResultCount'])
+        if current.get('ErrorMessage'):
+            doc['error'] = current['ErrorMessage']
+        counts[doc['status']] = counts.get(doc['status'], 0) + 1
+
+    finished = counts.get('DONE', 0) + counts.get('ERROR', 0) + counts.get('INVALID', 0)
+    end = datetime.now().timestamp()
+    if finished == len(documents) and statuses:
+        # Completed batch: measure up to the last status change, not up to this request
+        end = max((datetime.fromisoformat(s['Timestamp']).timestamp() for s in statuses.values() if 'Timestamp' in s),
+                  default=end)
+    elapsed = max(end - float(item['CreatedAt']), 1e-3)
+    return {
+        'Batch_Id': batch_id,
+        'document_count': len(documents),
+        'counts': counts,
+        'progress': round(finished / len(documents), 4) if documents else 1.0,
+        'elapsed_seconds': round(elapsed, 1),
+        'documents_per_minute': round(counts.get('DONE', 0) * 60 / elapsed, 2),
+        'documents': documents
+    }
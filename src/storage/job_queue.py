@@ -0,0 +1,344 @@
+import os
+import json
+import time
+import uuid
+import random
+import socket
+import sqlite3
+import logging
+import threading
+from typing import Any, Callable, Dict, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+# --- CONFIGURATION (overridable via environment) ---
+# Durable queue of parsing jobs (empty = jobs are only held in memory by the API worker that
+# received them). 'sqlite:///<relative path>', 'sqlite:////<absolute path>' or a plain path:
+# a SQLite file on a volume shared by every API worker and container of the node that should
+# pull jobs from it.
+JOB_QUEUE_URL = os.environ.get("PARSER_JOB_QUEUE", "")
+# Seconds a leased job stays invisible to other consumers. Running jobs renew their lease, so
+# this only bounds how long a job whose consumer died (worker killed, node lost) waits to be redelivered.
+VISIBILITY_TIMEOUT = int(os.environ.get("JOB_QUEUE_VISIBILITY", 120))
+# Deliveries of a job before it is dead-lettered (crashes and expired leases count as attempts).
+MAX_ATTEMPTS = int(os.environ.get("JOB_QUEUE_MAX_ATTEMPTS", 3))
+# Base delay (seconds) before a failed job is retried, doubled per attempt (with jitter).
+RETRY_BACKOFF = float(os.environ.get("JOB_QUEUE_RETRY_BACKOFF", 10))
+# Idle consumers look for new jobs this often (seconds).
+POLL_INTERVAL = float(os.environ.get("JOB_QUEUE_POLL_INTERVAL", 1.0))
+# Dead-lettered jobs are kept this long (seconds) for inspection, then purged by the consumers (0 = forever).
+DEAD_RETENTION = int(os.environ.get("JOB_QUEUE_DEAD_RETENTION", 7 * 24 * 3600))
+
+# Priorities: interactive uploads go before batch backfills
+PRIORITY_INTERACTIVE = 10
+PRIORITY_BATCH = 0
+
+
+class QueuedJob(NamedTuple):
+    """A job delivered to a consumer. `lease_id` fences every later update to this delivery."""
+    job_id: str
+    payload: Dict[str, Any]
+    priority: int
+    attempts: int
+    lease_id: str
+
+
+class JobQueue(object):
+    """
+    Interface of a durable job queue with leases (at-least-once delivery).
+
+    A consumer leases a job, which hides it from other consumers for `visibility_timeout`
+    seconds; it must then `complete` it, `fail` it (retried with backoff until `max_attempts`,
+    then dead-lettered) or `release` it, and `extend` the lease while the job runs. A lease
+    that expires makes the job visible again, so a job held by a dead consumer is redelivered.
+    Updates carrying a stale lease (the job was redelivered meanwhile) are ignored.
+    """
+    def put(self, payload: Dict[str, Any], priority: int = 0, job_id: Optional[str] = None) -> str:
+        raise NotImplementedError
+
+    def lease(self, consumer: str, visibility_timeout: Optional[int] = None,
+              on_dead: Optional[Callable[[QueuedJob, str], None]] = None) -> Optional[QueuedJob]:
+        """Next job by priority, or None. Jobs dead-lettered on the way are passed to `on_dead(job, error)`."""
+        raise NotImplementedError
+
+    def extend(self, job: QueuedJob, visibility_timeout: Optional[int] = None) -> bool:
+        raise NotImplementedError
+
+    def complete(self, job: QueuedJob) -> bool:
+        raise NotImplementedError
+
+    def fail(self, job: QueuedJob, error: str) -> bool:
+        """Returns True when the job was scheduled for another attempt, False when it was dead-lettered."""
+        raise NotImplementedError
+
+    def release(self, job: QueuedJob) -> bool:
+        """Hands a leased job back without counting the attempt (e.g. the consumer is shutting down)."""
+        raise NotImplementedError
+
+    def state(self, job_id: str) -> Optional[str]:
+        """State of a job ('queued', 'leased', 'dead'), or None once it completed (or was never put)."""
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, int]:
+        """Number of jobs per state ('queued', 'leased', 'dead')."""
+        raise NotImplementedError
+
+    def purge_dead(self, older_than: float) -> int:
+        """Deletes the jobs dead-lettered more than `older_than` seconds ago. Returns how many were deleted."""
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        """Jobs waiting for a consumer."""
+        return self.stats().get('queued', 0)
+
+
+class SQLiteJobQueue(JobQueue):
+    """
+    JobQueue stored in a SQLite file (WAL mode). Every process and thread opens its own
+    connection, and leases are taken in IMMEDIATE transactions, so any number of worker
+    processes or containers sharing the file (on one host) pull jobs from it safely.
+    A dead-lettered job keeps the time it died in `available_at` (no longer used for delivery).
+    """
+    def __init__(self, path: str, visibility_timeout: int = VISIBILITY_TIMEOUT,
+                 max_attempts: int = MAX_ATTEMPTS, retry_backoff: float = RETRY_BACKOFF):
+        self.path = path
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max(1, max_attempts)
+        self.retry_backoff = retry_backoff
+        self._local = threading.local()
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute('CREATE TABLE IF NOT EXISTS jobs ('
+                               'job_id TEXT PRIMARY KEY, payload TEXT NOT NULL, priority INTEGER NOT NULL, '
+                               'state TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, '
+                               'available_at REAL NOT NULL, lease_id TEXT, leased_by TEXT, '
+                               'lease_expires REAL, error TEXT, created_at REAL NOT NULL)')
+            connection.execute('CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (state, priority DESC, available_at)')
+            self._local.connection, self._local.pid = connection, os.getpid()
+        return connection
+
+    def put(self, payload: Dict[str, Any], priority: int = 0, job_id: Optional[str] = None) -> str:
+        job_id = job_id or str(uuid.uuid4())
+        now = time.time()
+        # Re-putting a known job id is a no-op, so a retried request cannot enqueue a document twice
+        self._connection().execute(
+            "INSERT OR IGNORE INTO jobs (job_id, payload, priority, state, available_at, created_at) "
+            "VALUES (?, ?, ?, 'queued', ?, ?)", (job_id, json.dumps(payload), priority, now, now))
+        return job_id
+
+    def lease(self, consumer: str, visibility_timeout: Optional[int] = None,
+              on_dead: Optional[Callable[[QueuedJob, str], None]] = None) -> Optional[QueuedJob]:
+        now = time.time()
+        connection = self._connection()
+        dead, leased = [], None
+        with connection:
+            connection.execute('BEGIN IMMEDIATE')
+            while leased is None:
+                row = connection.execute(
+                    "SELECT job_id, payload, priority, attempts, state FROM jobs "
+                    "WHERE (state = 'queued' AND available_at <= ?) OR (state = 'leased' AND lease_expires <= ?) "
+                    "ORDER BY priority DESC, available_at, created_at LIMIT 1", (now, now)).fetchone()
+                if row is None:
+                    break
+                job_id, payload, priority, attempts, state = row
+                if state == 'leased' and attempts >= self.max_attempts:
+                    # Its consumers kept dying (e.g. the document crashes the worker): stop redelivering it
+                    error = f"Lease expired on all {attempts} attempts."
+                    connection.execute("UPDATE jobs SET state = 'dead', lease_id = NULL, available_at = ?, error = ? "
+                                       "WHERE job_id = ?", (now, error, job_id))
+                    logger.error(f"Job {job_id} dead-lettered: {error}")
+                    dead.append((QueuedJob(job_id, json.loads(payload), priority, attempts, ''), error))
+                    continue
+                if state == 'leased':
+                    logger.warning(f"Lease of job {job_id} expired, redelivering it (attempt {attempts + 1}).")
+                lease_id = uuid.uuid4().hex
+                connection.execute(
+                    "UPDATE jobs SET state = 'leased', attempts = attempts + 1, lease_id = ?, leased_by = ?, "
+                    "lease_expires = ? WHERE job_id = ?",
+                    (lease_id, consumer, now + (visibility_timeout or self.visibility_timeout), job_id))
+                leased = QueuedJob(job_id, json.loads(payload), priority, attempts + 1, lease_id)
+        # Callbacks run after the commit, outside the write lock
+        for job, error in dead if on_dead is not None else ():
+            on_dead(job, error)
+        return leased
+
+    def _update_lease(self, job: QueuedJob, assignments: str, values: tuple) -> bool:
+        cursor = self._connection().execute(
+            f"UPDATE jobs SET {assignments} WHERE job_id = ? AND lease_id = ? AND state = 'leased'",
+            (*values, job.job_id, job.lease_id))
+        return cursor.rowcount == 1
+
+    def extend(self, job: QueuedJob, visibility_timeout: Optional[int] = None) -> bool:
+        return self._update_lease(job, 'lease_expires = ?',
+                                  (time.time() + (visibility_timeout or self.visibility_timeout),))
+
+    def complete(self, job: QueuedJob) -> bool:
+        cursor = self._connection().execute(
+            "DELETE FROM jobs WHERE job_id = ? AND lease_id = ? AND state = 'leased'", (job.job_id, job.lease_id))
+        return cursor.rowcount == 1
+
+    def fail(self, job: QueuedJob, error: str) -> bool:
+        if job.attempts >= self.max_attempts:
+            self._update_lease(job, "state = 'dead', lease_id = NULL, available_at = ?, error = ?", (time.time(), error))
+            logger.error(f"Job {job.job_id} dead-lettered after {job.attempts} attempts: {error}")
+            return False
+        delay = self.retry_backoff * 2 ** (job.attempts - 1) * random.uniform(0.8, 1.2)
+        return self._update_lease(job, "state = 'queued', lease_id = NULL, available_at = ?, error = ?",
+                                  (time.time() + delay, error))
+
+    def release(self, job: QueuedJob) -> bool:
+        return self._update_lease(job, "state = 'queued', lease_id = NULL, attempts = attempts - 1, available_at = ?",
+                                  (time.time(),))
+
+    def state(self, job_id: str) -> Optional[str]:
+        row = self._connection().execute("SELECT state FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return row[0] if row else None
+
+    def stats(self) -> Dict[str, int]:
+        rows = self._connection().execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall()
+        return {state: count for state, count in rows}
+
+    def purge_dead(self, older_than: float) -> int:
+        cursor = self._connection().execute("DELETE FROM jobs WHERE state = 'dead' AND available_at <= ?",
+                                            (time.time() - older_than,))
+        if cursor.rowcount:
+            logger.info(f"Purged {cursor.rowcount} dead-lettered jobs older than {older_than:.0f}s.")
+        return cursor.rowcount
+
+
+# Queue backends by URL scheme; a networked backend (e.g. for several nodes) registers here
+BACKENDS: Dict[str, Callable[[str], JobQueue]] = {
+    'sqlite': SQLiteJobQueue,
+}
+
+
+def open_job_queue(url: str) -> JobQueue:
+    """
+    Opens the queue described by `url` ('<scheme>://<location>'; a plain path means SQLite).
+    SQLite URLs follow the SQLAlchemy convention: 'sqlite:///jobs.sqlite3' is relative to the
+    working directory, 'sqlite:////app/queue/jobs.sqlite3' is absolute.
+    """
+    if '://' not in url:
+        return SQLiteJobQueue(url)
+    scheme, location = url.split('://', 1)
+    if scheme not in BACKENDS:
+        raise ValueError(f"Unsupported job queue backend {scheme!r} (available: {sorted(BACKENDS)})")
+    if scheme == 'sqlite':
+        # Exactly one '/' separates the (empty) host from the path
+        location = location[1:] if location.startswith('/') else location
+    return BACKENDS[scheme](location)
+
+
+class QueueConsumer(object):
+    """
+    Pulls jobs from a JobQueue into local capacity: whenever `has_capacity()` allows it, a job is
+    leased and handed to `start(job)`, which must eventually call `finished(job)`. Leases of the
+    jobs started here are renewed in the background, so only jobs of a dead consumer time out.
+    Jobs this consumer finds dead-lettered (their leases kept expiring) go to `on_dead(job, error)`;
+    dead-lettered jobs older than `dead_retention` seconds are purged from the queue.
+    """
+    def __init__(self, queue: JobQueue, start: Callable[[QueuedJob], None], has_capacity: Callable[[], bool],
+                 poll_interval: float = POLL_INTERVAL, consumer_id: Optional[str] = None,
+                 on_dead: Optional[Callable[[QueuedJob, str], None]] = None,
+                 dead_retention: float = DEAD_RETENTION):
+        self.queue = queue
+        self.dead_retention = dead_retention
+        self._start = start
+        self._has_capacity = has_capacity
+        self._on_dead = on_dead
+        self.poll_interval = poll_interval
+        self.consumer_id = consumer_id or f"{socket.gethostname()}:{os.getpid()}"
+        self._running: Dict[str, QueuedJob] = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> int:
+        return len(self._running)
+
+    def start(self):
+        """Starts the consumer thread (idempotent)."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name='job-queue-consumer', daemon=True)
+            self._thread.start()
+        logger.info(f"Job queue consumer {self.consumer_id} started.")
+
+    def notify(self, *_):
+        """Wakes the consumer up (new job enqueued or local capacity freed)."""
+        self._wakeup.set()
+
+    def finished(self, job: QueuedJob):
+        with self._lock:
+            self._running.pop(job.job_id, None)
+        self.notify()
+
+    def stop(self):
+        """Stops leasing new jobs. Jobs already started keep their leases until they finish."""
+        self._stopped.set()
+        self._wakeup.set()
+
+    def poll(self) -> int:
+        """Leases and starts jobs while there is capacity. Returns the number of jobs started."""
+        started = 0
+        while not self._stopped.is_set() and self._has_capacity():
+            job = self.queue.lease(self.consumer_id, on_dead=self._on_dead)
+            if job is None:
+                break
+            with self._lock:
+                self._running[job.job_id] = job
+            try:
+                self._start(job)
+            except Exception as e:
+                logger.error(f"Could not start job {job.job_id}: {e}")
+                self.finished(job)
+                self.queue.release(job)
+                break
+            started += 1
+        return started
+
+    def _renew_leases(self):
+        with self._lock:
+            jobs = list(self._running.values())
+        for job in jobs:
+            if not self.queue.extend(job):
+                logger.warning(f"Lost the lease of job {job.job_id}: it may be redelivered to another consumer.")
+
+    def _run(self):
+        renew_every = max(1.0, getattr(self.queue, 'visibility_timeout', VISIBILITY_TIMEOUT) / 3)
+        renewed_at = time.monotonic()
+        # Purge at startup, then at most hourly (or every retention period, if shorter)
+        purge_every = min(3600.0, self.dead_retention)
+        purged_at = None
+        while True:
+            try:
+                if time.monotonic() - renewed_at >= renew_every:
+                    self._renew_leases()
+                    renewed_at = time.monotonic()
+                if self.dead_retention and (purged_at is None or time.monotonic() - purged_at >= purge_every):
+                    purged_at = time.monotonic()
+                    self.queue.purge_dead(self.dead_retention)
+                if self._stopped.is_set():
+                    # Keep renewing the leases of the jobs still draining, then exit
+                    if not self._running:
+                        return
+                else:
+                    self.poll()
+            except Exception as e:
+                logger.error(f"Job queue consumer error: {e}")
+            self._wakeup.wait(min(self.poll_interval, renew_every))
+            self._wakeup.clear()
+
+
+# Process-wide queue used by the API (None when PARSER_JOB_QUEUE is not set)
+default_job_queue: Optional[JobQueue] = open_job_queue(JOB_QUEUE_URL) if JOB_QUEUE_URL else None
@@ -0,0 +1,231 @@
+import os
+import heapq
+import random
+import logging
+import threading
+import time
+import itertools
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from typing import Any, Callable, Dict, Optional
+
+from aws_utils import save_webhook_dead_letter
+
+logger = logging.getLogger(__name__)
+
+# --- CONFIGURATION (overridable via environment) ---
+# Delivery threads = maximum number of concurrent outbound requests per API worker
+WEBHOOK_WORKERS = int(os.environ.get("WEBHOOK_WORKERS", 4))
+# Retries after the first attempt before a notification is dead-lettered
+WEBHOOK_MAX_RETRIES = int(os.environ.get("WEBHOOK_MAX_RETRIES", 5))
+# Exponential backoff: base * 2^(attempt - 1) seconds (with jitter), capped at the maximum
+WEBHOOK_BACKOFF_BASE = float(os.environ.get("WEBHOOK_BACKOFF_BASE", 1.0))
+WEBHOOK_BACKOFF_MAX = float(os.environ.get("WEBHOOK_BACKOFF_MAX", 60.0))
+WEBHOOK_TIMEOUT = float(os.environ.get("WEBHOOK_TIMEOUT", 5.0))
+# Pending notifications (including scheduled retries) kept in memory before new ones are refused
+WEBHOOK_QUEUE_SIZE = int(os.environ.get("WEBHOOK_QUEUE_SIZE", 1000))
+# Keep-alive connections kept per client host
+WEBHOOK_POOL_MAXSIZE = int(os.environ.get("WEBHOOK_POOL_MAXSIZE", 10))
+
+# Statuses worth retrying; any other non-2xx answer is a permanent failure
+RETRYABLE_STATUS = {408, 425, 429, 500, 502, 503, 504}
+
+
+class WebhookDelivery:
+    """One outbound notification and its delivery state."""
+    def __init__(self, url: str, payload: Dict[str, Any]):
+        self.url = url
+        self.payload = payload
+        self.attempts = 0
+        self.last_error: Optional[str] = None
+
+
+class WebhookDispatcher:
+    """
+    Asynchronous webhook sender.
+
+    Notifications are queued and delivered by a small pool of threads, so callers never
+    wait on client endpoints. Each thread keeps a requests.Session whose adapter holds a
+    keep-alive connection pool per host. Failed deliveries are retried with exponential
+    backoff and jitter; after the last retry (or on a permanent 4xx) the notification is
+    handed to `dead_letter` (by default, a record in DynamoDB).
+    """
+    def __init__(self, workers: int = WEBHOOK_WORKERS, max_retries: int = WEBHOOK_MAX_RETRIES,
+                 backoff_base: float = WEBHOOK_BACKOFF_BASE, backoff_max: float = WEBHOOK_BACKOFF_MAX,
+                 timeout: float = WEBHOOK_TIMEOUT, queue_size: int = WEBHOOK_QUEUE_SIZE,
+                 dead_letter: Callable[[WebhookDelivery, str], None] = None):
+        self.workers = max(1, workers)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self.queue_size = queue_size
+        self.dead_letter = dead_letter or _store_dead_letter
+
+        # Deliveries ordered by due time: (due, sequence, delivery)
+        self._heap = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._in_flight = 0
+        self._threads = []
+        self._dead_letter_pool = (None, None)
+        self._pid = None
+        self._accepting = True
+        self._stopped = False
+        self._local = threading.local()
+
+    @property
+    def pending(self) -> int:
+        """Notifications queued, waiting for a retry or being delivered."""
+        return len(self._heap) + self._in_flight
+
+    def _ensure_started(self):
+        # Threads do not survive fork(): (re)start them lazily in the process that enqueues
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._threads = [threading.Thread(target=self._run, name=f"webhook-{i}", daemon=True)
+                             for i in range(self.workers)]
+            for thread in self._threads:
+                thread.start()
+
+    def _dead_letter_later(self, delivery: WebhookDelivery, reason: str):
+        # Refused notifications are recorded off the caller's thread: the API worker must not
+        # wait on DynamoDB exactly when the dispatcher is already overloaded
+        with self._condition:
+            pool, pid = self._dead_letter_pool
+            if pool is None or pid != os.getpid():
+                pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="webhook-dead-letter")
+                self._dead_letter_pool = (pool, os.getpid())
+        pool.submit(self._safe_dead_letter, delivery, reason)
+
+    def _safe_dead_letter(self, delivery: WebhookDelivery, reason: str):
+        try:
+            self.dead_letter(delivery, reason)
+        except Exception as e:
+            logger.error(f"Could not dead-letter webhook to {delivery.url} ({reason}): {e}")
+
+    def _session(self) -> requests.Session:
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=WEBHOOK_POOL_MAXSIZE, pool_maxsize=WEBHOOK_POOL_MAXSIZE)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            self._local.session = session
+        return session
+
+    def enqueue(self, url: str, payload: Dict[str, Any]) -> bool:
+        """
+        Queues a notification for delivery. Never blocks on the network.
+        Returns False (and dead-letters it) when the dispatcher is full or stopped.
+        """
+        delivery = WebhookDelivery(url, payload)
+        with self._condition:
+            if not self._accepting or self.pending >= self.queue_size:
+                accepted = False
+            else:
+                self._ensure_started()
+                heapq.heappush(self._heap, (time.monotonic(), next(self._sequence), delivery))
+                self._condition.notify()
+                accepted = True
+        if not accepted:
+            logger.error(f"Webhook queue unavailable, dropping notification to {url}")
+            self._dead_letter_later(delivery, "dispatcher queue full or stopped")
+        return accepted
+
+    def _next_delivery(self) -> Optional[WebhookDelivery]:
+        with self._condition:
+            while True:
+                if self._heap and self._heap[0][0] <= time.monotonic():
+                    self._in_flight += 1
+                    return heapq.heappop(self._heap)[2]
+                if not self._accepting and not self._heap:
+                    return None
+                wait = self._heap[0][0] - time.monotonic() if self._heap else None
+                self._condition.wait(timeout=wait)
+
+    def _run(self):
+        while True:
+            delivery = self._next_delivery()
+            if delivery is None:
+                return
+            try:
+                self._attempt(delivery)
+            except Exception as e:
+                # A delivery thread that dies takes its share of the queue with it: log and go on
+                logger.exception(f"Unexpected error delivering webhook to {delivery.url}: {e}")
+            finally:
+                with self._condition:
+                    self._in_flight -= 1
+                    self._condition.notify_all()
+
+    def _attempt(self, delivery: WebhookDelivery):
+        delivery.attempts += 1
+        retryable = True
+        try:
+            response = self._session().post(delivery.url, json=delivery.payload, timeout=self.timeout)
+            if 200 <= response.status_code < 300:
+                logger.info(f"Webhook sent successfully to {delivery.url} (attempt {delivery.attempts})")
+                return
+            delivery.last_error = f"HTTP {response.status_code}"
+            retryable = response.status_code in RETRYABLE_STATUS
+        except requests.RequestException as e:
+            delivery.last_error = str(e)
+
+        if retryable and delivery.attempts <= self.max_retries and not self._stopped:
+            delay = min(self.backoff_max, self.backoff_base * 2 ** (delivery.attempts - 1))
+            delay *= 0.5 + random.random() / 2
+            logger.warning(f"Webhook to {delivery.url} failed ({delivery.last_error}), retrying in {delay:.1f}s")
+            with self._condition:
+                heapq.heappush(self._heap, (time.monotonic() + delay, next(self._sequence), delivery))
+                self._condition.notify()
+        else:
+            logger.error(f"Webhook to {delivery.url} failed permanently after {delivery.attempts} attempts: "
+                         f"{delivery.last_error}")
+            self._safe_dead_letter(delivery, delivery.last_error)
+
+    def shutdown(self, timeout: float = 10.0):
+        """
+        Stops accepting notifications and waits up to `timeout` seconds for the queue to drain.
+        Whatever is still pending afterwards (e.g. long retry delays) is dead-lettered.
+        """
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            self._accepting = False
+            self._condition.notify_all()
+            while self.pending and time.monotonic() < deadline:
+                self._condition.wait(timeout=deadline - time.monotonic())
+            # Attempts still in flight past the deadline dead-letter themselves instead of retrying
+            self._stopped = True
+            leftovers = [delivery for _, _, delivery in self._heap]
+            self._heap.clear()
+            self._condition.notify_all()
+        for delivery in leftovers:
+            self._safe_dead_letter(delivery, f"dispatcher shut down ({delivery.last_error or 'not attempted'})")
+        pool, pid = self._dead_letter_pool
+        if pool is not None and pid == os.getpid():
+            pool.shutdown(wait=True)
+
+
+def _store_dead_letter(delivery: WebhookDelivery, reason: str):
+    save_webhook_dead_letter(delivery.url, delivery.payload, delivery.attempts, reason)
+
+
+# Process-wide dispatcher used by the API layer
+default_dispatcher = WebhookDispatcher()
+
+
+def send_webhook_notification(url: str, request_id: str, status: str, error: str = None):
+    """Queues a completion/error notification for the client's webhook endpoint (non-blocking)."""
+    if not url:
+        return
+
+    payload = {
+        'request_id': request_id,
+        'status': status
+    }
+    if error:
+        payload['error'] = error
+
+    default_dispatcher.enqueue(url, payload)
@@ -0,0 +1,319 @@
+import os
+import sys
+import tempfile
+import threading
+import pytest
+from concurrent.futures import Future
+from io import BytesIO
+from unittest.mock import call, patch
+
+# Setup Path to find source code (keep test uploads out of the working tree)
+os.environ.setdefault("UPLOAD_FOLDER", os.path.join(tempfile.gettempdir(), "cr_parser_test_uploads"))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src/api')))
+
+import app as app_module
+from job_executor import QueueFullError
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(app_module, "UPLOAD_FOLDER", str(tmp_path))
+    # Every upload is a new document unless a test says otherwise
+    monkeypatch.setattr(app_module, "_inflight", {})
+    monkeypatch.setattr(app_module, "claim_document", lambda key, request_id, stale_after: None)
+    monkeypatch.setattr(app_module, "finish_document_claim", lambda *args: [])
+    return app_module.app.test_client()
+
+def _upload(client, webhook_url=None):
+    data = {'file': (BytesIO(b'%PDF-1.4 dummy'), 'report.pdf')}
+    if webhook_url:
+        data['webhook_url'] = webhook_url
+    return client.post('/cr_parse', data=data, content_type='multipart/form-data')
+
+@patch.object(app_module, 'save_backup_status')
+@patch.object(app_module, 'save_result_to_dynamo')
+@patch.object(app_module.default_executor, 'submit')
+def test_ingest_acknowledges_before_s3_backup(mock_submit, mock_status, mock_backup_status, client):
+    """Verify the request returns while the S3 backup is still running, and the backup survives spool cleanup."""
+    release_upload = threading.Event()
+    uploaded = {}
+    backups = []
+    real_submit = app_module.ingest_executor.submit
+
+    def slow_upload(fileobj, object_name):
+        release_upload.wait(timeout=5)
+        uploaded[object_name] = fileobj.read()
+
+    def tracking_submit(*args):
+        backups.append(real_submit(*args))
+        return backups[-1]
+
+    with patch.object(app_module, 'upload_fileobj_to_s3', side_effect=slow_upload), \
+            patch.object(app_module.ingest_executor, 'submit', side_effect=tracking_submit):
+        response = _upload(client)
+        assert response.status_code == 200
+        assert not uploaded                          # acknowledged before the backup finished
+
+        # Simulate the parsing job removing the spooled file before the upload resumes
+        os.remove(mock_submit.call_args.args[1])
+        release_upload.set()
+        backups[0].result(timeout=5)
+
+    request_id = response.get_json()['Request_Id']
+    assert uploaded == {f"{request_id}.pdf": b'%PDF-1.4 dummy'}
+    mock_backup_status.assert_called_with(request_id, "DONE")
+
+@patch.object(app_module.default_executor, 'submit', side_effect=QueueFullError("full"))
+def test_ingest_returns_429_with_retry_after_when_queue_full(mock_submit, client):
+    """Verify admission control refuses uploads with 429 and a Retry-After hint."""
+    with patch.object(app_module, 'upload_fileobj_to_s3') as mock_upload:
+        response = _upload(client)
+
+    assert response.status_code == 429
+    assert response.headers['Retry-After'] == str(app_module.RETRY_AFTER)
+    mock_upload.assert_not_called()
+
+def test_saturated_executor_refuses_before_spooling(client, monkeypatch):
+    """Verify a full executor answers 429 without spooling, hashing or claiming the upload."""
+    monkeypatch.setattr(app_module.default_executor, '_pending', app_module.default_executor.capacity)
+    with patch.object(app_module, 'spool_upload') as mock_spool, \
+            patch.object(app_module, 'claim_document') as mock_claim:
+        response = _upload(client)
+
+    assert response.status_code == 429
+    mock_spool.assert_not_called()
+    mock_claim.assert_not_called()
+
+def test_queued_claim_is_kept_while_its_job_waits(client, monkeypatch, tmp_path):
+    """Verify in queue mode an old claim is only taken over once its job has left the queue."""
+    from job_queue import SQLiteJobQueue
+    queue = SQLiteJobQueue(str(tmp_path / 'jobs.sqlite3'))
+    monkeypatch.setattr(app_module, 'default_job_queue', queue)
+    monkeypatch.setattr(app_module, 'subscribe_to_document', lambda key, url: True)
+    old_claim = {'RequestId': 'owner', 'ClaimState': 'PROCESSING', 'ClaimedAt': 0}
+    claims = []
+
+    def claim(key, request_id, stale_after):
+        claims.append(stale_after)
+        return None if stale_after is not None else old_claim
+
+    monkeypatch.setattr(app_module, 'claim_document', claim)
+
+    queue.put({}, job_id='owner')
+    assert app_module.find_duplicate('key', 'new', 'http://hook')['Request_Id'] == 'owner'
+    assert claims == [None]
+
+    queue.complete(queue.lease('consumer'))
+    assert app_module.find_duplicate('key', 'new', 'http://hook') is None
+    assert claims == [None, None, app_module.DEDUP_CLAIM_TTL]
+
+@patch.object(app_module, 'send_webhook_notification')
+@patch.object(app_module, 'save_result_to_dynamo')
+@patch.object(app_module, 'ingest_executor')
+@patch.object(app_module.default_executor, 'submit')
+def test_duplicate_upload_attaches_to_inflight_job(mock_submit, mock_ingest, mock_status, mock_webhook, client):
+    """Verify an identical upload reuses the running job instead of parsing the document twice."""
+    job = Future()
+    mock_submit.return_value = job
+
+    first = _upload(client, 'http://client-a/hook').get_json()
+    second = _upload(client, 'http://client-b/hook').get_json()
+
+    assert mock_submit.call_count == 1
+    assert second['Request_Id'] == first['Request_Id']
+    assert second['deduplicated'] is True and second['status'] == 'PROCESSING'
+
+    job.set_result({'status': 'finished', 'result_count': 3})
+    owner_id = first['Request_Id']
+    mock_webhook.assert_has_calls([call('http://client-a/hook', owner_id, 'finished', None),
+                                   call('http://client-b/hook', owner_id, 'finished', None)], any_order=True)
+    assert app_module._inflight == {}
+
+@patch.object(app_module, 'save_batch')
+@patch.object(app_module, 'ingest_executor')
+@patch.object(app_module.default_executor, 'submit')
+def test_batch_zip_returns_per_document_status(mock_submit, mock_ingest, mock_save_batch, client, monkeypatch):
+    """Verify a ZIP batch gets one batch id, skips non-PDF members and parses identical documents once."""
+    import zipfile
+    claims = {}
+
+    def claim(key, request_id, stale_after):
+        if key in claims:
+            return {'RequestId': claims[key], 'ClaimState': 'PROCESSING'}
+        claims[key] = request_id
+
+    monkeypatch.setattr(app_module, 'claim_document', claim)
+    monkeypatch.setattr(app_module, 'subscribe_to_document', lambda key, url: True)
+    mock_submit.return_value = Future()
+
+    archive = BytesIO()
+    with zipfile.ZipFile(archive, 'w') as z:
+        z.writestr('jan/a.pdf', b'%PDF-1.4 a')
+        z.writestr('jan/b.pdf', b'%PDF-1.4 b')
+        z.writestr('jan/a-copy.pdf', b'%PDF-1.4 a')
+        z.writestr('jan/readme.txt', b'not a report')
+    archive.seek(0)
+
+    response = client.post('/cr_parse_batch', data={'files': (archive, 'january.zip')},
+                           content_type='multipart/form-data')
+    body = response.get_json()
+
+    assert response.status_code == 200 and body['Batch_Id']
+    assert [d['filename'] for d in body['documents']] == ['jan/a.pdf', 'jan/b.pdf', 'jan/a-copy.pdf']
+    assert [d['status'] for d in body['documents']] == ['QUEUED', 'QUEUED', 'PROCESSING']
+    assert body['documents'][2]['request_id'] == body['documents'][0]['request_id']
+    assert mock_submit.call_count == 2
+    mock_save_batch.assert_called_once_with(body['Batch_Id'], body['documents'])
+
+@patch.object(app_module, 'save_batch')
+def test_batch_limits_expansion_and_backlog(mock_save_batch, client, monkeypatch):
+    """Verify a ZIP expanding beyond BATCH_MAX_MB is refused before spooling, and a full backlog answers 429."""
+    import zipfile
+    monkeypatch.setattr(app_module, 'BATCH_MAX_MB', 1)
+    archive = BytesIO()
+    with zipfile.ZipFile(archive, 'w', zipfile.ZIP_DEFLATED) as z:
+        z.writestr('a.pdf', b'%PDF-1.4 ' + b'0' * 700 * 1024)
+        z.writestr('b.pdf', b'%PDF-1.4 ' + b'1' * 700 * 1024)
+    archive.seek(0)
+
+    response = client.post('/cr_parse_batch', data={'files': (archive, 'bomb.zip')},
+                           content_type='multipart/form-data')
+
+    assert response.status_code == 413
+    assert os.listdir(app_module.UPLOAD_FOLDER) == []
+
+    monkeypatch.setattr(app_module, 'BATCH_QUEUE_MAX', 1)
+    monkeypatch.setattr(app_module.batch_feeder, '_queue', app_module.deque([('x.pdf', 'x', 'kx', None)]))
+    response = client.post('/cr_parse_batch', data={'files': (BytesIO(b'%PDF-1.4 c'), 'c.pdf')},
+                           content_type='multipart/form-data')
+
+    assert response.status_code == 429 and response.headers['Retry-After']
+    mock_save_batch.assert_not_called()
+
+def test_health_and_metrics_endpoints(client):
+    """Verify /health reports executor state and /metrics exposes the job and stage series."""
+    app_module.record_job_metrics({'status': 'finished', 'timings': {'extraction': 0.4, 'total': 0.5},
+                                   'pages': 5, 'accuracies': [99.0, 92.5]})
+
+    health = client.get('/health')
+    metrics = client.get('/metrics').get_data(as_text=True)
+
+    assert health.status_code == 200 and health.get_json()['status'] == 'ok'
+    assert 'cr_parser_jobs_total{status="finished"}' in metrics
+    assert 'cr_parser_stage_seconds_count{stage="extraction"}' in metrics
+    assert 'cr_parser_extraction_accuracy_bucket{le="95"}' in metrics
+    assert 'cr_parser_queue_depth 0' in metrics
+
+def test_batch_feeder_fills_slots_freed_by_any_job(monkeypatch):
+    """Verify waiting batch documents start when an unrelated job frees a slot, not only on their own callbacks."""
+    import time
+    from job_executor import JobExecutor
+    executor = JobExecutor(max_workers=1, queue_size=0)
+    interactive = executor.submit(time.sleep, 0.5)
+    feeder = app_module.BatchFeeder()
+    executor.add_release_callback(feeder.feed)
+    started = []
+
+    def start(*entry):
+        job = executor.submit(time.sleep, 0)
+        started.append(entry)
+        return job
+    monkeypatch.setattr(app_module, 'start_document', start)
+
+    feeder.add([('a.pdf', 'a', 'ka', None), ('b.pdf', 'b', 'kb', None)])
+    assert started == [] and feeder.pending == 2
+    interactive.result(timeout=30)
+    deadline = time.monotonic() + 30
+    while feeder.pending and time.monotonic() < deadline:
+        time.sleep(0.05)
+    executor.shutdown(wait=True)
+
+    assert [entry[1] for entry in started] == ['a', 'b']
+
+def test_health_reports_durable_queue_depth(client, monkeypatch, tmp_path):
+    """Verify in queue mode /health counts waiting documents from the durable queue, not the batch feeder."""
+    from job_queue import SQLiteJobQueue, PRIORITY_BATCH
+    queue = SQLiteJobQueue(str(tmp_path / 'jobs.sqlite3'))
+    monkeypatch.setattr(app_module, 'default_job_queue', queue)
+    queue.put({}, PRIORITY_BATCH, job_id='a')
+    queue.put({}, PRIORITY_BATCH, job_id='b')
+
+    body = client.get('/health').get_json()
+
+    assert body['batch_queue'] == 2
+    assert body['job_queue'] == {'queued': 2}
+
+@patch.object(app_module, 'save_job_progress')
+@patch.object(app_module, 'save_table_batch')
+@patch.object(app_module, 'get_job_progress', return_value=None)
+@patch.object(app_module, 'save_result_to_dynamo')
+def test_job_reports_stage_breakdown(mock_status, mock_progress, mock_batch, mock_checkpoint, tmp_path):
+    """Verify a job returns its stage timings to the API process and stores them on its status record."""
+    sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../data_samples')))
+    from generate_dummy_pdf import generate_report
+    pdf_path = generate_report(str(tmp_path / "report.pdf"), pages=2)
+
+    outcome = app_module.process_document_background(pdf_path, "req-t")
+
+    assert outcome['status'] == 'finished' and outcome['pages'] == 2
+    assert {'metadata', 'layout', 'cleaning', 'serialization', 'storage', 'total'} <= set(outcome['timings'])
+    assert len(outcome['accuracies']) == 2
+    assert mock_status.call_args.args == ("req-t", "DONE")
+    assert mock_status.call_args.kwargs['timings'] == outcome['timings']
+    # The report header is stored once on the status record, not on every table
+    assert mock_status.call_args.kwargs['metadata']['vat_code'] == '99999999999'
+    assert all('metadata' not in table for table in mock_batch.call_args.args[1])
+
+@patch.object(app_module, 'save_job_progress')
+@patch.object(app_module, 'save_table_batch')
+@patch.object(app_module, 'get_job_progress', return_value=None)
+@patch.object(app_module, 'save_result_to_dynamo')
+def test_partial_result_is_stored_as_error(mock_status, mock_progress, mock_batch, mock_checkpoint, tmp_path, monkeypatch):
+    """Verify a job with a failed shard reports an error and releases its dedup claim as ERROR, not DONE."""
+    import parser_engine
+    sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../data_samples')))
+    from generate_dummy_pdf import generate_report
+    pdf_path = generate_report(str(tmp_path / "report.pdf"), pages=2)
+    monkeypatch.setattr(parser_engine, 'EXTRACTION_WORKERS', 1)
+
+    def failing_shard(*args):
+        raise RuntimeError("camelot crashed")
+    monkeypatch.setattr(parser_engine, '_extract_shard', failing_shard)
+
+    outcome = app_module.process_document_background(pdf_path, "req-p")
+
+    assert outcome['status'] == 'error' and outcome['partial'] and outcome['failed_pages']
+    assert mock_status.call_args.args == ("req-p", "ERROR")
+    claims = []
+    monkeypatch.setattr(app_module, 'finish_document_claim', lambda *args: claims.append(args) or [])
+    job = Future()
+    job.set_result(outcome)
+    with patch.object(app_module, 'send_webhook_notification'):
+        app_module.notify_client("req-p", None, "key-p", job)
+    assert claims == [("key-p", "req-p", "ERROR", None)]
+
+def test_upload_over_size_limit_is_rejected(client, monkeypatch):
+    """Verify uploads above MAX_CONTENT_LENGTH get a JSON 413 instead of being spooled."""
+    monkeypatch.setitem(app_module.app.config, 'MAX_CONTENT_LENGTH', 1024)
+    data = {'file': (BytesIO(b'%PDF-1.4 ' + b'0' * 4096), 'report.pdf')}
+
+    response = client.post('/cr_parse', data=data, content_type='multipart/form-data')
+
+    assert response.status_code == 413
+    assert 'error' in response.get_json()
+
+def test_results_endpoint_serves_compact_and_records_views(client, monkeypatch):
+    """Verify stored compact results are served gzip-compressed, or as records on request."""
+    import gzip, json
+    stored = [{'table_index': 0, 'page_number': 1, 'extraction_accuracy': 100.0,
+               'content': {'columns': [0, 1], 'rows': [['Banca', 'Importo'], ['Fido', 1000.0]]}}]
+    monkeypatch.setattr(app_module, "load_status", lambda request_id: {'Status': 'DONE', 'ResultCount': 1,
+                                                                       'Metadata': {'vat_code': '123'}})
+    monkeypatch.setattr(app_module, "load_results", lambda request_id, count: stored)
+
+    compact = client.get('/cr_parse/req-1/results', headers={'Accept-Encoding': 'gzip'})
+    assert compact.headers['Content-Encoding'] == 'gzip'
+    assert json.loads(gzip.decompress(compact.data)) == {'Request_Id': 'req-1', 'metadata': {'vat_code': '123'},
+                                                         'results': stored}
+
+    records = client.get('/cr_parse/req-1/results?format=records').get_json()['results']
+    assert records[0]['content'] == [{'0': 'Banca', '1': 'Importo'}, {'0': 'Fido', '1': 1000.0}]
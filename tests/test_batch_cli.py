@@ -0,0 +1,46 @@
+import os
+import sys
+import json
+
+# Setup Path to find source code
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src/cli')))
+sys.path.append(os.path.dirname(__file__))
+
+import batch_parse
+from test_parser import _write_grid_pdf
+
+def test_batch_cli_parses_directory_and_resumes(tmp_path):
+    """Verify the CLI parses every PDF on a process pool, writes results in bulk and skips finished ones."""
+    reports, output = tmp_path / "reports", tmp_path / "results"
+    reports.mkdir()
+    for n in range(3):
+        _write_grid_pdf(str(reports / f"report_{n}.pdf"), 2)
+    (reports / "notes.txt").write_text("not a report")
+
+    summary = batch_parse.run_batch(str(reports), str(output), workers=2)
+
+    assert (summary['documents'], summary['done'], summary['errors'], summary['tables']) == (3, 3, 0, 6)
+    assert summary['documents_per_second'] > 0
+    tables = json.loads((output / "report_1.json").read_text())
+    assert [t['page_number'] for t in tables] == [1, 2]
+    manifest = [json.loads(line) for line in (output / "manifest.jsonl").read_text().splitlines()]
+    assert sorted(os.path.basename(m['file']) for m in manifest) == ['report_0.pdf', 'report_1.pdf', 'report_2.pdf']
+
+    again = batch_parse.run_batch(str(reports), str(output), workers=2)
+    assert (again['documents'], again['skipped']) == (0, 3)
+
+def test_batch_cli_writes_compact_compressed_results(tmp_path):
+    """Verify the compact 'rows' layout is written compressed and converts back to the records view."""
+    from utils.result_codec import decode_json, decompress, as_records
+    reports = tmp_path / "reports"
+    reports.mkdir()
+    _write_grid_pdf(str(reports / "report.pdf"), 2)
+
+    batch_parse.run_batch(str(reports), str(tmp_path / "records"), workers=1)
+    batch_parse.run_batch(str(reports), str(tmp_path / "rows"), workers=1, output_format='rows', compression='gzip')
+
+    records = json.loads((tmp_path / "records" / "report.json").read_text())
+    compact_file = tmp_path / "rows" / "report.json.gz"
+    compact = decode_json(decompress(compact_file.read_bytes()))
+    assert compact[0]['content'] == {'columns': [0, 1], 'rows': [['Banca 1', 'Importo'], ['Fido', 1000.0]]}
+    assert json.loads(json.dumps(as_records(compact))) == records
@@ -0,0 +1,51 @@
+import os
+import sys
+
+# Setup Path to find source code
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../benchmarks')))
+
+import fitz
+import bench_parser
+from generate_dummy_pdf import generate_report
+from parser_engine import FinancialReportParser
+
+def test_generator_builds_requested_report_shape(tmp_path):
+    """Verify pages, landscape pages, noise pages and tables per page follow the generator options."""
+    pdf_path = generate_report(str(tmp_path / "report.pdf"), pages=4, tables_per_page=2, rows=6,
+                               landscape_pages=1, noise_pages=2, seed=7)
+
+    with fitz.open(pdf_path) as doc:
+        assert len(doc) == 6
+        assert sum(page.rect.width > page.rect.height for page in doc) == 1
+
+    parser = FinancialReportParser(max_workers=1)
+    tables = parser.process_document(pdf_path)
+    assert len(tables) == 8
+    assert {len(t['content']) for t in tables} == {7}      # header + 6 rows
+    assert parser.metadata['vat_code'] == '99999999999'
+    assert 'metadata' not in tables[0]                     # stored once per document
+
+def test_benchmark_reports_stages_and_flags_regressions(tmp_path):
+    """Verify a scenario run times every stage and the baseline comparison catches slowdowns."""
+    result = bench_parser.run_scenario('tiny', dict(pages=2, rows=4), repeat=1, workdir=str(tmp_path))
+
+    assert set(result['seconds']) == set(bench_parser.STAGES) | {'total'}
+    assert result['tables'] == 2 and result['peak_heap_mb'] > 0
+
+    results = {'scenarios': {'tiny/auto': result}}
+    slower = {'scenarios': {'tiny/auto': dict(result, seconds={k: v * 2 + 0.01 for k, v in result['seconds'].items()})}}
+    assert bench_parser.compare(results, results) == []
+    assert any('total' in line for line in bench_parser.compare(slower, results))
+
+def test_api_starts_without_the_parsing_stack():
+    """Verify the API imports without camelot/OpenCV/pandas/fitz, and a regression check flags them."""
+    import bench_startup
+    result = bench_startup.run_mode('lazy', repeat=1)
+
+    assert result['heavy_modules'] == []
+    assert result['worker_ready_seconds'] > 0 and result['rss_mb'] > 0
+
+    results = {'modes': {'lazy': result}}
+    heavier = {'modes': {'lazy': dict(result, heavy_modules=['pandas'], rss_mb=result['rss_mb'] * 2)}}
+    assert bench_startup.compare(results, results) == []
+    assert len(bench_startup.compare(heavier, results)) == 2
@@ -0,0 +1,77 @@
+import os
+import sys
+import time
+import multiprocessing
+import pytest
+
+# Setup Path to find source code
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src/core')))
+
+from job_executor import JobExecutor, QueueFullError, ExecutorShutdownError, JobTimeoutError
+
+# --- Job functions (module level so they can be pickled to worker processes) ---
+
+def slow_job(seconds):
+    time.sleep(seconds)
+    return seconds
+
+def guarded_job(seconds):
+    """Mimics process_document_background: reports timeouts instead of crashing."""
+    try:
+        time.sleep(seconds)
+        return "DONE"
+    except JobTimeoutError:
+        return "TIMEOUT"
+
+def test_executor_rejects_when_queue_is_full():
+    """Verify admission control refuses jobs beyond workers + queue size."""
+    executor = JobExecutor(max_workers=1, queue_size=1, job_timeout=0)
+    try:
+        executor.submit(slow_job, 0.5)
+        executor.submit(slow_job, 0.5)
+        with pytest.raises(QueueFullError):
+            executor.submit(slow_job, 0.5)
+    finally:
+        executor.shutdown(wait=True)
+
+def test_executor_enforces_job_timeout():
+    """Verify a job running past its time limit is interrupted inside the worker."""
+    executor = JobExecutor(max_workers=1, queue_size=0, job_timeout=1)
+    try:
+        assert executor.submit(guarded_job, 5).result(timeout=10) == "TIMEOUT"
+    finally:
+        executor.shutdown(wait=True)
+
+def test_executor_drains_and_refuses_after_shutdown():
+    """Verify shutdown waits for admitted jobs and then refuses new ones."""
+    executor = JobExecutor(max_workers=1, queue_size=2, job_timeout=0)
+    futures = [executor.submit(slow_job, 0.1) for _ in range(3)]
+    executor.shutdown(wait=True)
+
+    assert all(f.done() for f in futures)
+    assert executor.pending == 0
+    with pytest.raises(ExecutorShutdownError):
+        executor.submit(slow_job, 0.1)
+
+def crash_job():
+    os._exit(1)
+
+def test_executor_recovers_from_a_crashed_worker():
+    """Verify a worker process dying (e.g. OOM-killed) does not stop the executor from taking jobs."""
+    executor = JobExecutor(max_workers=1, queue_size=0, job_timeout=0)
+    try:
+        with pytest.raises(Exception):
+            executor.submit(crash_job).result(timeout=10)
+        assert executor.submit(slow_job, 0).result(timeout=10) == 0
+    finally:
+        executor.shutdown(wait=True)
+
+@pytest.mark.skipif('forkserver' not in multiprocessing.get_all_start_methods(),
+                    reason="platform without forkserver")
+def test_executor_forks_workers_from_the_fork_server():
+    """Verify workers are not forked from the (multithreaded) API process by default."""
+    executor = JobExecutor(max_workers=1, queue_size=0, job_timeout=0)
+    try:
+        assert executor.submit(os.getppid).result(timeout=30) != os.getpid()
+    finally:
+        executor.shutdown(wait=True)
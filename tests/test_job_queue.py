@@ -0,0 +1,108 @@
+import os
+import sys
+import time
+import threading
+
+# Setup Path to find source code
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src/storage')))
+
+from job_queue import SQLiteJobQueue, QueueConsumer, open_job_queue, PRIORITY_INTERACTIVE, PRIORITY_BATCH
+
+def test_jobs_are_leased_by_priority_and_completed_once(tmp_path):
+    """Verify interactive jobs go first, a leased job is hidden, and re-putting a job id is a no-op."""
+    queue = open_job_queue(f"sqlite:///{tmp_path}/jobs.sqlite3")
+    queue.put({'n': 1}, PRIORITY_BATCH, job_id='batch')
+    queue.put({'n': 2}, PRIORITY_INTERACTIVE, job_id='upload')
+    queue.put({'n': 3}, PRIORITY_INTERACTIVE, job_id='upload')
+    assert len(queue) == 2
+
+    first = queue.lease('node-a')
+    second = queue.lease('node-b')
+    assert (first.job_id, first.payload, first.attempts) == ('upload', {'n': 2}, 1)
+    assert second.job_id == 'batch'
+    assert queue.lease('node-c') is None
+    assert queue.stats() == {'leased': 2}
+
+    assert queue.complete(first) and queue.complete(second)
+    assert not queue.complete(first)
+    assert queue.stats() == {}
+
+def test_sqlite_urls_distinguish_relative_and_absolute_paths(tmp_path, monkeypatch):
+    """Verify 'sqlite:///rel' stays relative to the working directory and 'sqlite:////abs' is absolute."""
+    monkeypatch.chdir(tmp_path)
+    assert open_job_queue("sqlite:///queue/jobs.sqlite3").path == "queue/jobs.sqlite3"
+    assert open_job_queue("sqlite:////app/queue/jobs.sqlite3").path == "/app/queue/jobs.sqlite3"
+    assert open_job_queue("queue/jobs.sqlite3").path == "queue/jobs.sqlite3"
+
+    relative = open_job_queue("sqlite:///queue/jobs.sqlite3")
+    relative.put({'n': 1})
+    assert (tmp_path / "queue" / "jobs.sqlite3").exists()
+
+def test_expired_leases_are_redelivered_then_dead_lettered(tmp_path):
+    """Verify a dead consumer's job comes back, its stale lease is fenced off, and retries run out."""
+    queue = SQLiteJobQueue(str(tmp_path / 'jobs.sqlite3'), visibility_timeout=1, max_attempts=3, retry_backoff=0)
+    queue.put({'doc': 'a.pdf'}, job_id='a')
+
+    lost = queue.lease('node-a', visibility_timeout=0.05)
+    time.sleep(0.1)
+    redelivered = queue.lease('node-b')
+    assert redelivered.attempts == 2
+    # The first consumer wakes up late: its updates must not touch the new delivery
+    assert not queue.extend(lost) and not queue.complete(lost)
+    assert queue.extend(redelivered)
+
+    # A crash is retried (no backoff here) until the attempts run out
+    assert queue.fail(redelivered, 'worker crashed')
+    last = queue.lease('node-b', visibility_timeout=0.05)
+    assert last.attempts == 3
+    time.sleep(0.1)
+    dead = []
+    assert queue.lease('node-c', on_dead=lambda job, error: dead.append((job.job_id, error))) is None
+    assert dead == [('a', 'Lease expired on all 3 attempts.')]
+    assert queue.stats() == {'dead': 1}
+
+def test_dead_lettered_jobs_are_purged_after_retention(tmp_path):
+    """Verify dead-lettered jobs are kept for the retention period, then purged by a consumer."""
+    queue = SQLiteJobQueue(str(tmp_path / 'jobs.sqlite3'), max_attempts=1)
+    queue.put({'doc': 'a.pdf'}, job_id='a')
+    queue.put({'doc': 'b.pdf'}, job_id='b')
+    assert not queue.fail(queue.lease('node-a'), 'worker crashed')
+
+    assert queue.purge_dead(3600) == 0
+    consumer = QueueConsumer(queue, start=lambda job: None, has_capacity=lambda: False,
+                             poll_interval=0.01, dead_retention=0.01)
+    time.sleep(0.05)
+    consumer.start()
+    try:
+        deadline = time.time() + 5
+        while queue.state('a') is not None and time.time() < deadline:
+            time.sleep(0.01)
+    finally:
+        consumer.stop()
+    assert queue.stats() == {'queued': 1}
+
+def test_consumer_starts_jobs_within_capacity_and_renews_leases(tmp_path):
+    """Verify the consumer only leases what it can run and keeps running jobs' leases alive."""
+    queue = SQLiteJobQueue(str(tmp_path / 'jobs.sqlite3'), visibility_timeout=3)
+    for n in range(3):
+        queue.put({'n': n}, job_id=f"job-{n}")
+    started = []
+    consumer = QueueConsumer(queue, started.append, lambda: consumer.running < 2, poll_interval=0.05)
+    consumer.start()
+    try:
+        deadline = time.time() + 5
+        while len(started) < 2 and time.time() < deadline:
+            time.sleep(0.05)
+        time.sleep(1.5)  # past a renewal (visibility / 3)
+        assert len(started) == 2
+        assert len(queue) == 1
+        assert all(queue.extend(job) for job in started)
+
+        consumer.finished(started[0])
+        queue.complete(started[0])
+        deadline = time.time() + 5
+        while len(started) < 3 and time.time() < deadline:
+            time.sleep(0.05)
+        assert [job.job_id for job in started] == ['job-0', 'job-1', 'job-2']
+    finally:
+        consumer.stop()
@@ -0,0 +1,42 @@
+import os
+import sys
+
+# Setup Path to find source code
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src/core')))
+
+from metadata_engine import MetadataExtractor, default_extractor
+
+HEADER = (
+    "DATA DI RIFERIMENTO: 01/2025\n"
+    "Intestatario: SYNTHETIC CORP, INC.\n"
+    "Codice Fiscale: 99999999999\n"
+)
+
+def test_metadata_single_pass_extracts_all_rules():
+    """Verify every METADATA_RULES field is extracted and missing ones are None."""
+    metadata = default_extractor.extract([HEADER])
+    assert metadata == {
+        "reference_date": "01/2025",
+        "company_header": "SYNTHETIC CORP, INC.",
+        "vat_code": "99999999999",
+        "issue_date": None,
+    }
+
+def test_metadata_overlapping_rules_do_not_hide_each_other():
+    """Verify a greedy rule cannot swallow the start of another rule's match."""
+    extractor = MetadataExtractor({"LINE_PATTERN": r"Intestatario:(.*)", "CODE_PATTERN": r"Fiscale: (\d+)"})
+    metadata = extractor.extract(["Intestatario: ACME Codice Fiscale: 123"])
+    assert metadata == {"line": "ACME Codice Fiscale: 123", "code": "123"}
+
+def test_metadata_stops_reading_pages_once_complete():
+    """Verify later pages are not consumed once every field is found."""
+    extractor = MetadataExtractor({"CODE_PATTERN": r"Fiscale: (\d+)"})
+    read_pages = []
+
+    def pages():
+        for text in ("Codice Fiscale: 123", "page 2", "page 3"):
+            read_pages.append(text)
+            yield text
+
+    assert extractor.extract(pages()) == {"code": "123"}
+    assert read_pages == ["Codice Fiscale: 123"]
@@ -0,0 +1,76 @@
+import os
+import sys
+
+# Setup Path to find source code
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src/core')))
+
+from metrics import Registry, StageTimings
+
+def test_registry_renders_prometheus_text_format():
+    """Verify counters, callback gauges and cumulative histogram buckets in the exposition format."""
+    registry = Registry()
+    jobs = registry.counter("jobs_total", "Jobs.", ("status",))
+    registry.gauge("queue_depth", "Queue.", lambda: 3)
+    latency = registry.histogram("stage_seconds", "Stages.", ("stage",), buckets=(0.1, 1))
+    jobs.inc(status="finished")
+    jobs.inc(2, status="error")
+    for seconds in (0.05, 0.1, 0.5, 7):
+        latency.observe(seconds, stage="extraction")
+
+    lines = registry.render().splitlines()
+
+    assert '# TYPE jobs_total counter' in lines
+    assert 'jobs_total{status="error"} 2' in lines and 'jobs_total{status="finished"} 1' in lines
+    assert 'queue_depth 3' in lines
+    assert [line for line in lines if line.startswith('stage_seconds')] == [
+        'stage_seconds_bucket{stage="extraction",le="0.1"} 2',
+        'stage_seconds_bucket{stage="extraction",le="1"} 3',
+        'stage_seconds_bucket{stage="extraction",le="+Inf"} 4',
+        'stage_seconds_sum{stage="extraction"} 7.65',
+        'stage_seconds_count{stage="extraction"} 4',
+    ]
+
+def test_stage_timings_accumulate_per_stage():
+    """Verify repeated stages add up and merged worker breakdowns are combined."""
+    timings = StageTimings()
+    with timings.measure('cleaning'):
+        pass
+    timings.add('extraction', 0.5)
+    timings.merge({'extraction': 0.25, 'rasterization': 0.1})
+
+    assert timings.seconds['extraction'] == 0.75
+    assert set(timings.as_dict()) == {'cleaning', 'extraction', 'rasterization'}
+
+def _node_registry(directory, active_jobs):
+    registry = Registry(directory)
+    registry.counter("jobs_total", "Jobs.", ("status",)).inc(status="finished")
+    registry.histogram("job_seconds", "Jobs.", buckets=(1,)).observe(0.5)
+    registry.gauge("active_jobs", "Running.", lambda: active_jobs)
+    registry.gauge("shared_queue", "Shared.", lambda: 7, mode='max')
+    return registry
+
+def test_registry_merges_the_metrics_of_every_process(tmp_path):
+    """Verify a scrape of one worker adds up the other workers' series, and keeps exited workers' counts only."""
+    release_read, release_write = os.pipe()
+    ready_read, ready_write = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        # Another API worker: publishes its metrics, then exits when told to
+        _node_registry(str(tmp_path), active_jobs=2).start()
+        os.write(ready_write, b'1')
+        os.read(release_read, 1)
+        os._exit(0)
+    os.read(ready_read, 1)
+    registry = _node_registry(str(tmp_path), active_jobs=1)
+    registry.start()
+
+    lines = registry.render().splitlines()
+    assert 'jobs_total{status="finished"} 2' in lines
+    assert 'job_seconds_count 2' in lines
+    assert 'active_jobs 3' in lines and 'shared_queue 7' in lines
+
+    os.write(release_write, b'1')
+    os.waitpid(pid, 0)
+    lines = registry.render().splitlines()
+    assert 'jobs_total{status="finished"} 2' in lines    # counters never go backwards
+    assert 'active_jobs 1' in lines                       # gauges only count live workers
@@ -15,8 +15,8 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src/
 
 # --- Imports from the project's logic ---
 # Ensure these match the files you created (parser_engine.py and data_utils.py)
-from data_utils import chunker, extract_clean_value 
-from parser_engine import FinancialReportParser 
+from data_utils import chunker, extract_clean_value, clean_tables, frame_to_records 
+from parser_engine import FinancialReportParser, PageRasterizer 
 
 # --- 2. Test Utility Functions (data_utils.py) ---
 
@@ -27,6 +27,18 @@ def test_chunker_remainder():
     assert len(chunks) == 3
     assert chunks[2] == ['e']
 
+def test_chunker_consumes_generators_lazily():
+    """Verify chunker batches a generator without materializing it first."""
+    consumed = []
+    def items():
+        for i in range(5):
+            consumed.append(i)
+            yield i
+    chunks = chunker(items(), 2)
+    assert next(chunks) == [0, 1]
+    assert consumed == [0, 1]
+    assert list(chunks) == [[2, 3], [4]]
+
 def test_extract_clean_value_success():
     """Verify regex extraction between two markers works correctly."""
     text = "Codice Fiscale: 12345678901 Codice Lei"
@@ -39,6 +51,30 @@ def test_extract_clean_value_no_end_marker():
     result = extract_clean_value("Intestatario:", "NonExistent", text)
     assert "Mario Rossi S.R.L. End of text." in result 
 
+def test_clean_tables_types_italian_values_per_table():
+    """Verify batched cleaning parses Italian amounts, percentages and dates column by column."""
+    summary = pd.DataFrame([['Intermediario', 'Importo', 'Quota', 'Data'],
+                            ['Banca\nAlpha', '150.000,00', '12,5%', '31/01/2025'],
+                            ['Banca Beta', '', '0,5%', '01/2025']])
+    amounts = pd.DataFrame([['1.500'], ['20,25']])
+    codes = pd.DataFrame([['Codice Fiscale', '01234567890']])
+
+    cleaned_summary, cleaned_amounts, cleaned_codes = clean_tables([summary, amounts, codes])
+
+    assert frame_to_records(cleaned_summary)[1:] == [
+        {0: 'Banca Alpha', 1: 150000.0, 2: 0.125, 3: '2025-01-31'},
+        {0: 'Banca Beta', 1: None, 2: 0.005, 3: '2025-01-01'},
+    ]
+    assert cleaned_amounts[0].dtype == 'float64'           # fully numeric column gets a real dtype
+    assert cleaned_codes.iloc[0, 1] == '01234567890'       # identifiers are left as text
+
+    from data_utils import frame_to_content, content_to_records
+    rows = frame_to_content(cleaned_summary, 'rows')
+    columns = frame_to_content(cleaned_summary, 'columns')
+    assert rows['columns'] == [0, 1, 2, 3] and rows['rows'][1] == ['Banca Alpha', 150000.0, 0.125, '2025-01-31']
+    assert columns['types'] == ['text', 'number', 'number', 'date']
+    assert content_to_records(rows) == content_to_records(columns) == frame_to_records(cleaned_summary)
+
 # --- 3. Mock Test for Core Parser (parser_engine.py) ---
 
 # We mock external dependencies (fitz/camelot) which are slow and heavy.
@@ -77,3 +113,284 @@ def test_process_document_returns_correct_structure(mock_parse_tables):
     assert "extraction_accuracy" in results[0]
     assert results[0]['page_number'] == 1
     assert isinstance(results[0]['content'], list) # Content should be a list of dicts
+
+def test_parse_page_range_expands_and_clips():
+    """Verify Camelot-style page specs are expanded and clipped to the page count."""
+    from data_utils import parse_page_range
+    assert parse_page_range('all', 3) == [1, 2, 3]
+    assert parse_page_range('1,3-5', 4) == [1, 3, 4]
+    assert parse_page_range('2-end', 3) == [2, 3]
+
+# --- 4. Integration Test for Page-Parallel Extraction ---
+
+def _write_grid_pdf(path, page_count, amounts=None):
+    """Builds a small born-digital PDF with one ruled 2x2 table per page (`amounts` overrides page values)."""
+    import fitz
+    doc = fitz.open()
+    for n in range(1, page_count + 1):
+        page = doc.new_page()
+        for y in (100, 130, 160):
+            page.draw_line((50, y), (350, y))
+        for x in (50, 200, 350):
+            page.draw_line((x, 100), (x, 160))
+        page.insert_text((60, 120), f"Banca {n}")
+        page.insert_text((210, 120), "Importo")
+        page.insert_text((60, 150), "Fido")
+        page.insert_text((210, 150), (amounts or {}).get(n, f"{n}.000,00"))
+    doc.save(path)
+
+def test_parallel_extraction_matches_serial_order(tmp_path):
+    """Verify sharded extraction returns the same tables, in page order, as the serial path."""
+    pdf_path = str(tmp_path / "report.pdf")
+    _write_grid_pdf(pdf_path, 3)
+
+    serial = FinancialReportParser(max_workers=1, engine='camelot').process_document(pdf_path)
+    parallel = FinancialReportParser(max_workers=2, shard_size=1, engine='camelot').process_document(pdf_path)
+
+    assert [t['page_number'] for t in parallel] == [1, 2, 3]
+    assert [t['table_index'] for t in parallel] == [0, 1, 2]
+    assert [t['content'] for t in parallel] == [t['content'] for t in serial]
+
+def _write_camelot_page(pdf_path, page_number, out_path, rotate=0):
+    """Writes page `page_number` alone to `out_path`, rotated like Camelot does for landscape pages."""
+    import fitz
+    with fitz.open(pdf_path) as src, fitz.open() as page_doc:
+        page_doc.insert_pdf(src, from_page=page_number - 1, to_page=page_number - 1)
+        if rotate:
+            page_doc[0].set_rotation(rotate)
+        page_doc.save(out_path)
+
+def test_rasterizer_renders_requested_page_once(tmp_path):
+    """Verify the rasterizer maps Camelot's page-N.pdf to page N and serves repeats from cache."""
+    pdf_path = str(tmp_path / "report.pdf")
+    _write_grid_pdf(pdf_path, 3)
+    _write_camelot_page(pdf_path, 2, str(tmp_path / "page-2.pdf"))
+    png_path = str(tmp_path / "page-2.png")
+
+    with PageRasterizer(pdf_path, dpi=50, cache_size=1) as rasterizer:
+        with patch.object(rasterizer, 'render', wraps=rasterizer.render) as render:
+            rasterizer.convert(str(tmp_path / "page-2.pdf"), png_path)
+            render.assert_called_once_with(2)
+        cached = rasterizer._cache[2]
+        assert rasterizer.render(2) is cached   # served from cache, not re-rendered
+        rasterizer.render(3)
+        assert list(rasterizer._cache) == [3]   # bounded LRU eviction
+
+    with open(png_path, 'rb') as f:
+        assert f.read() == cached
+
+def test_rasterizer_follows_pages_camelot_rotated(tmp_path):
+    """Verify a landscape page Camelot wrote back rotated is rendered with the rotated geometry."""
+    import fitz
+    pdf_path = str(tmp_path / "report.pdf")
+    doc = fitz.open()
+    page = doc.new_page(width=842, height=595)
+    page.insert_text((100, 500), "Banca", rotate=90)   # vertical text: Camelot rotates this page
+    doc.save(pdf_path)
+    rotated_path = str(tmp_path / "page-1.pdf")
+    _write_camelot_page(pdf_path, 1, rotated_path, rotate=90)
+    png_path = str(tmp_path / "page-1.png")
+
+    with PageRasterizer(pdf_path, dpi=72) as rasterizer:
+        rasterizer.convert(rotated_path, png_path)
+        assert 1 not in rasterizer._cache       # not the cached render of the original page
+
+    with fitz.open(rotated_path) as rotated, fitz.open(png_path) as png:
+        assert (png[0].rect.width, png[0].rect.height) == (rotated[0].rect.width, rotated[0].rect.height)
+        assert png[0].rect.height > png[0].rect.width
+
+def test_prescan_keeps_only_keyword_pages(tmp_path):
+    """Verify the TABLE_RULES pre-scan drops boilerplate pages and groups pages by flavor."""
+    import fitz
+    pdf_path = str(tmp_path / "report.pdf")
+    doc = fitz.open()
+    for text in ("DATA DI RIFERIMENTO 01/2025", "Note e legenda", "TIPO DI RAPPORTO utilizzato", ""):
+        page = doc.new_page()
+        if text:
+            page.insert_text((50, 100), text)
+    doc.save(pdf_path)
+
+    rules = [
+        {"name": "SUMMARY", "keywords": ["DATA DI RIFERIMENTO"], "pages": "all", "extraction_method": "lattice"},
+        {"name": "DETAIL", "keywords": ["TIPO DI RAPPORTO"], "pages": "2-5", "extraction_method": "stream"},
+    ]
+    plan = FinancialReportParser(table_rules=rules)._plan_pages(pdf_path)
+
+    # Page 2 is boilerplate, page 4 has no text layer (scan) and falls back to lattice
+    assert [(flavor, pages) for flavor, pages, _ in plan] == [('lattice', [1, 4]), ('stream', [3])]
+    # Keyword pages get a region of interest, the scanned page is processed in full
+    assert set(plan[0][2]) == {1}
+
+def test_table_regions_follow_header_anchor(tmp_path):
+    """Verify the region of interest starts at the keyword header and stops at a large gap."""
+    import fitz
+    pdf_path = str(tmp_path / "report.pdf")
+    doc = fitz.open()
+    page = doc.new_page()                      # A4 portrait, height ~842pt
+    page.insert_text((100, 100), "Intermediario  Importo")
+    page.insert_text((100, 115), "Banca Alpha  1.000,00")
+    page.insert_text((100, 700), "Note legali a pie di pagina")
+    doc.save(pdf_path)
+
+    plan = FinancialReportParser()._plan_pages(pdf_path)
+    [region] = plan[0][2][1]
+    x1, y1, x2, y2 = map(float, region.split(','))
+
+    height = page.rect.height
+    assert y1 > height - 100                   # region top is above the header row
+    assert y2 > height - 700                   # ...and ends before the footer note
+    assert x1 < 100 < x2
+
+def test_vector_engine_matches_camelot(tmp_path):
+    """Verify the vector fast path rebuilds the same cells Camelot lattice finds."""
+    pdf_path = str(tmp_path / "report.pdf")
+    _write_grid_pdf(pdf_path, 2)
+
+    with patch('parser_engine.camelot.read_pdf') as mock_read_pdf:
+        vector = FinancialReportParser(engine='auto').process_document(pdf_path)
+        mock_read_pdf.assert_not_called()  # born-digital grid: no rasterization needed
+    camelot_result = FinancialReportParser(engine='camelot').process_document(pdf_path)
+
+    assert [t['content'] for t in vector] == [t['content'] for t in camelot_result]
+    assert vector[0]['content'][1] == {0: 'Fido', 1: 1000.0}
+
+@patch('parser_engine.camelot.read_pdf', return_value=[])
+def test_vector_engine_falls_back_without_grid(mock_read_pdf, tmp_path):
+    """Verify pages without vector ruling lines are handed to Camelot."""
+    import fitz
+    pdf_path = str(tmp_path / "report.pdf")
+    _write_grid_pdf(pdf_path, 1)
+    doc = fitz.open(pdf_path)
+    doc.new_page().insert_text((50, 100), "IMPORTO senza griglia")
+    doc.saveIncr()
+
+    FinancialReportParser(engine='auto').parse_tables(pdf_path)
+
+    assert mock_read_pdf.call_count == 1
+    assert mock_read_pdf.call_args.kwargs['pages'] == '2'
+
+def test_iter_tables_streams_and_resumes(tmp_path):
+    """Verify iter_tables yields tables lazily and can resume from a page with continued numbering."""
+    pdf_path = str(tmp_path / "report.pdf")
+    _write_grid_pdf(pdf_path, 3)
+    parser = FinancialReportParser(shard_size=1)
+
+    with patch('parser_engine._extract_shard', wraps=__import__('parser_engine')._extract_shard) as extract:
+        stream = parser.iter_tables(pdf_path)
+        first = next(stream)
+        assert first['page_number'] == 1
+        assert extract.call_count == 1       # later pages are not parsed yet
+        stream.close()
+
+    resumed = list(parser.iter_tables(pdf_path, start_page=2, start_index=1))
+    assert [(t['table_index'], t['page_number']) for t in resumed] == [(1, 2), (2, 3)]
+
+def test_failed_shard_and_prescan_are_recorded(tmp_path):
+    """Verify a failing shard or pre-scan is recorded on the parser instead of passing for a complete result."""
+    import parser_engine
+    pdf_path = str(tmp_path / "report.pdf")
+    _write_grid_pdf(pdf_path, 3)
+    extract = parser_engine._extract_shard
+
+    def flaky(file_path, shard, engine):
+        if any(page == 2 for page, _, _ in shard):
+            raise RuntimeError("camelot crashed")
+        return extract(file_path, shard, engine)
+
+    parser = FinancialReportParser(max_workers=1, shard_size=1)
+    with patch.object(parser_engine, '_extract_shard', side_effect=flaky):
+        tables = parser.process_document(pdf_path)
+    assert [t['page_number'] for t in tables] == [1, 3]
+    assert parser.failed_pages == [2] and 'camelot crashed' in parser.errors[0]
+
+    with patch.object(FinancialReportParser, '_plan_pages', side_effect=RuntimeError("broken xref")):
+        assert parser.process_document(pdf_path) == []
+    assert parser.errors == ["Page pre-scan failed: broken xref"]
+
+def test_page_cache_reextracts_only_changed_pages(tmp_path):
+    """Verify unchanged pages of a new month's report are served from the page cache."""
+    import parser_engine
+    from page_cache import PageCache
+    cache = PageCache(str(tmp_path / "pages.sqlite3"))
+    january, february = str(tmp_path / "january.pdf"), str(tmp_path / "february.pdf")
+    _write_grid_pdf(january, 3)
+    _write_grid_pdf(february, 3, amounts={2: "9.999,00"})
+
+    parser = FinancialReportParser(page_cache=cache)
+    first = parser.process_document(january)
+    assert len(cache) == 3
+
+    with patch.object(parser_engine, '_extract_shard', wraps=parser_engine._extract_shard) as extract:
+        second = parser.process_document(february)
+    assert [page for call in extract.call_args_list for page, _, _ in call.args[1]] == [2]
+
+    assert second[0]['content'] == first[0]['content'] and second[2]['content'] == first[2]['content']
+    assert second[1]['content'][1] == {0: 'Fido', 1: 9999.0}
+
+def test_page_cache_evicts_oldest_pages_over_budget(tmp_path):
+    """Verify the running size total follows puts/overwrites and eviction drops the oldest pages first."""
+    import fitz
+    import parser_engine
+    from page_cache import PageCache
+    cache = PageCache(str(tmp_path / "pages.sqlite3"), max_bytes=10 ** 6)
+    value = [str(n) * 50 for n in range(40)]
+    cache.put_many({'a': value, 'b': value})
+    cache.put_many({'a': value})                 # overwriting a page does not count it twice
+    per_page = cache.total_bytes() // 2
+    assert len(cache) == 2
+
+    cache.max_bytes = per_page * 2
+    cache.put_many({'c': value})
+    assert len(cache) == 2 and cache.get_many(['b']) == {}
+    assert cache.total_bytes() == per_page * 2
+
+    # Extraction settings are part of a page's fingerprint
+    pdf_path = str(tmp_path / "report.pdf")
+    _write_grid_pdf(pdf_path, 1)
+    with fitz.open(pdf_path) as doc:
+        before = parser_engine._page_fingerprint(doc, 1, 'lattice', None, 'camelot')
+        with patch.object(parser_engine, 'RASTER_DPI', 150):
+            assert parser_engine._page_fingerprint(doc, 1, 'lattice', None, 'camelot') != before
+        with patch.dict(parser_engine.FLAVOR_OPTIONS, {'lattice': {'line_scale': 60}}):
+            assert parser_engine._page_fingerprint(doc, 1, 'lattice', None, 'camelot') != before
+
+def test_memory_budget_shrinks_window_then_rejects(tmp_path):
+    """Verify memory pressure shrinks the shards without changing the result, and an exhausted budget rejects the job."""
+    import parser_engine
+    from memory_budget import MemoryBudget, MemoryBudgetError, rss_bytes
+    pdf_path = str(tmp_path / "report.pdf")
+    _write_grid_pdf(pdf_path, 8)
+    expected = FinancialReportParser(shard_size=4).process_document(pdf_path)
+
+    # Always under pressure, never over the limit
+    pressure = MemoryBudget(limit_mb=rss_bytes() // 2 ** 20 * 4, pressure=0.0)
+    parser = FinancialReportParser(shard_size=4, memory_budget=pressure)
+    with patch.object(parser_engine, '_extract_shard', wraps=parser_engine._extract_shard) as extract:
+        assert parser.process_document(pdf_path) == expected
+    assert [len(call.args[1]) for call in extract.call_args_list] == [4, 2, 1, 1]
+
+    with pytest.raises(MemoryBudgetError):
+        FinancialReportParser(memory_budget=MemoryBudget(limit_mb=1)).process_document(pdf_path)
+
+def test_memory_budget_counts_extraction_workers():
+    """Verify the memory of the job's extraction worker processes counts towards its budget."""
+    from memory_budget import MemoryBudget, rss_bytes
+    ready_read, ready_write = os.pipe()
+    release_read, release_write = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        # An extraction worker holding 200 MB of its own
+        held = bytearray(200 * 2 ** 20)
+        for offset in range(0, len(held), 4096):
+            held[offset] = 1
+        os.write(ready_write, b'1')
+        os.read(release_read, 1)
+        os._exit(0)
+    try:
+        os.read(ready_read, 1)
+        budget = MemoryBudget(limit_mb=rss_bytes() // 2 ** 20 + 100, pressure=1.0)
+        assert budget.check() == MemoryBudget.OK
+        assert budget.check(worker_pids=[pid]) == MemoryBudget.OVER
+    finally:
+        os.write(release_write, b'1')
+        os.waitpid(pid, 0)
@@ -0,0 +1,126 @@
+import os
+import sys
+import pytest
+import boto3
+from moto import mock_aws
+
+# Setup Path to find source code
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src/storage')))
+
+import aws_utils
+
+# --- Fixtures: moto-backed stand-in for S3 and DynamoDB ---
+
+@pytest.fixture
+def aws(monkeypatch):
+    """Creates the results table and backup bucket in a moto-mocked AWS account."""
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    with mock_aws():
+        aws_utils.reset_clients()
+        boto3.client('s3', region_name=aws_utils.AWS_REGION).create_bucket(
+            Bucket=aws_utils.S3_BUCKET,
+            CreateBucketConfiguration={'LocationConstraint': aws_utils.AWS_REGION})
+        boto3.client('dynamodb', region_name=aws_utils.AWS_REGION).create_table(
+            TableName=aws_utils.DYNAMO_TABLE,
+            KeySchema=[{'AttributeName': 'PK', 'KeyType': 'HASH'}],
+            AttributeDefinitions=[{'AttributeName': 'PK', 'AttributeType': 'S'}],
+            BillingMode='PAY_PER_REQUEST')
+        yield
+        aws_utils.reset_clients()
+
+def _table(index, rows, cell="x"):
+    return {
+        "table_index": index,
+        "page_number": index + 1,
+        "content": [{"0": f"{cell}{r}", "1": r * 1.5} for r in range(rows)],
+        "extraction_accuracy": 99.5,
+    }
+
+def test_clients_are_cached_per_process(aws):
+    """Verify the session and clients are created once and reused."""
+    assert aws_utils.get_s3_client() is aws_utils.get_s3_client()
+    assert aws_utils.get_dynamo_table() is aws_utils.get_dynamo_table()
+
+def test_table_batch_round_trip_with_split_and_offload(aws, monkeypatch):
+    """Verify small, split and S3-offloaded tables are all persisted and read back intact."""
+    monkeypatch.setattr(aws_utils, "DYNAMO_ITEM_BUDGET", 4 * 1024)
+    monkeypatch.setattr(aws_utils, "MAX_CONTENT_PARTS", 4)
+    tables = [_table(0, 3), _table(1, 200), _table(2, 2000)]
+
+    aws_utils.save_table_batch("req-1", tables)
+
+    dynamo = aws_utils.get_dynamo_table()
+    assert dynamo.get_item(Key={'PK': 'req-1#TABLE#00001'})['Item']['ContentParts'] > 1
+    assert 'ContentS3Key' in dynamo.get_item(Key={'PK': 'req-1#TABLE#00002'})['Item']
+    assert aws_utils.load_results("req-1", 3) == tables
+
+def test_compact_tables_round_trip_with_split_and_offload(aws, monkeypatch):
+    """Verify 'rows' and 'columns' content keeps its layout through split parts and zstd/gzip S3 offload."""
+    monkeypatch.setattr(aws_utils, "DYNAMO_ITEM_BUDGET", 4 * 1024)
+    monkeypatch.setattr(aws_utils, "MAX_CONTENT_PARTS", 4)
+    monkeypatch.setattr(aws_utils, "RESULT_COMPRESSION", "zstd")
+    tables = []
+    for index, rows in enumerate([500, 5000]):
+        records = _table(index, rows)['content']
+        tables.append(dict(_table(index, 0), content={'columns': [0, 1], 'rows': [[r["0"], r["1"]] for r in records]}))
+        tables.append(dict(_table(index + 2, 0), content={
+            'columns': [0, 1], 'types': ['text', 'number'],
+            'data': [[r["0"] for r in records], [r["1"] for r in records]]}))
+
+    aws_utils.save_table_batch("req-3", tables)
+
+    dynamo = aws_utils.get_dynamo_table()
+    assert dynamo.get_item(Key={'PK': 'req-3#TABLE#00002'})['Item']['ContentParts'] > 1
+    assert 'ContentS3Key' in dynamo.get_item(Key={'PK': 'req-3#TABLE#00001'})['Item']
+    loaded = aws_utils.load_results("req-3", 4)
+    assert sorted(loaded, key=lambda t: t['table_index']) == sorted(tables, key=lambda t: t['table_index'])
+
+def test_status_update_keeps_resume_checkpoint(aws):
+    """Verify status changes do not wipe the resume checkpoint of a failed job."""
+    aws_utils.save_result_to_dynamo("req-2", "PROCESSING")
+    aws_utils.save_job_progress("req-2", resume_page=7, resume_index=12)
+    aws_utils.save_result_to_dynamo("req-2", "ERROR", error_msg="boom")
+
+    assert aws_utils.get_job_progress("req-2") == {'resume_page': 7, 'resume_index': 12}
+
+def test_document_claim_lifecycle(aws):
+    """Verify one request owns a document, duplicates subscribe, and settled claims are reused or retaken."""
+    key = aws_utils.document_key("abc123", "1.0.0")
+
+    assert aws_utils.claim_document(key, "owner", stale_after=60) is None
+    running = aws_utils.claim_document(key, "dup-1", stale_after=60)
+    assert (running['RequestId'], running['ClaimState']) == ("owner", "PROCESSING")
+    assert aws_utils.subscribe_to_document(key, "http://client-b/hook") is True
+
+    assert aws_utils.finish_document_claim(key, "owner", "DONE", result_count=4) == ["http://client-b/hook"]
+    assert aws_utils.subscribe_to_document(key, "http://client-c/hook") is False
+    done = aws_utils.claim_document(key, "dup-2", stale_after=60)
+    assert (done['RequestId'], done['ClaimState'], done['ResultCount']) == ("owner", "DONE", 4)
+
+    # A failed parse releases the document to the next upload
+    other = aws_utils.document_key("def456", "1.0.0")
+    aws_utils.claim_document(other, "failed", stale_after=60)
+    aws_utils.finish_document_claim(other, "failed", "ERROR")
+    assert aws_utils.claim_document(other, "retry", stale_after=60) is None
+
+    # A stale claim is taken over with its subscribers, who hear from the new owner
+    aws_utils.subscribe_to_document(other, "http://client-d/hook")
+    assert aws_utils.claim_document(other, "late", stale_after=None)['RequestId'] == "retry"
+    assert aws_utils.claim_document(other, "takeover", stale_after=-1) is None
+    assert aws_utils.finish_document_claim(other, "takeover", "DONE", result_count=1) == ["http://client-d/hook"]
+
+def test_batch_progress_merges_document_statuses(aws):
+    """Verify batch progress reflects each document's current status in one bulk read."""
+    aws_utils.save_batch("b-1", [{'filename': 'a.pdf', 'request_id': 'r-a', 'status': 'QUEUED'},
+                                 {'filename': 'b.pdf', 'request_id': 'r-b', 'status': 'QUEUED'},
+                                 {'filename': 'c.pdf', 'request_id': 'r-c', 'status': 'INVALID'}])
+    aws_utils.save_result_to_dynamo("r-a", "DONE", result_count=5)
+    aws_utils.save_result_to_dynamo("r-b", "PROCESSING")
+
+    batch = aws_utils.load_batch("b-1")
+
+    assert batch['counts'] == {'DONE': 1, 'PROCESSING': 1, 'INVALID': 1}
+    assert batch['documents'][0]['result_count'] == 5
+    assert batch['progress'] == round(2 / 3, 4)
+    assert aws_utils.load_batch("missing") is None
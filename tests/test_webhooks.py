@@ -0,0 +1,94 @@
+import os
+import sys
+import json
+import threading
+import pytest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Setup Path to find source code
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src/core')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src/storage')))
+
+from webhook_dispatcher import WebhookDispatcher
+
+class ClientEndpoint(BaseHTTPRequestHandler):
+    """Stand-in for a client webhook: answers with the next scripted status code."""
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        server = self.server
+        with server.lock:
+            status = server.statuses.pop(0) if server.statuses else 200
+            server.calls.append((self.client_address[1], json.loads(body), status))
+        self.send_response(status)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def endpoint():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), ClientEndpoint)
+    server.lock = threading.Lock()
+    server.statuses = []
+    server.calls = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def test_dispatcher_retries_and_reuses_connection(endpoint):
+    """Verify a 503 is retried with backoff and the retry goes over the same keep-alive connection."""
+    endpoint.statuses = [503, 503]
+    dead = []
+    dispatcher = WebhookDispatcher(workers=1, max_retries=3, backoff_base=0.01,
+                                   dead_letter=lambda delivery, reason: dead.append(reason))
+
+    url = f"http://127.0.0.1:{endpoint.server_port}/hook"
+    assert dispatcher.enqueue(url, {'request_id': 'r1', 'status': 'finished'}) is True
+    dispatcher.shutdown(timeout=5)
+
+    assert [status for _, _, status in endpoint.calls] == [503, 503, 200]
+    assert all(payload == {'request_id': 'r1', 'status': 'finished'} for _, payload, _ in endpoint.calls)
+    assert len({port for port, _, _ in endpoint.calls}) == 1
+    assert dead == []
+
+def test_dispatcher_dead_letters_after_last_retry(endpoint):
+    """Verify a persistently failing endpoint ends up in the dead-letter sink, not in a loop."""
+    endpoint.statuses = [500] * 10
+    dead = []
+    dispatcher = WebhookDispatcher(workers=2, max_retries=2, backoff_base=0.01,
+                                   dead_letter=lambda delivery, reason: dead.append((delivery.attempts, reason)))
+
+    dispatcher.enqueue(f"http://127.0.0.1:{endpoint.server_port}/hook", {'request_id': 'r2', 'status': 'error'})
+    dispatcher.shutdown(timeout=5)
+
+    assert len(endpoint.calls) == 3
+    assert dead == [(3, 'HTTP 500')]
+
+def test_dispatcher_survives_failing_dead_letter_sink(endpoint):
+    """Verify a raising dead-letter sink neither kills the delivery thread nor runs on the caller."""
+    endpoint.statuses = [400, 200]
+    callers = []
+
+    def failing_sink(delivery, reason):
+        callers.append(threading.current_thread())
+        raise RuntimeError("dead-letter store unavailable")
+
+    url = f"http://127.0.0.1:{endpoint.server_port}/hook"
+    dispatcher = WebhookDispatcher(workers=1, max_retries=0, dead_letter=failing_sink)
+    dispatcher.enqueue(url, {'request_id': 'r3', 'status': 'error'})
+    dispatcher.enqueue(url, {'request_id': 'r4', 'status': 'finished'})
+    dispatcher.shutdown(timeout=5)
+    # The same thread went on to deliver the second notification
+    assert [status for _, _, status in endpoint.calls] == [400, 200]
+
+    full = WebhookDispatcher(workers=1, queue_size=0, dead_letter=failing_sink)
+    assert full.enqueue(url, {'request_id': 'r5', 'status': 'finished'}) is False
+    full.shutdown(timeout=5)
+
+    assert len(callers) == 2
+    assert threading.current_thread() not in callers